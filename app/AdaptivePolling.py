@@ -0,0 +1,62 @@
+# Standard library imports
+import datetime
+import os
+
+
+class AdaptivePollInterval:
+    """
+    Chooses how long to wait between polls of the daily challenge results.
+
+    Polls run at the minimum interval while results keep arriving. Each poll without changes
+    doubles the interval up to the maximum, except during the busy window after midnight UTC
+    when most friends play and the interval is capped lower.
+
+    Attributes:
+        min_interval (float): Seconds between polls right after a change.
+        max_interval (float): Upper bound in seconds during quiet periods.
+        busy_max_interval (float): Upper bound in seconds during the busy window.
+        busy_hours (int): Length of the busy window after midnight UTC, in hours.
+        backoff (float): Factor applied to the interval after each unchanged poll.
+    """
+
+    def __init__(self, min_interval=None, max_interval=None, busy_max_interval=None, busy_hours=None, backoff=2.0):
+        """
+        Initializes an AdaptivePollInterval, reading unset bounds from the environment.
+
+        Args:
+            min_interval (float): Seconds between polls right after a change. Defaults to POLL_INTERVAL_MIN or 30.
+            max_interval (float): Upper bound during quiet periods. Defaults to POLL_INTERVAL_MAX or 900.
+            busy_max_interval (float): Upper bound during the busy window. Defaults to POLL_INTERVAL_BUSY_MAX or 60.
+            busy_hours (int): Length of the busy window after midnight UTC. Defaults to POLL_BUSY_HOURS or 3.
+            backoff (float): Factor applied to the interval after each unchanged poll.
+        """
+        self.min_interval = float(min_interval if min_interval is not None else os.getenv('POLL_INTERVAL_MIN', 30))
+        self.max_interval = float(max_interval if max_interval is not None else os.getenv('POLL_INTERVAL_MAX', 900))
+        self.busy_max_interval = float(busy_max_interval if busy_max_interval is not None else os.getenv('POLL_INTERVAL_BUSY_MAX', 60))
+        self.busy_hours = int(busy_hours if busy_hours is not None else os.getenv('POLL_BUSY_HOURS', 3))
+        self.backoff = backoff
+
+        self.interval = self.min_interval
+
+    def next_interval(self, changed: bool, now: datetime.datetime = None) -> float:
+        """
+        Updates and returns the interval to wait before the next poll.
+
+        Args:
+            changed (bool): Whether the last poll found new results.
+            now (datetime.datetime): The current UTC time. Defaults to now.
+
+        Returns:
+            float: Seconds to wait before the next poll.
+        """
+        now = now or datetime.datetime.now(tz=datetime.timezone.utc)
+
+        if changed:
+            self.interval = self.min_interval
+        else:
+            self.interval = self.interval * self.backoff
+
+        upper_bound = self.busy_max_interval if now.hour < self.busy_hours else self.max_interval
+        self.interval = max(self.min_interval, min(self.interval, upper_bound))
+
+        return self.interval
@@ -0,0 +1,224 @@
+# Standard library imports
+import asyncio
+import logging
+
+# Third-party imports
+import discord
+
+# Local application imports
+from Metrics import DISCORD_REQUEST_SECONDS
+from ResultsCard import card_file
+
+logger = logging.getLogger(__name__)
+
+MESSAGE_LIMIT = 2000  # Max characters in a Discord message
+
+
+def format_mention(user) -> str:
+    """
+    Formats how a user is referred to in announcements, without any Discord API call.
+
+    Registered users are mentioned through their stored Discord id, which renders the same as
+    fetching the user and reading .mention. Unregistered users are shown by Geoguessr name.
+
+    Args:
+        user (User): The database user.
+
+    Returns:
+        str: The mention or name.
+    """
+    if user.discord_id is not None:
+        return f"<@{user.discord_id}>"
+    return user.geo_name
+
+
+def queue_result_announcements(output, results):
+    """
+    Queues an announcement line for each new result.
+
+    Args:
+        output (DiscordOutputStage): The output stage of the current poll cycle.
+        results (list): The new UserDailyResult rows, with their users loaded.
+    """
+    for result in results:
+        output.queue_announcement(f"New result: {format_mention(result.user)} scored - {result.score} points!")
+
+
+class DiscordOutputStage:
+    """
+    Collects the Discord output produced during one poll cycle and sends it in as few calls as possible.
+
+    Everything queued before flush() results in at most one edit of the results message and one
+    announcement in the daily thread. Requests hitting a 429 are retried after the advertised delay,
+    and a results edit is dropped when a newer embed has been queued in the meantime.
+
+    Attributes:
+        message_channel (discord.TextChannel): The channel the results message is posted in.
+        results_message (discord.Message): The results message edited on each update.
+        thread (discord.Thread): Today's spoiler thread receiving the announcements.
+    """
+
+    def __init__(self, max_retries=3, retry_delay=1.0):
+        """
+        Initializes a DiscordOutputStage.
+
+        Args:
+            max_retries (int): How many times a rate limited request is retried.
+            retry_delay (float): Seconds to wait before a retry when Discord gives no Retry-After.
+        """
+        self.message_channel = None
+        self.results_message = None
+        self.thread = None
+
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+
+        self._pending_embed = None
+        self._pending_card = None
+        self._card_attached = False
+        self._embed_version = 0
+        self._announcements = []
+        self._lock = asyncio.Lock()
+
+    def queue_results_embed(self, embed, card=None):
+        """
+        Queues an embed for the results message, replacing any embed not yet sent.
+
+        Args:
+            embed (discord.Embed): The results embed.
+            card (bytes): A rendered results card attached to the message, referenced by the embed.
+        """
+        self._pending_embed = embed
+        self._pending_card = card
+        self._embed_version += 1
+
+    def queue_announcement(self, line):
+        """
+        Queues a line for the combined thread announcement.
+
+        Args:
+            line (str): The line to announce.
+        """
+        self._announcements.append(line)
+
+    async def flush(self):
+        """
+        Sends everything queued since the last flush.
+        """
+        async with self._lock:
+            await self._flush_results_embed()
+            await self._flush_announcements()
+
+    async def _flush_results_embed(self):
+        if self._pending_embed is None or self.message_channel is None:
+            return
+
+        embed = self._pending_embed
+        card = self._pending_card
+        version = self._embed_version
+        self._pending_embed = None
+        self._pending_card = None
+
+        # A discord.File is consumed by the request, so every attempt gets a new one
+        def attachments():
+            if card is not None:
+                return {'attachments': [card_file(card)]}
+            # Remove the card of a previous update rather than leave it below a text embed
+            return {'attachments': []} if self._card_attached else {}
+
+        def files():
+            return {'file': card_file(card)} if card is not None else {}
+
+        try:
+            if self.results_message is not None:
+                sent = await self._with_retry(lambda: self.results_message.edit(embed=embed, **attachments()), version, action='edit')
+            else:
+                sent = self.results_message = await self._with_retry(lambda: self.message_channel.send(embed=embed, **files()), version, action='send')
+            if sent is not None:
+                self._card_attached = card is not None
+        except Exception as e:
+            logger.error("Error occurred updating results message: %s", e)
+
+    async def _flush_announcements(self):
+        announcements, self._announcements = self._announcements, []
+        if not announcements or self.thread is None:
+            return
+
+        for message in self._split_message(announcements):
+            try:
+                await self._with_retry(lambda: self.thread.send(message), action='send')
+            except Exception as e:
+                logger.error("Error occurred sending announcement: %s", e)
+
+    @staticmethod
+    def _split_message(lines):
+        """
+        Joins lines into as few messages as fit within Discord's message limit.
+
+        Args:
+            lines (list): The lines to send.
+
+        Returns:
+            list: The messages to send.
+        """
+        messages = []
+        current = ""
+        for line in lines:
+            line = line[:MESSAGE_LIMIT]
+            if current and len(current) + 1 + len(line) > MESSAGE_LIMIT:
+                messages.append(current)
+                current = ""
+            current = f"{current}\n{line}" if current else line
+        if current:
+            messages.append(current)
+        return messages
+
+    async def _with_retry(self, request, embed_version=None, action='send'):
+        """
+        Runs a Discord request, retrying when it is rate limited.
+
+        Args:
+            request (callable): Returns the coroutine performing the request.
+            embed_version (int): The version of the embed being sent. The retry is abandoned once a newer embed is queued.
+            action (str): 'send' or 'edit', the label the latency is recorded under.
+
+        Returns:
+            The result of the request, or None if it was superseded by a newer embed.
+        """
+        with DISCORD_REQUEST_SECONDS.time(action=action):
+            return await self._retry(request, embed_version)
+
+    async def _retry(self, request, embed_version):
+        for attempt in range(self.max_retries + 1):
+            try:
+                return await request()
+            except discord.RateLimited as e:
+                retry_after = e.retry_after
+            except discord.HTTPException as e:
+                if e.status != 429:
+                    raise
+                retry_after = self._retry_after(e)
+
+            if attempt == self.max_retries:
+                raise Exception(f"Still rate limited after {self.max_retries} retries")
+
+            await asyncio.sleep(retry_after)
+
+            if embed_version is not None and embed_version != self._embed_version:
+                # A newer embed is queued and will be sent by the next flush
+                return None
+
+    def _retry_after(self, exception):
+        """
+        Reads the delay advertised by a 429 response.
+
+        Args:
+            exception (discord.HTTPException): The rate limit error.
+
+        Returns:
+            float: Seconds to wait before retrying.
+        """
+        try:
+            return float(exception.response.headers.get('Retry-After', self.retry_delay))
+        except (AttributeError, TypeError, ValueError):
+            return self.retry_delay
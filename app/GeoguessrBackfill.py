@@ -0,0 +1,332 @@
+# Standard library imports
+import argparse
+import codecs
+import datetime
+import json
+import os
+import re
+import time
+
+# Third-party imports
+from sqlalchemy import func, select
+from sqlalchemy.dialects.sqlite import insert
+
+# Local application imports
+from GeoguessrQueries import GeoguessrQueries, REQUEST_TIMEOUT, results_page_url
+from database import User, Challenge, UserDailyResult, engine, session_scope, upgrade_database, rebuild_user_stats, rebuild_leaderboards
+
+CHUNK_SIZE = 64 * 1024  # Characters read from a file or response at a time
+BATCH_SIZE = 5000  # Rows written per transaction
+LOOKUP_SIZE = 500  # Values per IN (...) clause
+
+ITEMS_KEY = re.compile(r'"items"\s*:\s*\[')
+PAGINATION_TOKEN = re.compile(r'"paginationToken"\s*:\s*(?:null|"((?:[^"\\]|\\.)*)")')
+FRACTIONAL_SECONDS = re.compile(r'\.(\d+)')
+
+
+class ResultsPageParser:
+    """
+    Incrementally extracts the entries of the items array from a challenge results page.
+
+    Text is fed in chunks and each complete entry is returned as soon as it has been read,
+    so only one entry is held in memory at a time instead of the whole page.
+
+    Attributes:
+        pagination_token (str): The token of the next page, available once the page has been read.
+    """
+
+    def __init__(self):
+        self.pagination_token = None
+
+        self._decoder = json.JSONDecoder()
+        self._buffer = ''
+        self._in_items = False
+        self._items_closed = False
+        self._item_incomplete = False
+        self._outside_items = []
+
+    def feed(self, chunk: str) -> list:
+        """
+        Parses the next chunk of the page.
+
+        Args:
+            chunk (str): The next piece of the page.
+
+        Returns:
+            list: The items completed by this chunk.
+        """
+        if self._item_incomplete and '}' not in chunk:
+            # An item can only be completed by a closing brace
+            self._buffer += chunk
+            return []
+
+        buffer = self._buffer + chunk
+        position = 0
+        items = []
+        self._item_incomplete = False
+
+        if not self._in_items and not self._items_closed:
+            match = ITEMS_KEY.search(buffer)
+            if match is None:
+                # Keep enough of the tail to match a key split across chunks
+                self._outside_items.append(buffer[:-32])
+                self._buffer = buffer[-32:]
+                return items
+
+            self._outside_items.append(buffer[:match.start()])
+            position = match.end()
+            self._in_items = True
+
+        while self._in_items:
+            while position < len(buffer) and buffer[position] in ' \t\r\n,':
+                position += 1
+            if position == len(buffer):
+                break
+
+            if buffer[position] == ']':
+                position += 1
+                self._in_items = False
+                self._items_closed = True
+                break
+
+            try:
+                item, position = self._decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                # The item continues in the next chunk
+                self._item_incomplete = True
+                break
+            items.append(item)
+
+        if self._items_closed:
+            self._outside_items.append(buffer[position:])
+            self._buffer = ''
+        else:
+            self._buffer = buffer[position:]
+
+        return items
+
+    def close(self):
+        """
+        Finishes parsing the page and reads its pagination token.
+
+        Raises:
+            ValueError: If the page ended before the items array was closed.
+        """
+        if not self._items_closed:
+            raise ValueError("Results page ended before the items array was closed")
+
+        match = PAGINATION_TOKEN.search(''.join(self._outside_items))
+        self.pagination_token = match.group(1) if match else None
+
+
+def iter_results_file(path, chunk_size=CHUNK_SIZE):
+    """
+    Streams the items of a saved results page.
+
+    Args:
+        path (str): The path of a file shaped like example-json/example-results.json.
+        chunk_size (int): Characters read at a time.
+
+    Yields:
+        dict: Each entry of the items array.
+    """
+    parser = ResultsPageParser()
+    with open(path, encoding='utf-8') as file:
+        while chunk := file.read(chunk_size):
+            yield from parser.feed(chunk)
+    parser.close()
+
+
+def iter_results_endpoint(requests_session, challenge_token, chunk_size=CHUNK_SIZE):
+    """
+    Streams the items of every results page of a challenge from Geoguessr. Only friends' results
+    are fetched, since every player in them is stored as a user.
+
+    Args:
+        requests_session (requests.Session): A session carrying the _ncfa cookie.
+        challenge_token (str): The challenge to fetch the results of.
+        chunk_size (int): Bytes read at a time.
+
+    Yields:
+        dict: Each entry of the items arrays, page after page.
+    """
+    pagination_token = None
+    while True:
+        url = results_page_url(challenge_token, pagination_token)
+
+        parser = ResultsPageParser()
+        decoder = codecs.getincrementaldecoder('utf-8')()
+        with requests_session.get(url, stream=True, timeout=REQUEST_TIMEOUT) as response:
+            response.raise_for_status()
+            for chunk in response.iter_content(chunk_size=chunk_size):
+                yield from parser.feed(decoder.decode(chunk))
+            yield from parser.feed(decoder.decode(b'', final=True))
+        parser.close()
+
+        pagination_token = parser.pagination_token
+        if not pagination_token:
+            return
+
+
+def _started_at(item):
+    """
+    Returns when the player started the first round, as naive UTC, or None if unknown.
+    """
+    try:
+        start_time = item['game']['rounds'][0]['startTime']
+        # Geoguessr sends seven fractional digits, while fromisoformat before Python 3.11 only takes
+        # three or six and no 'Z' suffix
+        start_time = FRACTIONAL_SECONDS.sub(lambda match: '.' + match.group(1)[:6].ljust(6, '0'), start_time, count=1)
+        if start_time.endswith('Z'):
+            start_time = start_time[:-1] + '+00:00'
+        started_at = datetime.datetime.fromisoformat(start_time)
+    except (KeyError, IndexError, TypeError, ValueError):
+        return None
+
+    if started_at.tzinfo is not None:
+        started_at = started_at.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+    return started_at
+
+
+class ResultsBackfill:
+    """
+    Writes challenge results into the database in large batched transactions.
+
+    Users, challenges and daily results are upserted, so running a backfill twice or over days
+    already collected by the live poll is safe: existing users keep their current nick and
+    existing results take the backfilled score.
+
+    Attributes:
+        rows_written (int): The number of results written so far.
+    """
+
+    def __init__(self, db_engine=engine, batch_size=BATCH_SIZE):
+        """
+        Initializes a ResultsBackfill.
+
+        Args:
+            db_engine (sqlalchemy.engine.Engine): The engine of the database to write to.
+            batch_size (int): Results written per transaction.
+        """
+        self.engine = db_engine
+        self.batch_size = batch_size
+        self.rows_written = 0
+
+        self._batch = []
+
+    def add(self, challenge_token, item):
+        """
+        Queues one results entry, writing the batch once it is full.
+
+        Args:
+            challenge_token (str): The challenge the entry belongs to.
+            item (dict): An entry of a results page items array.
+        """
+        self._batch.append((challenge_token, item['userId'], item['playerName'], item['totalScore'], _started_at(item)))
+        if len(self._batch) >= self.batch_size:
+            self.flush()
+
+    def add_all(self, challenge_token, items):
+        """
+        Queues every entry of an iterable of results entries.
+
+        Args:
+            challenge_token (str): The challenge the entries belong to.
+            items (iterable): Entries of results page items arrays.
+        """
+        for item in items:
+            self.add(challenge_token, item)
+
+    def flush(self):
+        """
+        Writes the queued entries in one transaction.
+        """
+        batch, self._batch = self._batch, []
+        if not batch:
+            return
+
+        challenges = {}
+        users = {}
+        for challenge_token, geo_id, geo_name, _, started_at in batch:
+            users.setdefault(geo_id, geo_name)
+            if challenge_token not in challenges or (started_at and (challenges[challenge_token] is None or started_at < challenges[challenge_token])):
+                challenges[challenge_token] = started_at
+
+        with self.engine.begin() as connection:
+            challenge_insert = insert(Challenge.__table__)
+            connection.execute(
+                challenge_insert.on_conflict_do_update(
+                    index_elements=['challenge_token'],
+                    set_={'time': func.coalesce(func.min(Challenge.__table__.c.time, challenge_insert.excluded.time), Challenge.__table__.c.time, challenge_insert.excluded.time)}
+                ),
+                [{'challenge_token': token, 'time': started_at} for token, started_at in challenges.items()]
+            )
+
+            connection.execute(
+                insert(User.__table__).on_conflict_do_nothing(index_elements=['geo_id']),
+                [{'geo_id': geo_id, 'geo_name': geo_name} for geo_id, geo_name in users.items()]
+            )
+
+            user_ids = {}
+            geo_ids = list(users)
+            for start in range(0, len(geo_ids), LOOKUP_SIZE):
+                user_ids.update(connection.execute(
+                    select(User.__table__.c.geo_id, User.__table__.c.id).where(User.__table__.c.geo_id.in_(geo_ids[start:start + LOOKUP_SIZE]))
+                ).all())
+
+            result_insert = insert(UserDailyResult.__table__)
+            connection.execute(
+                result_insert.on_conflict_do_update(
+                    index_elements=['user_id', 'challenge_token'],
+                    set_={'score': result_insert.excluded.score}
+                ),
+                [
+                    {'user_id': user_ids[geo_id], 'challenge_token': challenge_token, 'score': score}
+                    for challenge_token, geo_id, _, score, _ in batch
+                ]
+            )
+
+        self.rows_written += len(batch)
+
+
+def _challenge_token_from_path(path):
+    """
+    Reads the challenge token from a file named '<challengeToken>.json' or '<challengeToken>-<page>.json'.
+    """
+    return re.split(r'[-_.]', os.path.basename(path), maxsplit=1)[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backfill daily challenge results into the database.")
+    parser.add_argument('files', nargs='*', help="Saved results pages named '<challengeToken>.json' or '<challengeToken>-<page>.json'")
+    parser.add_argument('--challenge', help="Challenge token of the files, instead of reading it from their names")
+    parser.add_argument('--fetch', nargs='*', default=[], metavar='TOKEN', help="Challenge tokens to fetch from Geoguessr")
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help="Results written per transaction")
+    args = parser.parse_args()
+
+    upgrade_database(engine)
+    backfill = ResultsBackfill(batch_size=args.batch_size)
+    start = time.perf_counter()
+
+    for path in args.files:
+        backfill.add_all(args.challenge or _challenge_token_from_path(path), iter_results_file(path))
+
+    if args.fetch:
+        queries = GeoguessrQueries()
+        queries.update_geoguessr_session()
+        for challenge_token in args.fetch:
+            backfill.add_all(challenge_token, iter_results_endpoint(queries.requests_session, challenge_token))
+
+    backfill.flush()
+
+    # Backfilled days can land anywhere in the history, so recompute the statistics in one pass
+    with session_scope(None) as session:
+        rebuild_user_stats(session)
+        rebuild_leaderboards(session)
+
+    elapsed = time.perf_counter() - start
+    print(f"Backfilled {backfill.rows_written} results in {elapsed:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
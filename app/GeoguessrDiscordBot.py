@@ -1,18 +1,38 @@
 # Standard library imports
+import asyncio
 import datetime
 import logging
 import os
+import time
+from typing import Literal
 
 # Third-party imports
 import discord
+from discord import app_commands
 from dotenv import load_dotenv
 from discord.ext import commands, tasks
+from sqlalchemy.orm import joinedload
 from sqlalchemy.orm.exc import NoResultFound
 
 # Local application imports
-from GeoguessrQueries import GeoguessrQueries
-from database import User, Challenge, UserDailyResult, engine, Session, Base, get_or_create, session_scope
+from GeoguessrQueries import AsyncGeoguessrQueries
+from AdaptivePolling import AdaptivePollInterval
+from DiscordOutput import DiscordOutputStage, queue_result_announcements
+from GeoguessrEmbeds import invalidate_user_list, get_todays_results, get_todays_results_embed, invalidate_todays_results_embed, get_stats_embed, get_leaderboard_embed
+from database import User, Challenge, UserDailyResult, GuildConfig, engine, Session, Base, get_or_create, session_scope, upgrade_database, run_in_db_executor, rebuild_user_stats, roll_over_leaderboards, rebuild_leaderboards
 from HealthCheck import start_health_check_server
+from Metrics import POLL_SECONDS, instrument_engine
+from LogConfig import setup_logging
+from UserListView import UserListView, load_user_list_page
+from NameIndex import NameIndex, load_user_names
+from ResultsCard import ResultsCardRenderer, CARD_FILENAME, load_assets, icon_file
+from HistoryExport import export_history, load_watermark, save_watermark
+
+logger = logging.getLogger(__name__)
+
+POLL_STALE_SECONDS = float(os.getenv('POLL_STALE_SECONDS', 1800))  # Age of the last successful poll before /readyz fails
+EXPORT_DIR = os.getenv('EXPORT_DIR', 'exports')  # Where history exports and their watermark are written
+EXPORT_UPLOAD_LIMIT = int(os.getenv('EXPORT_UPLOAD_LIMIT', 8 * 1024 * 1024))  # Largest export attached to the reply, in bytes
 
 tz = datetime.timezone.utc
 midnight = datetime.time(hour=0, minute=0, second=0, microsecond=0, tzinfo=tz)
@@ -42,20 +62,42 @@ class GeoguessrDiscordBot(commands.Bot):
         super().__init__(command_prefix, intents=intents)
         intents = intents
         intents.message_content = True
-        Base.metadata.create_all(engine)
 
-        start_health_check_server()
+        self.health_check_runner = None
+
+        # Static assets are read once, cards are rendered in worker processes
+        load_assets()
+        self.results_card = ResultsCardRenderer()
+
+        # Output stage per enabled guild, holding its results channel, results message and today's thread
+        self.outputs = {}
+
+    async def setup_hook(self):
+        """
+        Starts the health and metrics server on the bot's event loop.
+        """
+        self.health_check_runner = await start_health_check_server({
+            'discord_gateway': self.gateway_connected,
+            'geoguessr_session': lambda: geo_query.session_valid,
+            'recent_poll': lambda: geo_query.last_successful_poll is not None and time.time() - geo_query.last_successful_poll < POLL_STALE_SECONDS,
+        })
 
-        self.message_channel = None
-        self.previous_results_message = None
-        self.todays_thread = None
+    def gateway_connected(self) -> bool:
+        """
+        Returns whether the bot is logged in and its gateway websocket is open.
+        """
+        return self.is_ready() and not self.is_closed() and self.ws is not None and self.ws.open
 
     async def on_ready(self):
         """
         Event handler for when the bot is ready.
         """
-        print(f'We have logged in as {self.user}')
+        logger.info("We have logged in as %s", self.user)
+        await self.load_guild_outputs()
         await update_geoguessr_session(self)
+        await run_in_db_executor(geo_query.load_current_challenge)
+        await run_in_db_executor(update_leaderboard_periods)
+        await refresh_name_index()
         get_daily_challenge_loop.start(self)
         check_daily_results_loop.start(self)
 
@@ -66,11 +108,41 @@ class GeoguessrDiscordBot(commands.Bot):
         Args:
             message (discord.Message): The received message.
         """
-        print(message.content)
+        logger.debug("Message received", extra={'sample': True, 'guild_id': message.guild and message.guild.id, 'channel_id': message.channel.id})
         if message.author == self.user:
             return
 
         await self.process_commands(message)
+
+    async def load_guild_outputs(self):
+        """
+        Creates an output stage for every guild enabled in the database.
+        """
+        guild_configs = await run_in_db_executor(get_enabled_guild_configs)
+
+        for guild_id, channel_id in guild_configs:
+            channel = self.get_channel(channel_id)
+            if channel is None:
+                logger.warning("Channel %s of guild %s is not available", channel_id, guild_id)
+                continue
+
+            self.outputs.setdefault(guild_id, DiscordOutputStage()).message_channel = channel
+
+    async def flush_outputs(self):
+        """
+        Sends the output queued for every enabled guild concurrently.
+        """
+        await asyncio.gather(*(output.flush() for output in self.outputs.values()))
+
+    async def close(self):
+        """
+        Closes the Geoguessr HTTP session, the health check server and the card renderer before shutting down the bot.
+        """
+        await geo_query.close()
+        self.results_card.close()
+        if self.health_check_runner is not None:
+            await self.health_check_runner.cleanup()
+        await super().close()
     
     def startup(self, token):
         """
@@ -79,26 +151,26 @@ class GeoguessrDiscordBot(commands.Bot):
         Args:
             token (str): The Discord bot token.
         """
-        log_dir = 'logs'
-        if not os.path.exists(log_dir):
-            os.makedirs(log_dir)
+        upgrade_database(engine)
+        instrument_engine(engine)
 
-        handler = logging.FileHandler(filename='logs/discord.log', encoding='utf-8', mode='w')
-        self.run(token, log_handler=handler, log_level=logging.DEBUG)
+        # Logging is configured by setup_logging, discord.py must not install its own handler
+        self.run(token, log_handler=None)
 
-# Create an instance of the bot and run it
+# Create an instance of the bot
 intents = discord.Intents.default()
 bot = GeoguessrDiscordBot(command_prefix=".", intents=intents)
 
-geo_query = GeoguessrQueries()
+geo_query = AsyncGeoguessrQueries()
+poll_interval = AdaptivePollInterval()
+name_index = NameIndex()
 
 # Import token from file .env
 load_dotenv()
 token = os.getenv('DISCORD_TOKEN')
-guild_id = os.getenv('GUILD_ID')
 
 
-@bot.tree.command(name="register", guild=discord.Object(id=guild_id))
+@bot.tree.command(name="register")
 async def register(ctx, provided_name: str):
     """
     Registers a user with their Geoguessr name.
@@ -114,109 +186,209 @@ async def register(ctx, provided_name: str):
     current_user_id = current_user.id
 
     try:
-        with session_scope(bot) as session:
-
-            # Check if the user is already registered to a geoguessr account
-            if session.query(User).filter(User.discord_id == current_user_id).one_or_none() is not None:
-                name = current_user.name
-                await ctx.channel.send(f"{name} is already registered with Geoguessr Name")
-                raise Exception("User already registered")
-
-            user = session.query(User).filter(User.geo_name == provided_name).one()
-            user.discord_id = current_user_id
+        # Check if the user is already registered to a geoguessr account
+        if not await run_in_db_executor(link_discord_id, current_user_id, provided_name):
+            name = current_user.name
+            await ctx.channel.send(f"{name} is already registered with Geoguessr Name")
+            raise Exception("User already registered")
 
     except NoResultFound:
         await ctx.channel.send(f"Geoguessr Name: {provided_name} not found")
     except Exception as e:
-        print(f"Error occurred registering discord_id {current_user_id}: {e}")
+        logger.error("Error occurred registering discord_id %s: %s", current_user_id, e)
         await ctx.channel.send(f"Failed to register Geoguessr Name: {provided_name}")
 
 
-    icon_png = discord.File("assets/GeoguessrDiscordIcon.png", filename="icon.png")
-    embed = get_user_list_embed()
+    embed, next_after_id = await run_in_db_executor(load_user_list_page, 0, 1)
+    if embed is None:
+        await ctx.response.send_message("Failed to load the user list", ephemeral=True)
+        return
 
-    # Send the embed
-    await ctx.response.send_message(file=icon_png, embed=embed)
-    #await ctx.response.send_message(f"{current_user.name} ' successfully registered Geoguessr Name: {provided_name}")
+    # Send the first page, later pages are loaded when their button is clicked
+    await ctx.response.send_message(file=icon_file(), embed=embed, view=UserListView(next_after_id))
 
-def get_user_list_embed():
+@register.autocomplete('provided_name')
+async def provided_name_autocomplete(ctx, current: str):
     """
-    Creates an embed containing the list of registered users.
+    Suggests Geoguessr names starting with what has been typed, from the in-memory name index.
 
     Args:
-        successfully_registered (bool): Whether a user was successfully registered.
+        ctx (discord.Interaction): The autocomplete interaction.
+        current (str): The text typed so far.
 
     Returns:
-        discord.Embed: The embed containing the user list.
+        list: Up to 25 app_commands.Choice of matching names.
     """
-    # Create an embed
-    embed = discord.Embed(title="List of User", color=0xa5434d)
+    return [app_commands.Choice(name=geo_name[:100], value=geo_name) for geo_name in name_index.search(current)]
 
-    try:
-        with session_scope(bot) as session:
-            users_list = session.query(User).all()
-            geo_names = "\n".join([f"{user.geo_name}" for user in users_list])
-            discord_names = "\n".join([f"{'**Registered**' if user.discord_id else '*Unregistered*'}" for user in users_list])
-    except Exception as e:
-        print(f"Error occurred getting all users: {e}")
+@bot.tree.command(name="stats")
+async def stats(ctx, member: discord.Member = None):
+    """
+    Shows the statistics of a registered user.
+
+    Args:
+        ctx (discord.Interaction): The command interaction.
+        member (discord.Member): The user to show. Defaults to the caller.
+
+    Returns:
+        None
+    """
+    member = member or ctx.user
+    embed = await run_in_db_executor(get_stats_embed, member.id, member.display_name)
+
+    if embed is None:
+        await ctx.response.send_message(f"No stats found for {member.display_name}. Use /register to link a Geoguessr Name.")
         return
 
-    # Add each user to the embed
-    embed.add_field(name="Geoguessr Name", value=f"{geo_names}", inline=True)
-    embed.add_field(name="Registered Status", value=f"{discord_names}", inline=True)
-    embed.set_footer(icon_url="attachment://icon.png")
-    
-    return embed
+    await ctx.response.send_message(embed=embed)
+
+@bot.tree.command(name="leaderboard")
+async def leaderboard(ctx, period: Literal['week', 'month', 'all'] = 'week'):
+    """
+    Shows the users ranked by total score over the last 7 days, this month or all time.
 
-def get_todays_results_embed():
-    results_embed = discord.Embed(title="Todays Results", color=0xa5434d)
+    Args:
+        ctx (discord.Interaction): The command interaction.
+        period (str): The period to rank.
 
+    Returns:
+        None
+    """
+    embed = await run_in_db_executor(get_leaderboard_embed, period)
+    await ctx.response.send_message(embed=embed)
+
+def update_leaderboard_periods():
+    """
+    Moves the week and month leaderboards to the current UTC day.
+    """
     try:
         with session_scope(bot) as session:
-            users_list = session.query(UserDailyResult).all()
-            results = "\n".join([f"{result.user.geo_name}: {result.score}" for result in users_list])
+            roll_over_leaderboards(session)
     except Exception as e:
-        print(f"Error occurred getting all users: {e}")
-        return
+        logger.exception("Error occurred rolling over leaderboards: %s", e)
+
+async def refresh_name_index():
+    """
+    Updates the /register autocomplete index with the current users, touching only changed names.
+    """
+    users = await run_in_db_executor(load_user_names)
+    if users is not None:
+        name_index.update(users)
+
+def link_discord_id(discord_id, provided_name):
+    """
+    Links a Discord user to the Geoguessr user with the given name.
 
-    # Add each user to the embed
-    results_embed.add_field(name="Results", value=f"{results}", inline=True)
+    Args:
+        discord_id (int): The Discord user id.
+        provided_name (str): The Geoguessr name to register.
+
+    Returns:
+        bool: False if the Discord user is already registered, True otherwise.
+
+    Raises:
+        NoResultFound: If no Geoguessr user has that name.
+    """
+    with session_scope(bot) as session:
+        if session.query(User.id).filter(User.discord_id == discord_id).one_or_none() is not None:
+            return False
 
-    return results_embed
+        user = session.query(User).filter(User.geo_name == provided_name).one()
+        user.discord_id = discord_id
+
+    invalidate_user_list()
+    return True
+
+def get_enabled_guild_configs():
+    """
+    Returns the (guild_id, channel_id) of every enabled guild.
+    """
+    with session_scope(bot) as session:
+        return session.query(GuildConfig.guild_id, GuildConfig.channel_id).filter(GuildConfig.enabled.is_(True)).all()
+
+def set_guild_channel(guild_id, channel_id, enabled):
+    """
+    Stores the results channel of a guild and whether posting is enabled.
+
+    Args:
+        guild_id (int): The Discord guild id.
+        channel_id (int): The results channel id, or None to keep the stored one.
+        enabled (bool): Whether results are posted in the guild.
+    """
+    with session_scope(bot) as session:
+        guild_config = get_or_create(session, GuildConfig, guild_id=guild_id)
+        if channel_id is not None:
+            guild_config.channel_id = channel_id
+        guild_config.enabled = enabled
+
+def get_new_results(new_result_ids):
+    """
+    Loads new results together with their users.
+
+    Args:
+        new_result_ids (list): The ids of the new UserDailyResult rows.
+
+    Returns:
+        list: The UserDailyResult rows, detached from the session.
+    """
+    with session_scope(bot) as session:
+        new_results = (
+            session.query(UserDailyResult)
+            .options(joinedload(UserDailyResult.user))
+            .filter(UserDailyResult.user_daily_id.in_(new_result_ids))
+            .all()
+        )
+        session.expunge_all()
+        return new_results
 
 async def update_todays_results():
-    # Get todays results embed
-    results_embed = get_todays_results_embed()
+    """
+    Queues today's results embed for every enabled guild and sends everything queued.
 
-    # Try to find the previous results message
-    if bot.message_channel is not None:
-        try:
-            if bot.previous_results_message is not None:
-                await bot.previous_results_message.edit(embed=results_embed)
-            else:
-                bot.previous_results_message = await bot.message_channel.send(embed=results_embed)
+    The results are shown as a rendered card when it can be drawn, and as text otherwise. The
+    card is rendered again only when the results change.
+    """
+    challenge_token = geo_query.get_current_challenge_token()
+    results_embed = await run_in_db_executor(get_todays_results_embed, challenge_token)
+    todays_results = await run_in_db_executor(get_todays_results, challenge_token)
 
-        except Exception as e:
-            print(f"Error occurred updating results message: {e}")
+    card = None
+    if results_embed is not None and todays_results is not None:
+        today = datetime.datetime.now(tz).strftime("%m-%d-%Y")
+        card = await bot.results_card.render(f"Todays Results {today}", todays_results)
+    if card is not None:
+        results_embed = results_embed.copy()
+        results_embed.clear_fields()
+        results_embed.set_image(url=f"attachment://{CARD_FILENAME}")
+
+    for output in bot.outputs.values():
+        output.queue_results_embed(results_embed, card)
+
+    await bot.flush_outputs()
 
 
 async def create_thread():
     """
-    Creates a new thread for the daily challenge.
+    Creates a new thread for the daily challenge in every enabled guild.
     """
     # Get today's UTC date in a human-readable format
     today = datetime.datetime.now(tz).strftime("%m-%d-%Y")
 
-    if bot.message_channel is not None:
-        await update_todays_results()
+    await update_todays_results()
 
-        bot.todays_thread = await bot.message_channel.create_thread(name=today, type=discord.ChannelType.public_thread, auto_archive_duration=1440, reason=None )
-        await bot.todays_thread.send(f'Spoiler thread for {today} Geoguessr Daily')
+    async def create_guild_thread(output):
+        try:
+            output.thread = await output.message_channel.create_thread(name=today, type=discord.ChannelType.public_thread, auto_archive_duration=1440, reason=None )
+            await output.thread.send(f'Spoiler thread for {today} Geoguessr Daily')
+        except Exception as e:
+            logger.error("Error occurred creating thread in channel %s: %s", output.message_channel.id, e)
+
+    await asyncio.gather(*(create_guild_thread(output) for output in bot.outputs.values()))
 
 @bot.command()
 async def sync_commands(ctx):
     """
-    Syncs the bot commands with the guild.
+    Syncs the bot commands with the current guild.
 
     Args:
         ctx (discord.ext.commands.Context): The command context.
@@ -225,17 +397,17 @@ async def sync_commands(ctx):
         None
     """
     try:
-        print("Syncing for guild", guild_id)
-        guild = bot.get_guild(guild_id) 
-        guild_commands = await bot.tree.sync(guild=discord.Object(id=guild_id))
-        print("Guild commands", guild_commands)
+        logger.info("Syncing for guild %s", ctx.guild.id)
+        bot.tree.copy_global_to(guild=ctx.guild)
+        guild_commands = await bot.tree.sync(guild=ctx.guild)
+        logger.info("Guild commands %s", guild_commands)
     except Exception as e:
-        print(e)
+        logger.error("Error occurred syncing commands: %s", e)
 
 @bot.command()
 async def clear_commands(ctx):
     """
-    Clears the bot commands for the guild.
+    Clears the bot commands for the current guild.
 
     Args:
         ctx (discord.ext.commands.Context): The command context.
@@ -244,12 +416,12 @@ async def clear_commands(ctx):
         None
     """
     try:
-        print("Clearing for guild", guild_id)
-        bot.tree.clear_commands(guild=discord.Object(id=guild_id))
-        guild_commands = await bot.tree.sync(guild=discord.Object(id=guild_id))
-        print("Guild commands", guild_commands)
+        logger.info("Clearing for guild %s", ctx.guild.id)
+        bot.tree.clear_commands(guild=ctx.guild)
+        guild_commands = await bot.tree.sync(guild=ctx.guild)
+        logger.info("Guild commands %s", guild_commands)
     except Exception as e:
-        print(e)
+        logger.error("Error occurred clearing commands: %s", e)
 
 @bot.command()
 async def update_daily(ctx):
@@ -262,7 +434,7 @@ async def update_daily(ctx):
     Returns:
         None
     """
-    print("Update Daily Challenge token")
+    logger.info("Update Daily Challenge token")
     await get_daily_challenge(True)
 
 @bot.command()
@@ -276,8 +448,11 @@ async def update_friends(ctx):
     Returns:
         None
     """
-    print("Update Friends List")
-    geo_query.update_friends()
+    logger.info("Update Friends List")
+    await geo_query.update_friends()
+    invalidate_todays_results_embed()
+    invalidate_user_list()
+    await refresh_name_index()
 
 @bot.command()
 async def update_geoguessr_session(ctx):
@@ -290,17 +465,145 @@ async def update_geoguessr_session(ctx):
     Returns:
         None
     """
-    print("Update Session")
-    geo_query.update_geoguessr_session()
+    logger.info("Update Session")
+    await geo_query.update_geoguessr_session()
+
+@bot.command()
+async def fetch_results(ctx, *challenge_tokens):
+    """
+    Fetches and stores the rounds of the given challenges, today's challenge by default.
+
+    Args:
+        ctx (discord.ext.commands.Context): The command context.
+        challenge_tokens (str): The challenge tokens to fetch.
+
+    Returns:
+        None
+    """
+    challenge_tokens = list(challenge_tokens) or [geo_query.get_current_challenge_token()]
+    challenge_tokens = [challenge_token for challenge_token in challenge_tokens if challenge_token]
+
+    saved = await geo_query.fetch_results(challenge_tokens)
+    logger.info("Stored %s rounds for %s challenges", saved, len(challenge_tokens))
+
+@bot.command()
+async def rebuild_stats(ctx):
+    """
+    Recomputes every user's statistics and the leaderboards from the full results history.
+
+    Args:
+        ctx (discord.ext.commands.Context): The command context.
+
+    Returns:
+        None
+    """
+    logger.info("Rebuild Stats")
+
+    def rebuild():
+        with session_scope(bot) as session:
+            rebuild_user_stats(session)
+            rebuild_leaderboards(session)
+
+    await run_in_db_executor(rebuild)
 
 @bot.command()
 async def get_db_data(ctx, table_name):
     return
 
+@bot.command(name='export_history')
+@commands.is_owner()
+async def export_history_command(ctx, export_format: Literal['jsonl', 'csv', 'parquet'] = 'jsonl', since: str = None, until: str = None):
+    """
+    Exports the full results history, optionally limited to the challenges between two days.
+
+    Args:
+        ctx (discord.ext.commands.Context): The command context.
+        export_format (str): 'jsonl', 'csv' or 'parquet'.
+        since (str): Only export challenges from this day on, YYYY-MM-DD.
+        until (str): Only export challenges up to and including this day, YYYY-MM-DD.
+
+    Returns:
+        None
+    """
+    try:
+        since = datetime.date.fromisoformat(since) if since else None
+        until = datetime.date.fromisoformat(until) if until else None
+    except ValueError:
+        await ctx.send("Dates must be given as YYYY-MM-DD")
+        return
+
+    await run_export(ctx, export_format, since, until, from_watermark=False)
+
+@bot.command()
+@commands.is_owner()
+async def export_new_history(ctx, export_format: Literal['jsonl', 'csv', 'parquet'] = 'jsonl'):
+    """
+    Exports the results added since the previous export_new_history, along with all users and challenges.
+    Scores changed on existing results, e.g. by a backfill, are only in a full export.
+
+    Args:
+        ctx (discord.ext.commands.Context): The command context.
+        export_format (str): 'jsonl', 'csv' or 'parquet'.
+
+    Returns:
+        None
+    """
+    await run_export(ctx, export_format, None, None, from_watermark=True)
+
+async def run_export(ctx, export_format, since, until, from_watermark):
+    """
+    Writes an export to its own directory under EXPORT_DIR on the database executor and
+    attaches the files to the reply when they are small enough to upload.
+
+    The export holds the members of every guild the bot serves, so the reply is sent to the
+    caller by direct message rather than to the channel the command was typed in.
+
+    Args:
+        ctx (discord.ext.commands.Context): The command context.
+        export_format (str): 'jsonl', 'csv' or 'parquet'.
+        since (datetime.date): Only export challenges from this day on.
+        until (datetime.date): Only export challenges up to and including this day.
+        from_watermark (bool): Whether to only export results added past the stored watermark and advance it.
+
+    Returns:
+        None
+    """
+    output_dir = os.path.join(EXPORT_DIR, datetime.datetime.now(tz=tz).strftime('%Y%m%dT%H%M%S'))
+    watermark_path = os.path.join(EXPORT_DIR, 'watermark.json')
+
+    def export():
+        watermark = load_watermark(watermark_path) if from_watermark else None
+        result = export_history(output_dir, export_format, since, until, watermark)
+        if from_watermark:
+            save_watermark(watermark_path, result['watermark'])
+        return result
+
+    logger.info("Exporting history as %s to %s", export_format, output_dir)
+    try:
+        result = await run_in_db_executor(export)
+    except Exception as e:
+        logger.error("Error occurred exporting history: %s", e)
+        await ctx.send(f"Export failed: {e}")
+        return
+
+    counts = ", ".join(f"{rows} {dataset}" for dataset, rows in result['rows'].items())
+    try:
+        if sum(os.path.getsize(path) for path in result['paths']) <= EXPORT_UPLOAD_LIMIT:
+            await ctx.author.send(f"Exported {counts}", files=[discord.File(path) for path in result['paths']])
+        else:
+            await ctx.author.send(f"Exported {counts} to {output_dir}, too large to upload")
+    except discord.HTTPException as e:
+        logger.error("Error occurred sending export by direct message: %s", e)
+        await ctx.send(f"Exported {counts} to {output_dir}, could not send it by direct message")
+        return
+
+    if ctx.guild is not None:
+        await ctx.send("Sent the export by direct message")
+
 @bot.command()
 async def enable(ctx):
     """
-    Enables the bot for the current channel.
+    Enables the bot for the current channel, replacing any other channel of this guild.
 
     Args:
         ctx (discord.ext.commands.Context): The command context.
@@ -308,11 +611,34 @@ async def enable(ctx):
     Returns:
         None
     """
+    guild_id = ctx.guild.id
     channel_id = ctx.channel.id
     channel_name = ctx.channel.name
-    bot.message_channel = bot.get_channel(channel_id)
 
-    print(f"Enabling bot for channel: {channel_name} with id: {channel_id}")
+    await run_in_db_executor(set_guild_channel, guild_id, channel_id, True)
+
+    bot.outputs.setdefault(guild_id, DiscordOutputStage()).message_channel = bot.get_channel(channel_id)
+
+    logger.info("Enabling bot for channel: %s with id: %s", channel_name, channel_id)
+
+@bot.command()
+async def disable(ctx):
+    """
+    Stops posting results in the current guild.
+
+    Args:
+        ctx (discord.ext.commands.Context): The command context.
+
+    Returns:
+        None
+    """
+    guild_id = ctx.guild.id
+
+    await run_in_db_executor(set_guild_channel, guild_id, None, False)
+
+    bot.outputs.pop(guild_id, None)
+
+    logger.info("Disabling bot for guild: %s", guild_id)
 
 @tasks.loop(time=midnight)
 async def get_daily_challenge_loop(self):
@@ -325,6 +651,7 @@ async def get_daily_challenge_loop(self):
     Returns:
         None
     """
+    await run_in_db_executor(update_leaderboard_periods)
     await get_daily_challenge()
 
 async def get_daily_challenge(manual_attempt=False):
@@ -335,20 +662,20 @@ async def get_daily_challenge(manual_attempt=False):
         None
     """
     # get the daily challenge
-    print("getting daily challenge")
+    logger.info("Getting daily challenge")
     try:
-        geo_query.get_daily_challenge_token()
+        await geo_query.get_daily_challenge_token()
         await create_thread()
     except Exception as e:
-        print(f"Error occurred getting daily challenge: {e}")
-        if manual_attempt is False:
+        logger.error("Error occurred getting daily challenge: %s", e)
+        if manual_attempt is False and not retry_daily_challenge.is_running():
             retry_daily_challenge.start(bot)
 
 @tasks.loop(minutes=1, count=5)
 async def retry_daily_challenge(self):
     """
     Task loop for retrying to get the daily challenge. 
-    Attempts up to 5 times every minute.
+    Attempts up to 5 times every minute and stops at the first attempt that gets the token.
 
     Args:
         self: The GeoguessrDiscordBot instance.
@@ -357,54 +684,79 @@ async def retry_daily_challenge(self):
         None
     """
     # retry getting the daily challenge
-    print("retrying daily challenge")
-    success = geo_query.get_daily_challenge_token()
-    if success is True:
+    logger.info("Retrying daily challenge")
+    try:
+        challenge_token = await geo_query.get_daily_challenge_token()
+    except Exception as e:
+        logger.warning("Retry of daily challenge failed: %s", e)
+        return
+
+    # get_daily_challenge_token returns the token, not a success flag
+    if challenge_token:
         retry_daily_challenge.stop()
+        await create_thread()
 
 
-@tasks.loop(seconds=60)
+@tasks.loop(seconds=poll_interval.min_interval)
 async def check_daily_results_loop(self):
     """
     Task loop for checking the daily results.
+    The interval adapts to how often new results arrive, see AdaptivePollInterval.
 
     Args:
         self: The GeoguessrDiscordBot instance.
 
+    Returns:
+        None
+    """
+    with POLL_SECONDS.time():
+        await check_daily_results()
+
+async def check_daily_results():
+    """
+    Polls for new results and posts them to every enabled guild.
+
     Returns:
         None
     """
     # check the daily results
-    print("Checking daily results")
+    logger.debug("Checking daily results", extra={'sample': True})
     
     # Returns a list of UserDailyResults
-    new_result_ids = geo_query.check_for_new_results()
+    new_result_ids = await geo_query.check_for_new_results()
+
+    # While Geoguessr is down the circuit breaker refuses requests, so wait until it allows a trial one
+    interval = max(poll_interval.next_interval(new_result_ids is not None), geo_query.policy.breaker.seconds_until_retry())
+    check_daily_results_loop.change_interval(seconds=interval)
 
     if new_result_ids is None:
         return
+
+    invalidate_todays_results_embed()
     
     try:
-        with session_scope(bot) as session:
-            new_results = session.query(UserDailyResult).filter(UserDailyResult.user_daily_id.in_(new_result_ids)).all()
-
-            for result in new_results:
-                # Get the user associated with the result
-                user = result.user
-                if user.discord_id is not None:
-                    discord_user = await self.fetch_user(user.discord_id)
-                    discord_mention = discord_user.mention
-                else:
-                    discord_mention = user.geo_name
+        new_results = await run_in_db_executor(get_new_results, new_result_ids)
+        for output in bot.outputs.values():
+            queue_result_announcements(output, new_results)
 
-                # send a message to a specific thread
-                await update_todays_results()
+    except Exception as e:
+        logger.exception("Error occurred checking daily results: %s", e)
 
-                if bot.todays_thread is not None:
-                    await bot.todays_thread.send(f"New result: {discord_mention} scored - {result.score} points!")
+    # One results edit and one thread announcement for the whole cycle
+    await update_todays_results()
 
-    except Exception as e:
-        print(f"Error occurred checking daily results: {e}")
+    # Store the rounds of the new results
+    challenge_token = geo_query.get_current_challenge_token()
+    if challenge_token is not None:
+        await geo_query.fetch_results([challenge_token])
 
 
 # Run the client
-bot.startup(token)
\ No newline at end of file
+if __name__ == '__main__':
+    # Card workers are forked while the process is still single threaded, before the log writer,
+    # the database executor and discord.py start their threads
+    bot.results_card.start()
+
+    # Route all logging through the background writer before anything logs
+    setup_logging()
+    bot.startup(token)
\ No newline at end of file
@@ -0,0 +1,251 @@
+# Standard library imports
+import datetime
+import logging
+
+# Third-party imports
+import discord
+
+# Local application imports
+from database import User, UserDailyResult, UserStats, LeaderboardEntry, session_scope
+
+logger = logging.getLogger(__name__)
+
+EMBED_COLOR = 0xa5434d
+LEADERBOARD_SIZE = 25  # Users shown in a leaderboard embed
+USER_LIST_PAGE_SIZE = 20  # Users shown per page of the user list, well within the 1024 characters of a field
+LEADERBOARD_TITLES = {'week': "Leaderboard - Last 7 Days", 'month': "Leaderboard - This Month", 'all': "Leaderboard - All Time"}
+
+# Results and rendered results embed for today's challenge, keyed by challenge token
+_todays_results_cache = {'challenge_token': None, 'results': None, 'embed': None}
+
+# Pages of the user list keyed by the user id they start after, dropped by invalidate_user_list
+_user_list_pages = {}
+
+
+def get_user_list_page(after_id=0):
+    """
+    Returns one page of the user list, fetched with a keyset query on the user id.
+
+    Pages are cached until invalidate_user_list is called.
+
+    Args:
+        after_id (int): The id of the last user of the previous page, 0 for the first page.
+
+    Returns:
+        tuple: A list of (geo_name, registered) pairs and the after_id of the next page, None on
+            the last page. None if the users could not be read.
+    """
+    if after_id in _user_list_pages:
+        return _user_list_pages[after_id]
+
+    try:
+        with session_scope(None) as session:
+            # One row past the page tells whether there is a next page
+            rows = (
+                session.query(User.id, User.geo_name, User.discord_id)
+                .filter(User.id > after_id)
+                .order_by(User.id)
+                .limit(USER_LIST_PAGE_SIZE + 1)
+                .all()
+            )
+    except Exception as e:
+        logger.error("Error occurred getting users after id %s: %s", after_id, e)
+        return None
+
+    users = [(geo_name, discord_id is not None) for _, geo_name, discord_id in rows[:USER_LIST_PAGE_SIZE]]
+    next_after_id = rows[USER_LIST_PAGE_SIZE - 1].id if len(rows) > USER_LIST_PAGE_SIZE else None
+
+    _user_list_pages[after_id] = (users, next_after_id)
+    return _user_list_pages[after_id]
+
+
+def get_user_list_embed(after_id=0, page_number=1):
+    """
+    Creates an embed containing one page of the list of registered users.
+
+    Args:
+        after_id (int): The id of the last user of the previous page, 0 for the first page.
+        page_number (int): The number of the page, shown in the footer.
+
+    Returns:
+        discord.Embed: The embed containing the page of the user list.
+    """
+    page = get_user_list_page(after_id)
+    if page is None:
+        return
+    users, _ = page
+
+    # Create an embed
+    embed = discord.Embed(title="List of User", color=EMBED_COLOR)
+
+    geo_names = "\n".join([f"{geo_name}" for geo_name, _ in users])
+    discord_names = "\n".join([f"{'**Registered**' if registered else '*Unregistered*'}" for _, registered in users])
+
+    # Add each user to the embed
+    embed.add_field(name="Geoguessr Name", value=geo_names or "No users yet", inline=True)
+    embed.add_field(name="Registered Status", value=discord_names or "-", inline=True)
+    embed.set_footer(text=f"Page {page_number}", icon_url="attachment://icon.png")
+
+    return embed
+
+
+def invalidate_user_list():
+    """
+    Drops the cached user list pages. Call whenever users are added, renamed or registered.
+    """
+    _user_list_pages.clear()
+
+
+def get_todays_results(challenge_token):
+    """
+    Returns today's results sorted by score.
+
+    The results are cached until invalidate_todays_results_embed is called or the challenge changes.
+
+    Args:
+        challenge_token (str): The token of today's challenge.
+
+    Returns:
+        list: (geo_name, score) pairs, best first, or None if they could not be read.
+    """
+    if challenge_token is not None and _todays_results_cache['challenge_token'] == challenge_token and _todays_results_cache['results'] is not None:
+        return _todays_results_cache['results']
+
+    try:
+        with session_scope(None) as session:
+            todays_results = (
+                session.query(User.geo_name, UserDailyResult.score)
+                .join(User, UserDailyResult.user_id == User.id)
+                .filter(UserDailyResult.challenge_token == challenge_token)
+                .order_by(UserDailyResult.score.desc())
+                .all()
+            )
+    except Exception as e:
+        logger.error("Error occurred getting todays results: %s", e)
+        return None
+
+    results = [(geo_name, score) for geo_name, score in todays_results]
+    if _todays_results_cache['challenge_token'] != challenge_token:
+        _todays_results_cache['embed'] = None
+    _todays_results_cache['challenge_token'] = challenge_token
+    _todays_results_cache['results'] = results
+
+    return results
+
+
+def get_todays_results_embed(challenge_token):
+    """
+    Creates an embed with today's results sorted by score.
+
+    The embed is cached until invalidate_todays_results_embed is called or the challenge changes.
+
+    Args:
+        challenge_token (str): The token of today's challenge.
+
+    Returns:
+        discord.Embed: The embed containing today's results.
+    """
+    if challenge_token is not None and _todays_results_cache['challenge_token'] == challenge_token and _todays_results_cache['embed'] is not None:
+        return _todays_results_cache['embed']
+
+    todays_results = get_todays_results(challenge_token)
+    if todays_results is None:
+        return
+
+    results_embed = discord.Embed(title="Todays Results", color=EMBED_COLOR)
+    results = "\n".join([f"{geo_name}: {score}" for geo_name, score in todays_results])
+
+    # Add each user to the embed
+    results_embed.add_field(name="Results", value=results or "No results yet", inline=True)
+
+    _todays_results_cache['embed'] = results_embed
+
+    return results_embed
+
+
+def invalidate_todays_results_embed():
+    """
+    Drops the cached results and embed so the next call rebuilds them. Call whenever today's results change.
+    """
+    _todays_results_cache['challenge_token'] = None
+    _todays_results_cache['results'] = None
+    _todays_results_cache['embed'] = None
+
+
+def get_stats_embed(discord_id, display_name):
+    """
+    Creates an embed with the statistics of a registered user, read from the user_stats table.
+
+    Args:
+        discord_id (int): The Discord id of the user.
+        display_name (str): The name shown in the title.
+
+    Returns:
+        discord.Embed: The statistics embed, or None if the user is not registered or has no results.
+    """
+    try:
+        with session_scope(None) as session:
+            row = (
+                session.query(UserStats, User.geo_name)
+                .join(User, UserStats.user_id == User.id)
+                .filter(User.discord_id == discord_id)
+                .one_or_none()
+            )
+            if row is None:
+                return None
+            user_stats, geo_name = row
+            session.expunge(user_stats)
+    except Exception as e:
+        logger.error("Error occurred getting stats of discord_id %s: %s", discord_id, e)
+        return None
+
+    # A streak is only current if the last game was today or yesterday
+    today = datetime.datetime.now(tz=datetime.timezone.utc).date()
+    last_played = user_stats.last_played
+    current_streak = user_stats.current_streak if last_played and (today - last_played).days <= 1 else 0
+    average_score = round(user_stats.total_score / user_stats.games_played) if user_stats.games_played else 0
+
+    embed = discord.Embed(title=f"Stats for {display_name} ({geo_name})", color=EMBED_COLOR)
+    embed.add_field(name="Games Played", value=user_stats.games_played, inline=True)
+    embed.add_field(name="Average Score", value=average_score, inline=True)
+    embed.add_field(name="Best Score", value=user_stats.best_score, inline=True)
+    embed.add_field(name="Wins", value=user_stats.wins, inline=True)
+    embed.add_field(name="Current Streak", value=current_streak, inline=True)
+    embed.add_field(name="Longest Streak", value=user_stats.longest_streak, inline=True)
+
+    return embed
+
+
+def get_leaderboard_embed(period):
+    """
+    Creates an embed ranking users by total score over a period, read from the leaderboard table.
+
+    Args:
+        period (str): 'week', 'month' or 'all'.
+
+    Returns:
+        discord.Embed: The embed containing the ranking.
+    """
+    embed = discord.Embed(title=LEADERBOARD_TITLES[period], color=EMBED_COLOR)
+
+    try:
+        with session_scope(None) as session:
+            entries = (
+                session.query(User.geo_name, LeaderboardEntry.total_score, LeaderboardEntry.games_played)
+                .join(User, LeaderboardEntry.user_id == User.id)
+                .filter(LeaderboardEntry.period == period)
+                .order_by(LeaderboardEntry.total_score.desc())
+                .limit(LEADERBOARD_SIZE)
+                .all()
+            )
+    except Exception as e:
+        logger.error("Error occurred getting %s leaderboard: %s", period, e)
+        return
+
+    ranking = "\n".join([
+        f"{rank}. {geo_name}: {total_score} ({games_played} games)"
+        for rank, (geo_name, total_score, games_played) in enumerate(entries, start=1)
+    ])
+    embed.add_field(name="Total Score", value=ranking or "No results yet", inline=True)
+
+    return embed
\ No newline at end of file
@@ -0,0 +1,158 @@
+# Standard library imports
+from typing import List, Optional
+
+# Third-party imports
+from pydantic import BaseModel, ConfigDict, ValidationError
+from pydantic.alias_generators import to_camel
+
+
+class SchemaDriftError(ValueError):
+    """
+    Raised when a Geoguessr response no longer has the shape the bot reads.
+    """
+
+
+class GeoguessrModel(BaseModel):
+    """
+    Base of the Geoguessr response models.
+
+    Fields are snake_case in Python and camelCase in the JSON. Only the fields the bot reads are
+    declared; everything else in a response is skipped while parsing instead of being decoded
+    into Python objects.
+
+    List fields are required where Geoguessr always sends them: with a default, pydantic 2.7
+    decodes the whole JSON subtree of the field into Python objects before validating it, which
+    is slower and takes more memory than json.loads.
+    """
+
+    model_config = ConfigDict(alias_generator=to_camel, populate_by_name=True, frozen=True)
+
+
+class FriendResult(GeoguessrModel):
+    """
+    A friend's entry in the friends section of the daily challenge.
+    """
+
+    id: str
+    total_score: int
+
+
+class DailyChallengeToken(GeoguessrModel):
+    """
+    The challenges/daily-challenges/today response, read for the token only.
+    """
+
+    token: str
+
+
+class DailyChallenge(DailyChallengeToken):
+    """
+    The challenges/daily-challenges/today response with the friends' results.
+
+    The friends section is missing or null when no friend has played yet, so it is optional and
+    read as friend_results.
+    """
+
+    friends: Optional[List[FriendResult]] = None
+
+    @property
+    def friend_results(self) -> List[FriendResult]:
+        """
+        The friends' results, empty when the section is missing or null.
+        """
+        return self.friends or []
+
+
+class Friend(GeoguessrModel):
+    """
+    An entry of the friends summary.
+    """
+
+    user_id: str
+    nick: str
+
+
+class FriendsSummary(GeoguessrModel):
+    """
+    One page of the social/friends/summary response.
+    """
+
+    friends: List[Friend]
+    friends_count: Optional[int] = None
+
+
+class ProfileUser(GeoguessrModel):
+    id: str
+    nick: str
+
+
+class Profile(GeoguessrModel):
+    """
+    The profiles response of the signed in account.
+    """
+
+    user: ProfileUser
+
+
+class Guess(GeoguessrModel):
+    """
+    One round of a player's game.
+    """
+
+    round_score_in_points: Optional[int] = None
+    distance_in_meters: Optional[float] = None
+    time: Optional[int] = None
+    timed_out: Optional[bool] = None
+
+
+class ResultPlayer(GeoguessrModel):
+    guesses: List[Guess]
+
+
+class ResultGame(GeoguessrModel):
+    player: ResultPlayer
+
+
+class ResultItem(GeoguessrModel):
+    """
+    An entry of a results page items array.
+    """
+
+    user_id: str
+    game: ResultGame
+
+
+class ResultsPage(GeoguessrModel):
+    """
+    One page of the results/highscores response.
+    """
+
+    items: List[ResultItem]
+    pagination_token: Optional[str] = None
+
+
+def parse_payload(model, body):
+    """
+    Parses a raw Geoguessr response body straight into a model.
+
+    The body is decoded by pydantic's native JSON parser, so no intermediate dict of the whole
+    response is built.
+
+    Args:
+        model (type): The GeoguessrModel subclass describing the response.
+        body (bytes): The response body.
+
+    Returns:
+        GeoguessrModel: The parsed response.
+
+    Raises:
+        SchemaDriftError: If the body is not JSON or lacks a field the model requires.
+    """
+    try:
+        return model.model_validate_json(body)
+    except ValidationError as e:
+        problems = '; '.join(
+            f"{'.'.join(str(part) for part in error['loc']) or '<root>'}: {error['msg']}"
+            for error in e.errors()[:5]
+        )
+        raise SchemaDriftError(f"Geoguessr response no longer matches {model.__name__} ({e.error_count()} errors): {problems}") from e
\ No newline at end of file
@@ -1,26 +1,109 @@
 # Standard library imports
+import asyncio
 import configparser
 from datetime import datetime
 import datetime
+import hashlib
 import json
+import logging
+import math
 import sched
 import sqlite3
 import time
 import os
+from collections import namedtuple
+from urllib.parse import quote
 
 # Related third party imports
+import aiohttp
 import requests
 import schedule
+from sqlalchemy import exists
+from sqlalchemy.dialects.sqlite import insert
+from yarl import URL
 
 # Local application/library specific imports
-from database import User, Challenge, UserDailyResult, engine, Session, Base, get_or_create, session_scope
+from Metrics import GEOGUESSR_REQUESTS, GEOGUESSR_ERRORS, LAST_SUCCESSFUL_POLL
+from RequestPolicy import CircuitOpenError, geoguessr_policy
+from GeoguessrModels import DailyChallenge, DailyChallengeToken, FriendsSummary, Profile, ResultsPage, SchemaDriftError, parse_payload
+from database import User, Challenge, UserDailyResult, UserRoundResult, engine, Session, Base, session_scope, run_in_db_executor, update_user_stats, update_leaderboards
 
 from dotenv import load_dotenv
 
 geoguessr_base_url = 'https://geoguessr.com/api'
-BASE_V3_URL = "https://www.geoguessr.com/api/v3/"  # Base URL for all V3 endpoints
+BASE_V3_URL = os.getenv('GEOGUESSR_V3_URL', "https://www.geoguessr.com/api/v3/")  # Base URL for all V3 endpoints, overridable to target a fake server
 BASE_V4_URL = "https://www.geoguessr.com/api/v4/"  # Base URL for all V4 endpoints
 
+logger = logging.getLogger(__name__)
+
+REQUEST_TIMEOUT = float(os.getenv('GEOGUESSR_REQUEST_TIMEOUT', 10))  # Seconds allowed per Geoguessr request
+CONNECTION_POOL_SIZE = int(os.getenv('GEOGUESSR_POOL_SIZE', 10))  # Max open keep-alive connections
+RESULTS_CONCURRENCY = int(os.getenv('GEOGUESSR_RESULTS_CONCURRENCY', 4))  # Max results pages requested at once
+RESULTS_PAGE_SIZE = 26  # Largest page the results endpoint returns
+FRIENDS_MAX_PAGES = 50  # Most friends summary pages followed in one sync
+REMOVE_BATCH_SIZE = 500  # Values per IN (...) clause when removing users
+
+CurrentChallenge = namedtuple('CurrentChallenge', ['token', 'date'])
+
+
+def results_page_url(challenge_token, pagination_token=None, friends=True) -> str:
+    """
+    Builds the URL of one page of a challenge's results.
+
+    Args:
+        challenge_token (str): The challenge to get the results of.
+        pagination_token (str): The token of the page, None for the first one.
+        friends (bool): Whether to only return the results of friends.
+
+    Returns:
+        str: The URL of the page.
+    """
+    url = f'{BASE_V3_URL}results/highscores/{challenge_token}?friends={str(friends).lower()}&limit={RESULTS_PAGE_SIZE}&minRounds=5'
+    if pagination_token:
+        url += f'&paginationToken={quote(pagination_token)}'
+    return url
+
+
+def daily_challenge_url() -> str:
+    """
+    Builds the URL of today's daily challenge with the friends' results.
+
+    Returns:
+        str: The URL of the daily challenge.
+    """
+    return f'{BASE_V3_URL}challenges/daily-challenges/today/'
+
+
+def friends_summary_url(page=0) -> str:
+    """
+    Builds the URL of one page of the friends summary.
+
+    Args:
+        page (int): The page number, starting at 0.
+
+    Returns:
+        str: The URL of the page.
+    """
+    return f'{BASE_V3_URL}social/friends/summary?page={page}'
+
+
+def endpoint_label(url) -> str:
+    """
+    Reduces a Geoguessr URL to its endpoint, without tokens or query, for use as a metrics label.
+
+    Args:
+        url (str): The requested URL.
+
+    Returns:
+        str: The first two path segments after the API version, e.g. 'results/highscores'.
+    """
+    path = URL(url).path
+    for prefix in ('/api/v3/', '/api/v4/'):
+        if path.startswith(prefix):
+            path = path[len(prefix):]
+    return '/'.join(path.strip('/').split('/')[:2])
+
+
 class GeoguessrQueries:
     """
     A class that contains methods for querying Geoguessr API and updating the database with the results.
@@ -28,10 +111,66 @@ class GeoguessrQueries:
 
     ncfa_token = None
     requests_session = None
+    friends_fingerprint = None
+
+    # Friends with results in the last stored payload who are not users yet
+    unknown_friend_ids = frozenset()
+
+    # Rate limit, retries and circuit breaker shared by every instance, see RequestPolicy
+    policy = geoguessr_policy
+
+    # Process-level cache of the latest daily challenge, shared by every instance
+    current_challenge = None
 
     def __init__(self):
         load_dotenv()
 
+    @staticmethod
+    def _cache_challenge(token, time):
+        """
+        Stores the latest daily challenge in the process-level cache.
+
+        Args:
+            token (str): The daily challenge token.
+            time (datetime.datetime): When the challenge was retrieved, in UTC.
+        """
+        GeoguessrQueries.current_challenge = CurrentChallenge(token=token, date=time.date())
+
+    @staticmethod
+    def get_current_challenge_token():
+        """
+        Returns the token of today's challenge from the cache, without touching the database.
+
+        The cache is invalidated once the UTC date rolls over past the cached challenge.
+
+        Returns:
+            str: Today's challenge token, or None if it has not been retrieved yet.
+        """
+        current_challenge = GeoguessrQueries.current_challenge
+        if current_challenge is None:
+            return None
+
+        if current_challenge.date != datetime.datetime.now(tz=datetime.timezone.utc).date():
+            GeoguessrQueries.current_challenge = None
+            return None
+
+        return current_challenge.token
+
+    def load_current_challenge(self):
+        """
+        Rebuilds the current challenge cache from the latest stored challenge. Called at startup.
+
+        Returns:
+            str: Today's challenge token, or None if it has not been retrieved yet.
+        """
+        with session_scope(self) as session:
+            latest_challenge = session.query(Challenge.challenge_token, Challenge.time).order_by(Challenge.time.desc()).first()
+
+        if latest_challenge is not None and latest_challenge.time is not None:
+            self._cache_challenge(latest_challenge.challenge_token, latest_challenge.time)
+
+        return self.get_current_challenge_token()
+
     def update_geoguessr_session(self):
         """
         Updates the session with the necessary authentication token.
@@ -40,7 +179,34 @@ class GeoguessrQueries:
 
         #self.ncfa_token = self._sign_in()
         self.requests_session = requests.Session()
-        self.requests_session.cookies.set("_ncfa", self.ncfa_token, domain="www.geoguessr.com")
+        self.requests_session.cookies.set("_ncfa", self.ncfa_token, domain=URL(BASE_V3_URL).host)
+
+    def _get_json_blocking(self, url, model, **kwargs):
+        """
+        Sends a GET request under the request policy and parses the JSON body into a model.
+
+        Args:
+            url (str): The URL to request.
+            model (type): The GeoguessrModel describing the response.
+            **kwargs: Passed on to the get call, e.g. timeout.
+
+        Returns:
+            GeoguessrModel: The parsed response body.
+
+        Raises:
+            CircuitOpenError: If requests are paused after repeated failures.
+            SchemaDriftError: If the response no longer matches the model.
+            requests.RequestException: If the last attempt failed.
+        """
+        # Without a session yet, fall back to an anonymous request as the daily challenge allows
+        session = self.requests_session or requests
+
+        def attempt():
+            response = session.get(url, **kwargs)
+            response.raise_for_status()
+            return parse_payload(model, response.content)
+
+        return self.policy.call_blocking(attempt)
 
     def get_daily_challenge_token(self):
         """
@@ -53,14 +219,30 @@ class GeoguessrQueries:
         daily_challenge_endpoint = 'challenges/daily-challenges/today'
         daily_challenge_url = f'{BASE_V3_URL}{daily_challenge_endpoint}'
 
-        response = requests.get(daily_challenge_url).json()
-        token = response.get('token')
-        challenge = Challenge(time=datetime.datetime.now(tz=datetime.timezone.utc), challenge_token=token)
+        daily_challenge = self._get_json_blocking(daily_challenge_url, DailyChallengeToken)
+        return self._save_daily_challenge(daily_challenge)
+
+    def _save_daily_challenge(self, daily_challenge) -> str:
+        """
+        Stores the daily challenge in the database.
+
+        Args:
+            daily_challenge (DailyChallengeToken): The daily challenge response.
+
+        Returns:
+            str: The token for the current daily challenge.
+        """
+        token = daily_challenge.token
+        time = datetime.datetime.now(tz=datetime.timezone.utc)
+        challenge = Challenge(time=time, challenge_token=token)
 
         with session_scope(self) as session:
             session.add(challenge)
             session.commit()
-    
+
+        self._cache_challenge(token, time)
+        return token
+
     def check_for_new_results(self) -> list:
         """
         Checks for new results in the daily challenge and adds them to the database.
@@ -68,66 +250,213 @@ class GeoguessrQueries:
         Returns:
             list: A list of new friend daily results added to the database.
         """
+        if self.get_current_challenge_token() is None:
+            logger.debug("Today's challenge has not been retrieved yet.", extra={'sample': True})
+            return None
+
         # Get the current daily challenge token
         daily_challenge_endpoint = 'challenges/daily-challenges/today/'
         friends_flags = '?friends=true'
         daily_challenge_url = f'{BASE_V3_URL}{daily_challenge_endpoint}'
         try:
-            daily_challenge_response = self.requests_session.get(daily_challenge_url)
-            daily_challenge_data = daily_challenge_response.json()
+            daily_challenge = self._get_json_blocking(daily_challenge_url, DailyChallenge)
+        except CircuitOpenError as e:
+            logger.debug("Skipping poll: %s", e, extra={'sample': True})
+            return None
+        except SchemaDriftError as e:
+            logger.error("Error occurred reading daily_challenge_data: %s", e, extra={'sample': True})
+            return None
         except Exception as e:
-            print(f"Error occurred getting daily_challenge_data: {e}")
+            logger.warning("Error occurred getting daily_challenge_data: %s", e)
             return None
 
-        try:
-            with session_scope(self) as session:
-                todays_challenge = session.query(Challenge).order_by(Challenge.time.desc()).first()
-                todays_challenge_date = datetime.datetime.strptime(todays_challenge.time, '%Y-%m-%d %H:%M:%S.%f%z').date() if todays_challenge else None
+        return self._save_new_results(daily_challenge)
 
-                if not todays_challenge:
-                    print("No challenge found.")
-                    return None
-        
-        
-                # Check if the latest challenge is today's challenge 
-                if datetime.datetime.now(tz=datetime.timezone.utc).date() != todays_challenge_date:
-                    print("Today's challenge has not been retrieved yet.")
-                    return None
+    @staticmethod
+    def _friends_fingerprint(challenge_token, daily_challenge) -> str:
+        """
+        Hashes the friends section of a daily challenge response.
 
-                new_result_ids = []
+        Args:
+            challenge_token (str): The token of the challenge the response belongs to.
+            daily_challenge (DailyChallenge): The daily challenge response fetched with the friends list.
 
-                for friend_result in daily_challenge_data.get('friends', []):
-                    # Get the user with the corresponding geo_id
-                    user = session.query(User).filter(User.geo_id == friend_result['id']).first()
+        Returns:
+            str: A digest of the friend ids and scores that changes whenever a friend submits.
+        """
+        friend_scores = sorted((friend_result.id, friend_result.total_score) for friend_result in daily_challenge.friend_results)
+        return hashlib.sha1(json.dumps([challenge_token, friend_scores]).encode()).hexdigest()
 
-                    # Get the UserDailyResult for the current friend and challenge
-                    user_daily_result = (
-                        session.query(UserDailyResult)
-                        .filter(
-                            UserDailyResult.user == user,
-                            UserDailyResult.challenge == todays_challenge
-                        )
-                        .first()
-                    )
+    def _save_new_results(self, daily_challenge) -> list:
+        """
+        Adds the friend results of the daily challenge that are not yet stored to the database.
 
-                    # If the friend has not submitted a score, insert the score into the UserDailyResult table
-                    if not user_daily_result and user:
+        The database is skipped entirely when the friends section is unchanged since the last
+        successful call. Friends with results who are not users yet are kept in unknown_friend_ids;
+        once update_friends adds them, the next call stores their results.
 
-                        user_daily_result = UserDailyResult(
-                            user=user,
-                            score=friend_result['totalScore'],
-                            challenge=todays_challenge
+        Args:
+            daily_challenge (DailyChallenge): The daily challenge response fetched with the friends list.
+
+        Returns:
+            list: A list of new friend daily result ids added to the database.
+        """
+        challenge_token = self.get_current_challenge_token()
+        if challenge_token is None:
+            logger.debug("Today's challenge has not been retrieved yet.", extra={'sample': True})
+            return None
+        challenge_date = GeoguessrQueries.current_challenge.date
+
+        fingerprint = self._friends_fingerprint(challenge_token, daily_challenge)
+        if fingerprint == self.friends_fingerprint:
+            return None
+
+        new_result_ids = []
+        unknown_friend_ids = frozenset()
+        try:
+            # Reconcile the whole friends payload with one query per table instead of one per friend
+            friend_scores = {friend_result.id: friend_result.total_score for friend_result in daily_challenge.friend_results}
+
+            if friend_scores:
+                with session_scope(self) as session:
+                    users = session.query(User.id, User.geo_id).filter(User.geo_id.in_(friend_scores)).all()
+                    user_ids = [user_id for user_id, _ in users]
+                    unknown_friend_ids = frozenset(friend_scores) - {geo_id for _, geo_id in users}
+
+                    submitted_user_ids = {
+                        user_id for (user_id,) in session.query(UserDailyResult.user_id)
+                        .filter(
+                            UserDailyResult.challenge_token == challenge_token,
+                            UserDailyResult.user_id.in_(user_ids)
                         )
-                        session.add(user_daily_result)
-                        session.flush()
-                        new_result_ids.append(user_daily_result.user_daily_id)
-                
+                    }
+
+                    # Insert the scores of friends that have not been stored yet in a single executemany
+                    new_results = [
+                        {'user_id': user_id, 'score': friend_scores[geo_id], 'challenge_token': challenge_token}
+                        for user_id, geo_id in users if user_id not in submitted_user_ids
+                    ]
+
+                    if new_results:
+                        update_user_stats(session, challenge_token, challenge_date, new_results)
+                        update_leaderboards(session, new_results)
+                        session.bulk_insert_mappings(UserDailyResult, new_results)
+                        new_result_ids = [
+                            user_daily_id for (user_daily_id,) in session.query(UserDailyResult.user_daily_id)
+                            .filter(
+                                UserDailyResult.challenge_token == challenge_token,
+                                UserDailyResult.user_id.in_([result['user_id'] for result in new_results])
+                            )
+                        ]
+
         except Exception as e:
-            print(f"Error occurred getting todays_challenge from database: {e}")
+            logger.exception("Error occurred storing new results in database: %s", e)
             return None
-            
+
+        if unknown_friend_ids:
+            logger.debug("%s friends with results are not users yet", len(unknown_friend_ids), extra={'sample': True})
+        self.unknown_friend_ids = unknown_friend_ids
+        self.friends_fingerprint = fingerprint
         return new_result_ids or None
 
+    def fetch_results(self, challenge_tokens) -> int:
+        """
+        Fetches every results page of the given challenges and stores the rounds of the friends' results.
+
+        Args:
+            challenge_tokens (list): The challenges to fetch the results of.
+
+        Returns:
+            int: The number of round rows added to the database.
+        """
+        saved = 0
+        for challenge_token in challenge_tokens:
+            pagination_token = None
+            while True:
+                try:
+                    page = self._get_json_blocking(results_page_url(challenge_token, pagination_token), ResultsPage, timeout=REQUEST_TIMEOUT)
+                except Exception as e:
+                    logger.warning("Error occurred getting results of challenge %s: %s", challenge_token, e)
+                    break
+
+                saved += self._save_result_rounds(challenge_token, page.items)
+                pagination_token = page.pagination_token
+                if not pagination_token:
+                    break
+
+        return saved
+
+    @staticmethod
+    def _round_rows(item) -> list:
+        """
+        Reads the rounds of one results entry.
+
+        Args:
+            item (ResultItem): An entry of a results page items array.
+
+        Returns:
+            list: A dict per round with the columns of UserRoundResult, without user_daily_id.
+        """
+        rows = []
+        for round_number, guess in enumerate(item.game.player.guesses, start=1):
+            distance = guess.distance_in_meters
+            rows.append({
+                'round_number': round_number,
+                'score': guess.round_score_in_points,
+                'distance': round(distance) if distance is not None else None,
+                'time': guess.time,
+                'timed_out': guess.timed_out,
+            })
+        return rows
+
+    def _save_result_rounds(self, challenge_token, items) -> int:
+        """
+        Stores the rounds of results entries whose daily result is stored but has no rounds yet.
+
+        Entries of users without a stored daily result are skipped; their rounds are picked up
+        by the next fetch once the poll has added the daily result.
+
+        Args:
+            challenge_token (str): The challenge the entries belong to.
+            items (list): The ResultItem entries of a results page.
+
+        Returns:
+            int: The number of round rows added to the database.
+        """
+        items_by_geo_id = {item.user_id: item for item in items}
+        if not items_by_geo_id:
+            return 0
+
+        try:
+            with session_scope(self) as session:
+                daily_results = (
+                    session.query(UserDailyResult.user_daily_id, User.geo_id)
+                    .join(User, UserDailyResult.user_id == User.id)
+                    .filter(
+                        UserDailyResult.challenge_token == challenge_token,
+                        User.geo_id.in_(items_by_geo_id)
+                    )
+                    .all()
+                )
+                stored_ids = {
+                    user_daily_id for (user_daily_id,) in session.query(UserRoundResult.user_daily_id)
+                    .filter(UserRoundResult.user_daily_id.in_([user_daily_id for user_daily_id, _ in daily_results]))
+                    .distinct()
+                }
+
+                new_rounds = [
+                    {'user_daily_id': user_daily_id, **row}
+                    for user_daily_id, geo_id in daily_results if user_daily_id not in stored_ids
+                    for row in self._round_rows(items_by_geo_id[geo_id])
+                ]
+                if new_rounds:
+                    session.bulk_insert_mappings(UserRoundResult, new_rounds)
+        except Exception as e:
+            logger.exception("Error occurred storing rounds of challenge %s: %s", challenge_token, e)
+            return 0
+
+        return len(new_rounds)
+
     def _sign_in(self) -> str:
 
         """
@@ -156,7 +485,7 @@ class GeoguessrQueries:
 
         headers = {'Content-Type': 'application/json'}
         try:
-            sign_in_response = requests.post(sign_in_url, json=sign_in_data, headers=headers)
+            sign_in_response = self.policy.call_blocking(lambda: requests.post(sign_in_url, json=sign_in_data, headers=headers))
 
             # Get the ncfa_token from the response
             cookie_jar = sign_in_response.cookies
@@ -167,45 +496,424 @@ class GeoguessrQueries:
                     expires = cookie.expires
 
         except Exception as e:
-            print(f"Error occurred signing in: {e}")
+            logger.error("Error occurred signing in: %s", e)
             return None
 
         # Throw exception if sign_in_response status is not 200
         if sign_in_response.status_code != 200:
             raise Exception(f'Failed to sign in: {sign_in_response.status_code}')
         
-        print(ncfa_token)
         return ncfa_token
 
-    def update_friends(self) -> None:
+    def update_friends(self) -> dict:
         """
         Updates the users in the database with their Geoguessr usernames.
 
-        Args:
-            session (object): The session object for making HTTP requests.
+        Every page of the friends summary and the profile are fetched before the database is touched.
 
         Returns:
-            None
+            dict: The number of users added, renamed and removed, or None if the sync failed.
         """
-        friends_endpoints = 'social/friends/summary'
+        friends = {}
         try:
-            users_results = self.requests_session.get(f"{BASE_V3_URL}{friends_endpoints}").json()
+            for page in range(FRIENDS_MAX_PAGES):
+                summary = self._get_json_blocking(friends_summary_url(page), FriendsSummary)
+                if not self._add_friends_page(friends, summary):
+                    break
+            self_result = self._get_json_blocking(f"{BASE_V3_URL}profiles", Profile)
         except Exception as e:
-            print(f"Error occurred getting users_results: {e}")
-            return
+            logger.warning("Error occurred getting users_results: %s", e)
+            return None
+
+        return self._save_friends(friends, self_result.user)
+
+    @staticmethod
+    def _add_friends_page(friends, summary) -> bool:
+        """
+        Adds one page of the friends summary to the friends collected so far.
 
+        Args:
+            friends (dict): Nicks keyed by Geoguessr id, updated in place.
+            summary (FriendsSummary): The page.
+
+        Returns:
+            bool: Whether another page should be requested.
+        """
+        collected = len(friends)
+        friends.update((friend.user_id, friend.nick) for friend in summary.friends)
+        # An empty page, or a page of friends already seen because the server ignored the page number, ends the list
+        if len(friends) == collected:
+            return False
+        return summary.friends_count is not None and len(friends) < summary.friends_count
+
+    def _save_friends(self, friends, profile) -> dict:
+        """
+        Brings the users table in line with the friends list and the signed in account.
+
+        The existing users are read in one query and diffed against the friends list. New friends
+        and renamed nicks are written with one upsert keyed on geo_id, so a rename updates the
+        user instead of adding a second one. Users who are no longer friends are only removed if
+        they have no results and are not registered to a Discord account, so history is never lost.
+
+        Args:
+            friends (dict): Nicks keyed by Geoguessr id.
+            profile (ProfileUser): The signed in account.
+
+        Returns:
+            dict: The number of users added, renamed and removed, or None if the sync failed.
+        """
+        wanted = {**friends, profile.id: profile.nick}
         try:
             with session_scope(self) as session:
-                for friend in users_results['friends']:
-                    # Check if the friend is already in the database
-                    get_or_create(session, User, geo_id=friend['userId'], geo_name=friend['nick'])
+                existing = dict(session.query(User.geo_id, User.geo_name).all())
+
+                changed = [{'geo_id': geo_id, 'geo_name': nick} for geo_id, nick in wanted.items() if geo_id not in existing or existing[geo_id] != nick]
+                if changed:
+                    user_insert = insert(User.__table__)
+                    session.execute(
+                        user_insert.on_conflict_do_update(index_elements=['geo_id'], set_={'geo_name': user_insert.excluded.geo_name}),
+                        changed
+                    )
+
+                # An empty friends list is more likely a bad response than every friend leaving, so nobody is removed
+                former_ids = [geo_id for geo_id in existing if geo_id is not None and geo_id not in wanted] if friends else []
+                removed = 0
+                for start in range(0, len(former_ids), REMOVE_BATCH_SIZE):
+                    removed += (
+                        session.query(User)
+                        .filter(
+                            User.geo_id.in_(former_ids[start:start + REMOVE_BATCH_SIZE]),
+                            User.discord_id.is_(None),
+                            ~exists().where(UserDailyResult.user_id == User.id)
+                        )
+                        .delete(synchronize_session=False)
+                    )
+        except Exception as e:
+            logger.exception("Error occurred updating friends: %s", e)
+            return None
+
+        added = sum(1 for user in changed if user['geo_id'] not in existing)
+        if added:
+            # New users may already have results in the stored payload, so it is reconciled again
+            self.friends_fingerprint = None
+        summary = {'added': added, 'renamed': len(changed) - added, 'removed': removed}
+        logger.info("Synced %s friends: %s", len(friends), summary)
+        return summary
+
+
+class AsyncGeoguessrQueries(GeoguessrQueries):
+    """
+    Asynchronous variant of GeoguessrQueries for use inside the Discord bot.
+
+    All Geoguessr requests go through one pooled keep-alive aiohttp session so that a slow
+    response never blocks the event loop. Database handling is shared with GeoguessrQueries
+    and runs on the database executor.
+    """
+
+    aiohttp_session = None
+    http_validators = None
+
+    # The unknown friends the last automatic friend sync was run for
+    synced_unknown_friend_ids = frozenset()
+
+    # Health as seen from the requests, read by /readyz
+    session_valid = False
+    last_successful_poll = None
+
+    def _new_aiohttp_session(self) -> aiohttp.ClientSession:
+        """
+        Creates the pooled HTTP session used for every Geoguessr request.
+
+        Returns:
+            aiohttp.ClientSession: A session with keep-alive connections and per-request timeouts.
+        """
+        connector = aiohttp.TCPConnector(limit=CONNECTION_POOL_SIZE, keepalive_timeout=60)
+        timeout = aiohttp.ClientTimeout(total=REQUEST_TIMEOUT)
+        # unsafe allows the cookie to be kept for an IP address such as a local fake server
+        cookie_jar = aiohttp.CookieJar(unsafe=True)
+        return aiohttp.ClientSession(connector=connector, timeout=timeout, cookie_jar=cookie_jar)
+
+    async def _get_json(self, url: str, model):
+        """
+        Sends a GET request through the pooled session under the request policy and parses the JSON body into a model.
+
+        Args:
+            url (str): The URL to request.
+            model (type): The GeoguessrModel describing the response.
+
+        Returns:
+            GeoguessrModel: The parsed response body.
+
+        Raises:
+            CircuitOpenError: If requests are paused after repeated failures.
+            SchemaDriftError: If the response no longer matches the model.
+            aiohttp.ClientError: If the last attempt failed.
+        """
+        if self.aiohttp_session is None or self.aiohttp_session.closed:
+            self.aiohttp_session = self._new_aiohttp_session()
+
+        endpoint = endpoint_label(url)
+
+        async def attempt():
+            GEOGUESSR_REQUESTS.inc(endpoint=endpoint)
+            try:
+                async with self.aiohttp_session.get(url) as response:
+                    self._check_response(response)
+                    return parse_payload(model, await response.read())
+            except Exception:
+                GEOGUESSR_ERRORS.inc(endpoint=endpoint)
+                raise
+
+        return await self.policy.call(attempt)
+
+    async def _get_json_if_modified(self, url: str, model):
+        """
+        Sends a conditional GET request using the ETag and Last-Modified validators of the previous response.
+
+        The request runs under the request policy, like _get_json.
+
+        Args:
+            url (str): The URL to request.
+            model (type): The GeoguessrModel describing the response.
+
+        Returns:
+            GeoguessrModel: The parsed response body, or None if the server reports it as not modified.
+
+        Raises:
+            CircuitOpenError: If requests are paused after repeated failures.
+            SchemaDriftError: If the response no longer matches the model.
+            aiohttp.ClientError: If the last attempt failed.
+        """
+        if self.aiohttp_session is None or self.aiohttp_session.closed:
+            self.aiohttp_session = self._new_aiohttp_session()
+        if self.http_validators is None:
+            self.http_validators = {}
+
+        endpoint = endpoint_label(url)
+
+        async def attempt():
+            GEOGUESSR_REQUESTS.inc(endpoint=endpoint)
+            try:
+                async with self.aiohttp_session.get(url, headers=self.http_validators.get(url, {})) as response:
+                    if response.status == 304:
+                        self.session_valid = True
+                        return None
+                    self._check_response(response)
+
+                    validators = {}
+                    if 'ETag' in response.headers:
+                        validators['If-None-Match'] = response.headers['ETag']
+                    if 'Last-Modified' in response.headers:
+                        validators['If-Modified-Since'] = response.headers['Last-Modified']
+                    self.http_validators[url] = validators
+
+                    return parse_payload(model, await response.read())
+            except Exception:
+                GEOGUESSR_ERRORS.inc(endpoint=endpoint)
+                raise
+
+        return await self.policy.call(attempt)
+
+    def _check_response(self, response):
+        """
+        Raises for error statuses and tracks whether the _ncfa cookie is still accepted.
+
+        Args:
+            response (aiohttp.ClientResponse): The response to check.
+
+        Raises:
+            aiohttp.ClientResponseError: If the response has an error status.
+        """
+        if response.status in (401, 403):
+            self.session_valid = False
+        elif response.status < 400:
+            self.session_valid = True
+        response.raise_for_status()
+
+    async def update_geoguessr_session(self):
+        """
+        Updates the session with the necessary authentication token.
+        """
+        self.ncfa_token = os.getenv('NCFA_TOKEN')
+
+        await self.close()
+        self.aiohttp_session = self._new_aiohttp_session()
+        self.aiohttp_session.cookie_jar.update_cookies({"_ncfa": self.ncfa_token}, URL(BASE_V3_URL))
+
+    async def close(self):
+        """
+        Closes the pooled HTTP session.
+        """
+        if self.aiohttp_session is not None and not self.aiohttp_session.closed:
+            await self.aiohttp_session.close()
+
+    async def get_daily_challenge_token(self):
+        """
+        Retrieves the token for the current daily challenge.
+
+        Returns:
+            str: The token for the current daily challenge.
+        """
+        daily_challenge_endpoint = 'challenges/daily-challenges/today'
+        daily_challenge = await self._get_json(f'{BASE_V3_URL}{daily_challenge_endpoint}', DailyChallengeToken)
+        return await run_in_db_executor(self._save_daily_challenge, daily_challenge)
 
-                # Add self to users table if not already present
-                self_endpoint = 'profiles'
-                self_result = self.requests_session.get(f"{BASE_V3_URL}{self_endpoint}").json()
-                self = self_result['user']
+    async def check_for_new_results(self) -> list:
+        """
+        Checks for new results in the daily challenge and adds them to the database.
+
+        Returns:
+            list: A list of new friend daily results added to the database.
+        """
+        if self.get_current_challenge_token() is None:
+            logger.debug("Today's challenge has not been retrieved yet.", extra={'sample': True})
+            return None
 
-                get_or_create(session, User, geo_id=self['id'], geo_name=self['nick'])
+        try:
+            daily_challenge = await self._get_json_if_modified(daily_challenge_url(), DailyChallenge)
+        except CircuitOpenError as e:
+            logger.debug("Skipping poll: %s", e, extra={'sample': True})
+            return None
+        except SchemaDriftError as e:
+            logger.error("Error occurred reading daily_challenge_data: %s", e, extra={'sample': True})
+            return None
         except Exception as e:
-            print(f"Error occurred updating friends: {e}")
-            return
\ No newline at end of file
+            logger.warning("Error occurred getting daily_challenge_data: %s", e)
+            return None
+
+        self.last_successful_poll = time.time()
+        LAST_SUCCESSFUL_POLL.set(self.last_successful_poll)
+
+        new_result_ids = None
+        if daily_challenge is not None:
+            new_result_ids = await run_in_db_executor(self._save_new_results, daily_challenge)
+            if self.http_validators and self.friends_fingerprint != self._friends_fingerprint(self.get_current_challenge_token(), daily_challenge):
+                # The payload was not stored, so a 304 must not hide it
+                self.http_validators.pop(daily_challenge_url(), None)
+
+        # A friend played before being synced: sync once per new set of unknown friends, so a
+        # player who is not a friend does not cost a sync on every poll
+        if self.unknown_friend_ids and self.unknown_friend_ids != self.synced_unknown_friend_ids:
+            if await self.update_friends() is not None:
+                self.synced_unknown_friend_ids = self.unknown_friend_ids
+        return new_result_ids
+
+    async def fetch_results(self, challenge_tokens) -> int:
+        """
+        Fetches every results page of the given challenges and stores the rounds of the friends' results.
+
+        Challenges are fetched concurrently, with at most RESULTS_CONCURRENCY requests in flight.
+        The pages of one challenge are chained by their pagination token, so each next page is
+        requested while the previous one is being stored.
+
+        Args:
+            challenge_tokens (list): The challenges to fetch the results of.
+
+        Returns:
+            int: The number of round rows added to the database.
+        """
+        semaphore = asyncio.Semaphore(RESULTS_CONCURRENCY)
+        saved = await asyncio.gather(*(self._fetch_challenge_results(challenge_token, semaphore) for challenge_token in challenge_tokens))
+        return sum(saved)
+
+    async def _fetch_challenge_results(self, challenge_token, semaphore) -> int:
+        """
+        Fetches and stores every results page of one challenge.
+
+        Args:
+            challenge_token (str): The challenge to fetch the results of.
+            semaphore (asyncio.Semaphore): Bounds the requests in flight across challenges.
+
+        Returns:
+            int: The number of round rows added to the database.
+        """
+        saved = 0
+        pending_save = None
+        pagination_token = None
+        try:
+            while True:
+                async with semaphore:
+                    page = await self._get_json(results_page_url(challenge_token, pagination_token), ResultsPage)
+
+                if pending_save is not None:
+                    saved += await pending_save
+                pending_save = asyncio.ensure_future(run_in_db_executor(self._save_result_rounds, challenge_token, page.items))
+
+                pagination_token = page.pagination_token
+                if not pagination_token:
+                    break
+        except Exception as e:
+            logger.warning("Error occurred getting results of challenge %s: %s", challenge_token, e)
+
+        if pending_save is not None:
+            saved += await pending_save
+        return saved
+
+    async def _sign_in(self) -> str:
+        """
+        Signs into Geoguessr using the provided credentials.
+
+        Returns:
+            str: The ncfa_token obtained from the sign-in response.
+
+        Raises:
+            Exception: If the sign-in request fails with a non-200 status code.
+        """
+        sign_in_url = f'{BASE_V3_URL}accounts/signin'
+        sign_in_data = {
+            'email': os.getenv('GEOGUESSR_USERNAME'),
+            'password': os.getenv('GEOGUESSR_PASSWORD')
+        }
+
+        if self.aiohttp_session is None or self.aiohttp_session.closed:
+            self.aiohttp_session = self._new_aiohttp_session()
+
+        async def attempt():
+            GEOGUESSR_REQUESTS.inc(endpoint='accounts/signin')
+            async with self.aiohttp_session.post(sign_in_url, json=sign_in_data) as sign_in_response:
+                return sign_in_response.status, sign_in_response.cookies.get('_ncfa')
+
+        try:
+            status, ncfa_cookie = await self.policy.call(attempt)
+        except Exception as e:
+            GEOGUESSR_ERRORS.inc(endpoint='accounts/signin')
+            logger.error("Error occurred signing in: %s", e)
+            return None
+
+        if status != 200:
+            GEOGUESSR_ERRORS.inc(endpoint='accounts/signin')
+            raise Exception(f'Failed to sign in: {status}')
+
+        return ncfa_cookie.value if ncfa_cookie else None
+
+    async def update_friends(self) -> dict:
+        """
+        Updates the users in the database with their Geoguessr usernames.
+
+        The first friends summary page and the profile are requested together. Once the first page
+        tells how many friends there are, the remaining pages are requested concurrently. The
+        database is only touched after every response has arrived.
+
+        Returns:
+            dict: The number of users added, renamed and removed, or None if the sync failed.
+        """
+        friends = {}
+        try:
+            first_page, self_result = await asyncio.gather(
+                self._get_json(friends_summary_url(0), FriendsSummary),
+                self._get_json(f"{BASE_V3_URL}profiles", Profile)
+            )
+            if self._add_friends_page(friends, first_page):
+                page_count = min(math.ceil(first_page.friends_count / len(first_page.friends)), FRIENDS_MAX_PAGES)
+                pages = await asyncio.gather(*(self._get_json(friends_summary_url(page), FriendsSummary) for page in range(1, page_count)))
+                for page in pages:
+                    self._add_friends_page(friends, page)
+        except Exception as e:
+            logger.warning("Error occurred getting users_results: %s", e)
+            return None
+
+        summary = await run_in_db_executor(self._save_friends, friends, self_result.user)
+        if summary and summary['added'] and self.http_validators:
+            # The results of the new users may be in a payload that is no longer modified
+            self.http_validators.pop(daily_challenge_url(), None)
+        return summary
\ No newline at end of file
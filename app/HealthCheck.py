@@ -1,21 +1,68 @@
-import socket
-import threading
-
-def start_health_check_server(port=8000):
-    def handle_client(client_socket):
-        client_socket.sendall(b"HTTP/1.1 200 OK\r\nContent-Length: 2\r\n\r\nOK")
-        client_socket.close()
-
-    def server_thread():
-        server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        server.bind(("0.0.0.0", port))
-        server.listen(5)
-        print(f"Health check server listening on port {port}")
-
-        while True:
-            client_socket, addr = server.accept()
-            handle_client(client_socket)
-
-    thread = threading.Thread(target=server_thread)
-    thread.daemon = True
-    thread.start()
\ No newline at end of file
+# Standard library imports
+import logging
+import os
+
+# Third-party imports
+from aiohttp import web
+
+# Local application imports
+from Metrics import render_metrics
+
+logger = logging.getLogger(__name__)
+
+HEALTH_CHECK_PORT = int(os.getenv('HEALTH_CHECK_PORT', 8000))
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def create_health_check_app(readiness_checks) -> web.Application:
+    """
+    Creates the web application serving the health and metrics endpoints.
+
+    Args:
+        readiness_checks (dict): Callables returning True when healthy, keyed by check name.
+
+    Returns:
+        aiohttp.web.Application: The application.
+    """
+    async def healthz(request):
+        # Answering at all means the event loop is alive
+        return web.Response(text="OK")
+
+    async def readyz(request):
+        results = {}
+        for name, check in readiness_checks.items():
+            try:
+                results[name] = bool(check())
+            except Exception as e:
+                logger.error("Error occurred running readiness check %s: %s", name, e)
+                results[name] = False
+
+        body = "\n".join(f"{name}: {'ok' if ready else 'failing'}" for name, ready in results.items())
+        return web.Response(text=body, status=200 if all(results.values()) else 503)
+
+    async def metrics(request):
+        return web.Response(body=render_metrics().encode(), headers={'Content-Type': PROMETHEUS_CONTENT_TYPE})
+
+    app = web.Application()
+    app.router.add_get('/healthz', healthz)
+    app.router.add_get('/readyz', readyz)
+    app.router.add_get('/metrics', metrics)
+    return app
+
+
+async def start_health_check_server(readiness_checks, port=HEALTH_CHECK_PORT) -> web.AppRunner:
+    """
+    Starts serving the health and metrics endpoints on the running event loop.
+
+    Args:
+        readiness_checks (dict): Callables returning True when healthy, keyed by check name.
+        port (int): The port to listen on.
+
+    Returns:
+        aiohttp.web.AppRunner: The runner, to be cleaned up on shutdown.
+    """
+    runner = web.AppRunner(create_health_check_app(readiness_checks), access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, '0.0.0.0', port).start()
+    logger.info("Health check server listening on port %s", port)
+    return runner
\ No newline at end of file
@@ -0,0 +1,277 @@
+# Standard library imports
+import argparse
+import csv
+import datetime
+import itertools
+import json
+import os
+import time
+
+# Third-party imports
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:  # Only needed for Parquet export
+    pyarrow = None
+
+# Local application imports
+from database import User, Challenge, UserDailyResult, UserRoundResult, engine, session_scope, upgrade_database
+
+EXPORT_CHUNK_SIZE = int(os.getenv('EXPORT_CHUNK_SIZE', 10000))  # Rows fetched from the cursor and written at a time
+EXPORT_FORMATS = ('jsonl', 'csv', 'parquet')
+
+# Columns of each exported dataset as (name, column, type), in file order
+DATASETS = {
+    'users': [
+        ('id', User.id, 'int'),
+        ('geo_id', User.geo_id, 'str'),
+        ('geo_name', User.geo_name, 'str'),
+        ('discord_id', User.discord_id, 'int'),
+    ],
+    'challenges': [
+        ('challenge_token', Challenge.challenge_token, 'str'),
+        ('time', Challenge.time, 'timestamp'),
+    ],
+    'daily_results': [
+        ('user_daily_id', UserDailyResult.user_daily_id, 'int'),
+        ('user_id', UserDailyResult.user_id, 'int'),
+        ('challenge_token', UserDailyResult.challenge_token, 'str'),
+        ('score', UserDailyResult.score, 'int'),
+    ],
+    'rounds': [
+        ('user_round_id', UserRoundResult.user_round_id, 'int'),
+        ('user_daily_id', UserRoundResult.user_daily_id, 'int'),
+        ('round_number', UserRoundResult.round_number, 'int'),
+        ('score', UserRoundResult.score, 'int'),
+        ('distance', UserRoundResult.distance, 'int'),
+        ('time', UserRoundResult.time, 'int'),
+        ('timed_out', UserRoundResult.timed_out, 'bool'),
+    ],
+}
+
+# Datasets exported past the watermark by their first column, so only rows added since the previous
+# export are picked up. A backfill rewrites the scores of existing daily results in place, and those
+# changes are not re-exported: take a full export after a backfill. Users and challenges are small and
+# can change in place, so they are always exported in full.
+WATERMARK_DATASETS = ('daily_results', 'rounds')
+
+
+def _json_default(value):
+    """
+    Serializes the values json does not handle, i.e. challenge times.
+    """
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+
+class JsonLinesWriter:
+    """
+    Writes rows as one JSON object per line.
+    """
+
+    def __init__(self, path, columns):
+        self.names = [name for name, _, _ in columns]
+        self.file = open(path, 'w', encoding='utf-8')
+
+    def write(self, rows):
+        self.file.writelines(json.dumps(dict(zip(self.names, row)), default=_json_default) + '\n' for row in rows)
+
+    def close(self):
+        self.file.close()
+
+
+class CsvWriter:
+    """
+    Writes rows as CSV with a header line. Missing values are written as empty fields.
+    """
+
+    def __init__(self, path, columns):
+        self.file = open(path, 'w', encoding='utf-8', newline='')
+        self.writer = csv.writer(self.file)
+        self.writer.writerow([name for name, _, _ in columns])
+
+    def write(self, rows):
+        self.writer.writerows(rows)
+
+    def close(self):
+        self.file.close()
+
+
+class ParquetWriter:
+    """
+    Writes rows to a Parquet file, one row group per chunk, so a chunk is never held twice.
+
+    Raises:
+        ValueError: If pyarrow is not installed.
+    """
+
+    def __init__(self, path, columns):
+        if pyarrow is None:
+            raise ValueError("Parquet export needs pyarrow, install it with 'pip install pyarrow'")
+        arrow_types = {'int': pyarrow.int64(), 'str': pyarrow.string(), 'bool': pyarrow.bool_(), 'timestamp': pyarrow.timestamp('us')}
+        self.schema = pyarrow.schema([(name, arrow_types[column_type]) for name, _, column_type in columns])
+        self.writer = pyarrow.parquet.ParquetWriter(path, self.schema)
+
+    def write(self, rows):
+        arrays = [pyarrow.array(values, type=field.type) for values, field in zip(zip(*rows), self.schema)]
+        self.writer.write_table(pyarrow.Table.from_arrays(arrays, schema=self.schema))
+
+    def close(self):
+        self.writer.close()
+
+
+WRITERS = {'jsonl': JsonLinesWriter, 'csv': CsvWriter, 'parquet': ParquetWriter}
+
+
+def load_watermark(path) -> dict:
+    """
+    Reads the watermark left by the previous export made with one.
+
+    Args:
+        path (str): The watermark file.
+
+    Returns:
+        dict: The last exported id of each watermarked dataset, empty if there was no previous export.
+    """
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding='utf-8') as file:
+        return json.load(file)
+
+
+def save_watermark(path, watermark):
+    """
+    Stores the watermark for the next export made with one. Written to a temporary file first,
+    so an interrupted write never leaves a broken watermark behind.
+
+    Args:
+        path (str): The watermark file.
+        watermark (dict): The last exported id of each watermarked dataset.
+    """
+    temporary_path = f'{path}.tmp'
+    with open(temporary_path, 'w', encoding='utf-8') as file:
+        json.dump(watermark, file)
+    os.replace(temporary_path, path)
+
+
+def _dataset_query(session, dataset, since=None, until=None, after_id=None, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Builds the streaming query of one dataset.
+
+    Args:
+        session (sqlalchemy.orm.Session): The session to query with.
+        dataset (str): A key of DATASETS.
+        since (datetime.date): Only export challenges from this day on.
+        until (datetime.date): Only export challenges up to and including this day.
+        after_id (int): Only export rows with a larger id, for watermarked datasets.
+        chunk_size (int): Rows fetched from the cursor at a time.
+
+    Returns:
+        sqlalchemy.orm.Query: The query, yielding rows in chunks.
+    """
+    columns = [column for _, column, _ in DATASETS[dataset]]
+    query = session.query(*columns)
+
+    if dataset != 'users' and (since or until):
+        if dataset == 'rounds':
+            query = query.join(UserDailyResult, UserRoundResult.user_daily_id == UserDailyResult.user_daily_id)
+        if dataset != 'challenges':
+            query = query.join(Challenge, UserDailyResult.challenge_token == Challenge.challenge_token)
+        if since:
+            query = query.filter(Challenge.time >= datetime.datetime.combine(since, datetime.time()))
+        if until:
+            query = query.filter(Challenge.time < datetime.datetime.combine(until + datetime.timedelta(days=1), datetime.time()))
+
+    if after_id is not None:
+        query = query.filter(columns[0] > after_id)
+
+    order_column = Challenge.time if dataset == 'challenges' else columns[0]
+    return query.order_by(order_column).yield_per(chunk_size)
+
+
+def export_history(output_dir, export_format='jsonl', since=None, until=None, watermark=None, chunk_size=EXPORT_CHUNK_SIZE) -> dict:
+    """
+    Streams the results history to one file per dataset.
+
+    Rows are read with yield_per and written a chunk at a time, so memory stays flat however long
+    the history is. All datasets are read in one transaction, so the files are a consistent snapshot.
+
+    A watermark only picks up rows added since the previous export. Scores a backfill changed on
+    existing daily results are not exported again, a full export is needed for those.
+
+    Args:
+        output_dir (str): The directory the files are written to, created if missing.
+        export_format (str): 'jsonl', 'csv' or 'parquet'.
+        since (datetime.date): Only export challenges and their results from this day on.
+        until (datetime.date): Only export challenges and their results up to and including this day.
+        watermark (dict): The watermark of the previous export. Daily results and rounds are then
+            only exported if added after it, users and challenges are always exported in full.
+        chunk_size (int): Rows fetched and written at a time.
+
+    Returns:
+        dict: The rows written per dataset, the paths of the files and the new watermark.
+
+    Raises:
+        ValueError: If the format is unknown, or Parquet is requested without pyarrow installed.
+    """
+    if export_format not in WRITERS:
+        raise ValueError(f"Unknown export format {export_format}, expected one of {', '.join(EXPORT_FORMATS)}")
+
+    os.makedirs(output_dir, exist_ok=True)
+    watermark = dict(watermark or {})
+    rows_written = {}
+    paths = []
+
+    with session_scope(None) as session:
+        # pysqlite only begins a transaction before a write, without this every query reads its own snapshot
+        session.connection().exec_driver_sql('BEGIN')
+
+        for dataset, columns in DATASETS.items():
+            after_id = watermark.get(dataset) if dataset in WATERMARK_DATASETS else None
+            rows = iter(_dataset_query(session, dataset, since, until, after_id, chunk_size))
+
+            path = os.path.join(output_dir, f'{dataset}.{export_format}')
+            writer = WRITERS[export_format](path, columns)
+            rows_written[dataset] = 0
+            try:
+                while True:
+                    chunk = list(itertools.islice(rows, chunk_size))
+                    if not chunk:
+                        break
+                    writer.write(chunk)
+                    rows_written[dataset] += len(chunk)
+                    if dataset in WATERMARK_DATASETS:
+                        watermark[dataset] = chunk[-1][0]
+            finally:
+                writer.close()
+            paths.append(path)
+
+    return {'rows': rows_written, 'paths': paths, 'watermark': watermark}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the results history for offline analysis.")
+    parser.add_argument('output', help="Directory the files are written to, one per dataset")
+    parser.add_argument('--format', dest='export_format', choices=EXPORT_FORMATS, default='jsonl', help="File format, parquet needs pyarrow")
+    parser.add_argument('--since', type=datetime.date.fromisoformat, help="Only export challenges from this day on, YYYY-MM-DD")
+    parser.add_argument('--until', type=datetime.date.fromisoformat, help="Only export challenges up to and including this day, YYYY-MM-DD")
+    parser.add_argument('--watermark', help="Watermark file: only export results added since the export that last updated it, not scores changed since")
+    parser.add_argument('--chunk-size', type=int, default=EXPORT_CHUNK_SIZE, help="Rows fetched and written at a time")
+    args = parser.parse_args()
+
+    upgrade_database(engine)
+    start = time.perf_counter()
+
+    watermark = load_watermark(args.watermark) if args.watermark else None
+    export = export_history(args.output, args.export_format, args.since, args.until, watermark, args.chunk_size)
+    if args.watermark:
+        save_watermark(args.watermark, export['watermark'])
+
+    elapsed = time.perf_counter() - start
+    counts = ', '.join(f"{rows} {dataset}" for dataset, rows in export['rows'].items())
+    print(f"Exported {counts} to {args.output} in {elapsed:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
\ No newline at end of file
@@ -0,0 +1,152 @@
+# Standard library imports
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import threading
+
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')  # Level of every logger without its own entry in LOG_LEVELS
+LOG_LEVELS = os.getenv('LOG_LEVELS', 'discord=INFO,discord.gateway=WARNING')  # Per-module levels, e.g. 'GeoguessrQueries=DEBUG'
+LOG_FORMAT = os.getenv('LOG_FORMAT', 'json')  # 'json' or 'text'
+LOG_FILE = os.getenv('LOG_FILE', 'logs/bot.log')
+LOG_MAX_BYTES = int(os.getenv('LOG_MAX_BYTES', 10 * 1024 * 1024))  # Size at which the log file is rotated
+LOG_BACKUP_COUNT = int(os.getenv('LOG_BACKUP_COUNT', 5))
+LOG_SAMPLE_EVERY = int(os.getenv('LOG_SAMPLE_EVERY', 100))  # 1 in N sampled records is kept
+
+# Listener started by setup_logging, stopped at exit so queued records are flushed
+_listener = None
+
+# Attributes every LogRecord has, anything else was passed through extra= and is logged as a field
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime', 'sample'}
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Formats records as one JSON object per line, with the extra= fields of the call included.
+    """
+
+    def format(self, record) -> str:
+        entry = {
+            'time': self.formatTime(record, '%Y-%m-%dT%H:%M:%S'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES:
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exception'] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keeps the first and then one in every `every` records of high-frequency events.
+
+    Only records logged with extra={'sample': True} are sampled; they are counted per logger
+    and message template. Kept records carry the number of records they stand for in `sampled`.
+    """
+
+    def __init__(self, every=LOG_SAMPLE_EVERY):
+        """
+        Initializes a SamplingFilter.
+
+        Args:
+            every (int): Keep one in this many sampled records.
+        """
+        super().__init__()
+        self.every = max(1, every)
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record) -> bool:
+        if not getattr(record, 'sample', False):
+            return True
+
+        key = (record.name, record.msg)
+        with self._lock:
+            count = self._counts.get(key, 0)
+            self._counts[key] = count + 1
+
+        if count % self.every:
+            return False
+        record.sampled = 1 if count == 0 else self.every
+        return True
+
+
+def _parse_levels(levels) -> dict:
+    """
+    Parses 'module=LEVEL,other=LEVEL' into a dict of logger name to level name.
+    """
+    parsed = {}
+    for entry in filter(None, (part.strip() for part in levels.split(','))):
+        name, _, level = entry.partition('=')
+        parsed[name.strip()] = level.strip().upper()
+    return parsed
+
+
+def stop_logging():
+    """
+    Writes out the queued records and stops the background writer thread.
+    """
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+atexit.register(stop_logging)
+
+
+def setup_logging(level=LOG_LEVEL, levels=LOG_LEVELS, log_file=LOG_FILE, log_format=LOG_FORMAT) -> logging.handlers.QueueListener:
+    """
+    Routes all logging through a queue so that callers on the event loop never wait on I/O.
+
+    Records are filtered and sampled on the calling thread, then written to stderr and a
+    size-rotated file by a background listener thread.
+
+    Args:
+        level (str): The root level.
+        levels (str): Per-module levels as 'module=LEVEL,other=LEVEL'.
+        log_file (str): The path of the rotated log file, or None to only log to stderr.
+        log_format (str): 'json' or 'text'.
+
+    Returns:
+        logging.handlers.QueueListener: The started listener, stopped at exit.
+    """
+    global _listener
+    stop_logging()
+
+    if log_format == 'json':
+        formatter = JsonFormatter()
+    else:
+        formatter = logging.Formatter('%(asctime)s %(levelname)s %(name)s: %(message)s')
+
+    handlers = [logging.StreamHandler()]
+    if log_file:
+        os.makedirs(os.path.dirname(log_file) or '.', exist_ok=True)
+        handlers.append(logging.handlers.RotatingFileHandler(log_file, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT, encoding='utf-8'))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    queue_handler.addFilter(SamplingFilter())
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(level.upper())
+
+    for name, module_level in _parse_levels(levels).items():
+        logging.getLogger(name).setLevel(module_level)
+
+    _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    return _listener
\ No newline at end of file
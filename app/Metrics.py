@@ -0,0 +1,196 @@
+# Standard library imports
+import threading
+import time
+from contextlib import contextmanager
+
+# Third-party imports
+from sqlalchemy import event
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)  # Seconds
+
+# Every metric registers itself here and is rendered by render_metrics
+REGISTRY = []
+
+
+def _format_labels(labels) -> str:
+    """
+    Formats label pairs as in the Prometheus text format, e.g. {endpoint="profiles"}.
+    """
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape_label(value)}"' for name, value in labels) + '}'
+
+
+def _escape_label(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class Metric:
+    """
+    Base class of the metrics exposed on /metrics.
+
+    Values are kept per label combination. Updates take a lock since database metrics are
+    recorded from the database executor threads.
+    """
+
+    metric_type = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        """
+        Initializes a Metric and registers it.
+
+        Args:
+            name (str): The metric name.
+            documentation (str): The HELP text.
+            labelnames (tuple): The names of the labels every update has to provide.
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def _key(self, labels) -> tuple:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple((name, labels[name]) for name in self.labelnames)
+
+    def samples(self) -> list:
+        """
+        Returns the (name suffix, labels, value) samples of the metric.
+        """
+        raise NotImplementedError
+
+    def render(self) -> str:
+        """
+        Renders the metric in the Prometheus text format.
+        """
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.metric_type}"]
+        for suffix, labels, value in self.samples():
+            lines.append(f"{self.name}{suffix}{_format_labels(labels)} {float(value)!r}")
+        return '\n'.join(lines)
+
+
+class Counter(Metric):
+    metric_type = 'counter'
+
+    def inc(self, amount=1, **labels):
+        """
+        Increments the counter of the given labels.
+        """
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self) -> list:
+        with self._lock:
+            return [('_total', key, value) for key, value in self._values.items()]
+
+
+class Gauge(Metric):
+    metric_type = 'gauge'
+
+    def set(self, value, **labels):
+        """
+        Sets the gauge of the given labels.
+        """
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def samples(self) -> list:
+        with self._lock:
+            return [('', key, value) for key, value in self._values.items()]
+
+
+class Histogram(Metric):
+    metric_type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        """
+        Initializes a Histogram and registers it.
+
+        Args:
+            name (str): The metric name.
+            documentation (str): The HELP text.
+            labelnames (tuple): The names of the labels every observation has to provide.
+            buckets (tuple): The ascending upper bounds of the buckets, in seconds.
+        """
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        """
+        Records one observation for the given labels.
+        """
+        key = self._key(labels)
+        with self._lock:
+            counts, total, count = self._values.get(key, ([0] * len(self.buckets), 0.0, 0))
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[index] += 1
+            self._values[key] = (counts, total + value, count + 1)
+
+    @contextmanager
+    def time(self, **labels):
+        """
+        Observes how long the body of the with block takes, including when it raises.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self) -> list:
+        samples = []
+        with self._lock:
+            for key, (counts, total, count) in self._values.items():
+                for bound, bucket_count in zip(self.buckets, counts):
+                    samples.append(('_bucket', key + (('le', f'{bound:g}'),), bucket_count))
+                samples.append(('_bucket', key + (('le', '+Inf'),), count))
+                samples.append(('_sum', key, total))
+                samples.append(('_count', key, count))
+        return samples
+
+
+POLL_SECONDS = Histogram('geoguessr_poll_duration_seconds', "Duration of a results poll cycle, Discord updates included.")
+LAST_SUCCESSFUL_POLL = Gauge('geoguessr_last_successful_poll_timestamp_seconds', "Unix time of the last poll that reached Geoguessr.")
+GEOGUESSR_REQUESTS = Counter('geoguessr_requests', "Requests sent to Geoguessr.", ('endpoint',))
+GEOGUESSR_ERRORS = Counter('geoguessr_request_errors', "Geoguessr requests that failed or returned an error status.", ('endpoint',))
+GEOGUESSR_RETRIES = Counter('geoguessr_request_retries', "Geoguessr requests retried after a 429, 5xx, timeout or connection error.")
+GEOGUESSR_CIRCUIT_OPEN = Gauge('geoguessr_circuit_open', "1 while Geoguessr requests are paused after repeated failures, 0 otherwise.")
+DB_QUERY_SECONDS = Histogram('db_query_duration_seconds', "Duration of each SQL statement.")
+DISCORD_REQUEST_SECONDS = Histogram('discord_request_duration_seconds', "Duration of Discord message sends and edits, retries included.", ('action',))
+
+
+def instrument_engine(engine):
+    """
+    Records the duration of every statement executed through an engine in DB_QUERY_SECONDS.
+
+    Args:
+        engine (sqlalchemy.engine.Engine): The engine to instrument.
+    """
+    @event.listens_for(engine, 'before_cursor_execute')
+    def _start_timer(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_start_times', []).append(time.perf_counter())
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def _stop_timer(conn, cursor, statement, parameters, context, executemany):
+        DB_QUERY_SECONDS.observe(time.perf_counter() - conn.info['query_start_times'].pop())
+
+    @event.listens_for(engine, 'handle_error')
+    def _drop_timer(context):
+        if context.connection is not None and context.connection.info.get('query_start_times'):
+            context.connection.info['query_start_times'].pop()
+
+
+def render_metrics() -> str:
+    """
+    Renders every registered metric in the Prometheus text format.
+
+    Returns:
+        str: The body of the /metrics response.
+    """
+    return '\n'.join(metric.render() for metric in REGISTRY) + '\n'
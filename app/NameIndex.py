@@ -0,0 +1,109 @@
+# Standard library imports
+import bisect
+import logging
+import unicodedata
+
+# Local application imports
+from database import User, session_scope
+
+AUTOCOMPLETE_LIMIT = 25  # Most choices Discord shows for an autocomplete
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_name(name) -> str:
+    """
+    Folds a name into its search key, so that case and Unicode variants of a letter match.
+
+    NFKC maps compatibility characters such as full-width letters to their plain form, and
+    casefold handles cases lower() misses, e.g. 'ß' matching 'ss'.
+
+    Args:
+        name (str): A Geoguessr name or typed prefix.
+
+    Returns:
+        str: The search key.
+    """
+    return unicodedata.normalize('NFKC', name).casefold()
+
+
+def load_user_names() -> list:
+    """
+    Reads the Geoguessr id and name of every user. Runs on the database executor.
+
+    Returns:
+        list: (geo_id, geo_name) pairs, or None if the users could not be read.
+    """
+    try:
+        with session_scope(None) as session:
+            return session.query(User.geo_id, User.geo_name).all()
+    except Exception as e:
+        logger.error("Error occurred getting user names: %s", e)
+        return None
+
+
+class NameIndex:
+    """
+    In-memory prefix index of Geoguessr names for the /register autocomplete.
+
+    Names are kept in a list of (key, name, geo_id) sorted by key, so a prefix search is a
+    bisect to the first match followed by a scan of at most `limit` entries, without touching
+    the database. The index is meant to be read and updated on the event loop only.
+    """
+
+    def __init__(self):
+        self._entries = []
+        self._names = {}
+
+    def __len__(self):
+        return len(self._names)
+
+    def update(self, users):
+        """
+        Brings the index in line with the current users, touching only the names that changed.
+
+        Args:
+            users (iterable): (geo_id, geo_name) pairs of every user.
+        """
+        current = {geo_id: geo_name for geo_id, geo_name in users if geo_name}
+
+        for geo_id in self._names.keys() - current.keys():
+            self._remove(geo_id)
+
+        for geo_id, geo_name in current.items():
+            if self._names.get(geo_id) != geo_name:
+                self._remove(geo_id)
+                bisect.insort(self._entries, (normalize_name(geo_name), geo_name, geo_id))
+                self._names[geo_id] = geo_name
+
+    def _remove(self, geo_id):
+        geo_name = self._names.pop(geo_id, None)
+        if geo_name is None:
+            return
+        entry = (normalize_name(geo_name), geo_name, geo_id)
+        position = bisect.bisect_left(self._entries, entry)
+        if position < len(self._entries) and self._entries[position] == entry:
+            del self._entries[position]
+
+    def search(self, prefix, limit=AUTOCOMPLETE_LIMIT) -> list:
+        """
+        Returns the names starting with a prefix, ignoring case and Unicode variants.
+
+        Args:
+            prefix (str): What the user has typed so far.
+            limit (int): The most names to return.
+
+        Returns:
+            list: Matching names in key order, without duplicates.
+        """
+        key = normalize_name(prefix)
+        names = []
+        position = bisect.bisect_left(self._entries, (key,))
+        while position < len(self._entries) and len(names) < limit:
+            entry_key, geo_name, _ = self._entries[position]
+            if not entry_key.startswith(key):
+                break
+            if not names or names[-1] != geo_name:
+                names.append(geo_name)
+            position += 1
+        return names
\ No newline at end of file
@@ -0,0 +1,348 @@
+# Standard library imports
+import asyncio
+import email.utils
+import logging
+import os
+import random
+import threading
+import time
+
+# Third-party imports
+import aiohttp
+import requests
+
+# Local application imports
+from Metrics import GEOGUESSR_RETRIES, GEOGUESSR_CIRCUIT_OPEN
+
+logger = logging.getLogger(__name__)
+
+MAX_RETRIES = int(os.getenv('GEOGUESSR_MAX_RETRIES', 4))  # Retries after the first attempt
+BACKOFF_BASE = float(os.getenv('GEOGUESSR_BACKOFF_BASE', 1.0))  # Seconds, doubled on each retry
+BACKOFF_MAX = float(os.getenv('GEOGUESSR_BACKOFF_MAX', 60))  # Upper bound of a backoff or Retry-After wait
+RATE_LIMIT = float(os.getenv('GEOGUESSR_RATE_LIMIT', 2))  # Requests per second across every task
+RATE_LIMIT_BURST = int(os.getenv('GEOGUESSR_RATE_LIMIT_BURST', 5))
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv('GEOGUESSR_CIRCUIT_FAILURES', 5))  # Consecutive failures that open the circuit
+CIRCUIT_RESET_SECONDS = float(os.getenv('GEOGUESSR_CIRCUIT_RESET', 300))  # Pause before a trial request
+
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+
+
+class CircuitOpenError(Exception):
+    """
+    Raised instead of sending a request while Geoguessr is considered down.
+    """
+
+
+class TokenBucket:
+    """
+    Limits the request rate across every task and thread sharing the bucket.
+
+    Each request takes a token; tokens refill at `rate` per second up to `capacity`. A request
+    finding the bucket empty reserves the next token and waits for it, so waiters are served
+    in order without polling.
+    """
+
+    def __init__(self, rate=RATE_LIMIT, capacity=RATE_LIMIT_BURST):
+        """
+        Initializes a TokenBucket.
+
+        Args:
+            rate (float): Tokens added per second.
+            capacity (int): Tokens the bucket holds when full, i.e. the largest burst.
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _reserve(self) -> float:
+        """
+        Takes a token and returns how long to wait before it is available.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    async def acquire(self):
+        """
+        Waits for a token without blocking the event loop.
+        """
+        wait = self._reserve()
+        if wait:
+            await asyncio.sleep(wait)
+
+    def acquire_blocking(self):
+        """
+        Waits for a token, blocking the calling thread.
+        """
+        wait = self._reserve()
+        if wait:
+            time.sleep(wait)
+
+
+class CircuitBreaker:
+    """
+    Stops requests after repeated failures and lets a single trial through once the pause is over.
+
+    Closed: requests flow. Open: requests are refused until reset_timeout has passed. Half open:
+    one trial request is allowed, closing the circuit on success and reopening it on failure.
+    """
+
+    def __init__(self, failure_threshold=CIRCUIT_FAILURE_THRESHOLD, reset_timeout=CIRCUIT_RESET_SECONDS):
+        """
+        Initializes a CircuitBreaker.
+
+        Args:
+            failure_threshold (int): Consecutive failures that open the circuit.
+            reset_timeout (float): Seconds the circuit stays open before a trial request.
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self) -> bool:
+        """
+        Whether requests are currently refused.
+        """
+        return self.opened_at is not None and self.seconds_until_retry() > 0
+
+    def seconds_until_retry(self) -> float:
+        """
+        Returns how long until a trial request is allowed, 0 when the circuit is closed.
+        """
+        if self.opened_at is None:
+            return 0.0
+        return max(0.0, self.opened_at + self.reset_timeout - time.monotonic())
+
+    def allow(self) -> bool:
+        """
+        Returns whether a request may be sent now.
+        """
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if self.seconds_until_retry() > 0 or self._trial_in_flight:
+                return False
+            self._trial_in_flight = True
+            return True
+
+    def record_success(self):
+        """
+        Closes the circuit after a request reached Geoguessr.
+        """
+        with self._lock:
+            if self.opened_at is not None:
+                logger.warning("Geoguessr is reachable again, closing the circuit")
+                GEOGUESSR_CIRCUIT_OPEN.set(0)
+            self.failures = 0
+            self.opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        """
+        Counts a failed request, opening the circuit at the threshold or when the trial request failed.
+        """
+        with self._lock:
+            self.failures += 1
+            if self._trial_in_flight or (self.opened_at is None and self.failures >= self.failure_threshold):
+                if self.opened_at is None:
+                    logger.warning("Geoguessr failed %s times in a row, pausing requests for %ss", self.failures, self.reset_timeout)
+                    GEOGUESSR_CIRCUIT_OPEN.set(1)
+                self.opened_at = time.monotonic()
+            self._trial_in_flight = False
+
+    def release_trial(self):
+        """
+        Frees the trial slot of a trial request that ended without an outcome, e.g. a response that
+        could not be parsed or a cancelled request, so that the next request can be the trial.
+        """
+        with self._lock:
+            self._trial_in_flight = False
+
+
+def _parse_retry_after(value):
+    """
+    Reads a Retry-After header given in seconds or as an HTTP date.
+
+    Returns:
+        float: Seconds to wait, or None if the header is missing or invalid.
+    """
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def classify_error(exception):
+    """
+    Decides whether a failed request is worth retrying.
+
+    Args:
+        exception (Exception): The error raised by the request.
+
+    Returns:
+        tuple: (retryable, retry_after) where retry_after is the advertised delay in seconds or None.
+    """
+    if isinstance(exception, aiohttp.ClientResponseError):
+        headers = exception.headers or {}
+        return exception.status in RETRYABLE_STATUSES, _parse_retry_after(headers.get('Retry-After'))
+
+    if isinstance(exception, requests.HTTPError) and exception.response is not None:
+        response = exception.response
+        return response.status_code in RETRYABLE_STATUSES, _parse_retry_after(response.headers.get('Retry-After'))
+
+    if isinstance(exception, (aiohttp.ClientConnectionError, asyncio.TimeoutError, requests.ConnectionError, requests.Timeout)):
+        return True, None
+
+    return False, None
+
+
+class RequestPolicy:
+    """
+    Applies rate limiting, retries with jittered exponential backoff and a circuit breaker to requests.
+
+    One policy is shared by every GeoguessrQueries instance, so the rate limit and the circuit
+    cover the bot as a whole. A request is retried only for 429, 5xx, connection errors and
+    timeouts, and never after it succeeds.
+    """
+
+    def __init__(self, max_retries=MAX_RETRIES, backoff_base=BACKOFF_BASE, backoff_max=BACKOFF_MAX, bucket=None, breaker=None):
+        """
+        Initializes a RequestPolicy.
+
+        Args:
+            max_retries (int): Retries after the first attempt.
+            backoff_base (float): Seconds of the first backoff, doubled on each retry.
+            backoff_max (float): Upper bound of a backoff or Retry-After wait.
+            bucket (TokenBucket): The shared rate limiter.
+            breaker (CircuitBreaker): The shared circuit breaker.
+        """
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.bucket = bucket or TokenBucket()
+        self.breaker = breaker or CircuitBreaker()
+
+    def backoff_delay(self, attempt, retry_after=None) -> float:
+        """
+        Returns how long to wait before the next attempt.
+
+        Args:
+            attempt (int): The number of the failed attempt, starting at 0.
+            retry_after (float): The delay advertised by the server, honoured when given.
+
+        Returns:
+            float: Seconds to wait, with full jitter when the server gave no delay.
+        """
+        if retry_after is not None:
+            return min(retry_after, self.backoff_max)
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def _before_attempt(self):
+        """
+        Refuses the attempt while the circuit is open.
+        """
+        if not self.breaker.allow():
+            raise CircuitOpenError(f"Geoguessr requests paused for {self.breaker.seconds_until_retry():.0f}s after repeated failures")
+
+    def _after_failure(self, exception, attempt):
+        """
+        Records a failed attempt and returns the delay before retrying, or None to give up.
+        """
+        retryable, retry_after = classify_error(exception)
+        if not retryable:
+            # The API answered, it just did not like the request
+            if isinstance(exception, (aiohttp.ClientResponseError, requests.HTTPError)):
+                self.breaker.record_success()
+            return None
+
+        self.breaker.record_failure()
+        if attempt == self.max_retries or self.breaker.is_open:
+            return None
+        return self.backoff_delay(attempt, retry_after)
+
+    async def call(self, request):
+        """
+        Runs an asynchronous request under the policy.
+
+        Args:
+            request (callable): Returns the coroutine sending the request, called once per attempt.
+
+        Returns:
+            The result of the first successful attempt.
+
+        Raises:
+            CircuitOpenError: If requests are paused.
+            Exception: The error of the last attempt when retries are exhausted or not worthwhile.
+        """
+        for attempt in range(self.max_retries + 1):
+            self._before_attempt()
+            try:
+                await self.bucket.acquire()
+                result = await request()
+            except Exception as e:
+                delay = self._after_failure(e, attempt)
+                if delay is None:
+                    raise
+                logger.debug("Retrying Geoguessr request in %.1fs after: %s", delay, e)
+                GEOGUESSR_RETRIES.inc()
+            else:
+                self.breaker.record_success()
+                return result
+            finally:
+                # A trial ended by an error that records no outcome must not hold the circuit open for good
+                self.breaker.release_trial()
+
+            await asyncio.sleep(delay)
+
+    def call_blocking(self, request):
+        """
+        Runs a blocking request under the policy.
+
+        Args:
+            request (callable): Sends the request, called once per attempt.
+
+        Returns:
+            The result of the first successful attempt.
+
+        Raises:
+            CircuitOpenError: If requests are paused.
+            Exception: The error of the last attempt when retries are exhausted or not worthwhile.
+        """
+        for attempt in range(self.max_retries + 1):
+            self._before_attempt()
+            try:
+                self.bucket.acquire_blocking()
+                result = request()
+            except Exception as e:
+                delay = self._after_failure(e, attempt)
+                if delay is None:
+                    raise
+                logger.debug("Retrying Geoguessr request in %.1fs after: %s", delay, e)
+                GEOGUESSR_RETRIES.inc()
+            else:
+                self.breaker.record_success()
+                return result
+            finally:
+                # A trial ended by an error that records no outcome must not hold the circuit open for good
+                self.breaker.release_trial()
+
+            time.sleep(delay)
+
+
+# Shared by every GeoguessrQueries instance
+geoguessr_policy = RequestPolicy()
\ No newline at end of file
@@ -0,0 +1,234 @@
+# Standard library imports
+import asyncio
+import hashlib
+import io
+import json
+import logging
+import multiprocessing
+import os
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+# Third-party imports
+import discord
+from PIL import Image, ImageDraw, ImageFont
+
+ICON_PATH = 'assets/GeoguessrDiscordIcon.png'
+ICON_FILENAME = 'icon.png'  # Attachment name embeds refer to as attachment://icon.png
+CARD_FILENAME = 'results.png'  # Attachment name embeds refer to as attachment://results.png
+CARD_WORKERS = int(os.getenv('RESULTS_CARD_WORKERS', 1))  # Processes rendering cards
+CARD_CACHE_SIZE = 8  # Rendered cards kept, most recently used first
+CARD_MAX_ROWS = 25  # Results drawn on a card, the rest are summarized in the footer
+
+CARD_WIDTH = 640
+HEADER_HEIGHT = 96
+ROW_HEIGHT = 36
+FOOTER_HEIGHT = 40
+BACKGROUND = (32, 34, 37)
+ROW_SHADE = (44, 47, 51)
+ACCENT = (0xa5, 0x43, 0x4d)  # EMBED_COLOR
+TEXT = (235, 235, 235)
+MUTED = (160, 163, 168)
+
+logger = logging.getLogger(__name__)
+
+# PNG bytes of the static assets, read once by load_assets
+_assets = {}
+
+# Decoded icon of a worker process, set by _init_worker
+_worker_icon = None
+
+
+def load_assets(icon_path=ICON_PATH):
+    """
+    Reads the static assets into memory. Called once at startup.
+
+    Args:
+        icon_path (str): The path of the bot icon.
+    """
+    with open(icon_path, 'rb') as file:
+        _assets['icon'] = file.read()
+
+
+def icon_file() -> discord.File:
+    """
+    Returns the bot icon as an attachment, read from memory instead of disk.
+
+    A discord.File can only be sent once, so a new one is made from the cached bytes each call.
+
+    Returns:
+        discord.File: The icon, attached as icon.png.
+    """
+    if 'icon' not in _assets:
+        load_assets()
+    return discord.File(io.BytesIO(_assets['icon']), filename=ICON_FILENAME)
+
+
+def card_file(card) -> discord.File:
+    """
+    Wraps rendered card bytes in an attachment.
+
+    Args:
+        card (bytes): The PNG of the card.
+
+    Returns:
+        discord.File: The card, attached as results.png.
+    """
+    return discord.File(io.BytesIO(card), filename=CARD_FILENAME)
+
+
+def results_digest(title, results) -> str:
+    """
+    Hashes everything drawn on a card, so equal results share one rendered card.
+
+    Args:
+        title (str): The card title.
+        results (list): (name, score) pairs, best first.
+
+    Returns:
+        str: The digest of the card content.
+    """
+    return hashlib.sha1(json.dumps([title, results]).encode()).hexdigest()
+
+
+def _init_worker(icon_png):
+    """
+    Decodes the icon once per worker process.
+    """
+    global _worker_icon
+    _worker_icon = Image.open(io.BytesIO(icon_png)).convert('RGBA').resize((64, 64), Image.LANCZOS)
+
+
+def render_results_card(title, results) -> bytes:
+    """
+    Draws a results card. Runs in a worker process.
+
+    Args:
+        title (str): The card title.
+        results (list): (name, score) pairs, best first.
+
+    Returns:
+        bytes: The card as a PNG.
+    """
+    shown = results[:CARD_MAX_ROWS]
+    height = HEADER_HEIGHT + max(len(shown), 1) * ROW_HEIGHT + FOOTER_HEIGHT
+    card = Image.new('RGB', (CARD_WIDTH, height), BACKGROUND)
+    draw = ImageDraw.Draw(card)
+
+    title_font = ImageFont.load_default(size=30)
+    row_font = ImageFont.load_default(size=20)
+
+    draw.rectangle((0, 0, CARD_WIDTH, HEADER_HEIGHT - 8), fill=ACCENT)
+    if _worker_icon is not None:
+        card.paste(_worker_icon, (16, 12), _worker_icon)
+    draw.text((96, (HEADER_HEIGHT - 8) // 2), title, font=title_font, fill=TEXT, anchor='lm')
+
+    top = HEADER_HEIGHT
+    if not shown:
+        draw.text((CARD_WIDTH // 2, top + ROW_HEIGHT // 2), "No results yet", font=row_font, fill=MUTED, anchor='mm')
+
+    for rank, (name, score) in enumerate(shown, start=1):
+        if rank % 2 == 0:
+            draw.rectangle((0, top, CARD_WIDTH, top + ROW_HEIGHT), fill=ROW_SHADE)
+        middle = top + ROW_HEIGHT // 2
+        draw.text((24, middle), f"{rank}.", font=row_font, fill=MUTED, anchor='lm')
+        draw.text((72, middle), str(name), font=row_font, fill=TEXT, anchor='lm')
+        draw.text((CARD_WIDTH - 24, middle), f"{score:,}", font=row_font, fill=TEXT, anchor='rm')
+        top += ROW_HEIGHT
+
+    hidden = len(results) - len(shown)
+    footer = f"{len(results)} players" + (f", {hidden} more not shown" if hidden > 0 else "")
+    draw.text((CARD_WIDTH - 24, height - FOOTER_HEIGHT // 2), footer, font=row_font, fill=MUTED, anchor='rm')
+
+    output = io.BytesIO()
+    card.save(output, format='PNG', optimize=True)
+    return output.getvalue()
+
+
+class ResultsCardRenderer:
+    """
+    Renders results cards in a process pool and caches them by the hash of their content.
+
+    Drawing and PNG encoding are CPU bound, so they run in worker processes and never hold up
+    the discord.py event loop. A card whose content was already rendered is returned from the
+    cache without touching the pool.
+    """
+
+    def __init__(self, workers=CARD_WORKERS, cache_size=CARD_CACHE_SIZE, executor=None):
+        """
+        Initializes a ResultsCardRenderer. The pool is started by start(), or else on the first render.
+
+        Args:
+            workers (int): The number of worker processes.
+            cache_size (int): The number of rendered cards kept.
+            executor (concurrent.futures.Executor): Renders the cards instead of a new process pool.
+        """
+        self.workers = workers
+        self.cache_size = cache_size
+        self.executor = executor
+        self._cache = OrderedDict()
+
+    def start(self):
+        """
+        Starts the worker processes.
+
+        Workers are forked, which is only safe while the process has no other threads, so call this
+        before the log writer, the database executor or discord.py start theirs. A fork-context pool
+        starts all its workers on the first task, before its own management thread.
+        """
+        self._get_executor().submit(int).result()
+
+    def _get_executor(self):
+        if self.executor is None:
+            if 'icon' not in _assets:
+                load_assets()
+            # Forked rather than spawned, so workers do not re-import the bot module and repeat its startup
+            self.executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context('fork'),
+                initializer=_init_worker,
+                initargs=(_assets['icon'],)
+            )
+        return self.executor
+
+    async def render(self, title, results):
+        """
+        Returns the card of the given results, rendering it only if its content is new.
+
+        Args:
+            title (str): The card title.
+            results (list): (name, score) pairs, best first.
+
+        Returns:
+            bytes: The card as a PNG, or None if rendering failed.
+        """
+        digest = results_digest(title, results)
+        if digest in self._cache:
+            self._cache.move_to_end(digest)
+            return self._cache[digest]
+
+        try:
+            card = await asyncio.get_running_loop().run_in_executor(self._get_executor(), render_results_card, title, results)
+        except BrokenProcessPool as e:
+            # A pool that lost a worker refuses all further work, so the next render starts a new one.
+            # That pool is forked while threads run, which is safe as workers only draw and encode.
+            logger.exception("Error occurred rendering results card, restarting the pool: %s", e)
+            self.close()
+            return None
+        except Exception as e:
+            logger.error("Error occurred rendering results card: %s", e)
+            return None
+
+        self._cache[digest] = card
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return card
+
+    def close(self):
+        """
+        Stops the worker processes.
+        """
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
\ No newline at end of file
@@ -0,0 +1,77 @@
+# Third-party imports
+import discord
+
+# Local application imports
+from GeoguessrEmbeds import get_user_list_embed, get_user_list_page
+from database import run_in_db_executor
+
+USER_LIST_TIMEOUT = 300  # Seconds the page buttons keep working after the last click
+
+
+def load_user_list_page(after_id, page_number):
+    """
+    Loads one page of the user list. Runs on the database executor.
+
+    Args:
+        after_id (int): The id of the last user of the previous page, 0 for the first page.
+        page_number (int): The number of the page.
+
+    Returns:
+        tuple: The page embed and the after_id of the next page, None on the last page.
+    """
+    page = get_user_list_page(after_id)
+    if page is None:
+        return None, None
+    return get_user_list_embed(after_id, page_number), page[1]
+
+
+class UserListView(discord.ui.View):
+    """
+    Previous and Next buttons paging through the user list.
+
+    A page is only loaded when it is navigated to. The start of every page visited is kept, since
+    a keyset query can only walk forward from a known user id.
+    """
+
+    def __init__(self, next_after_id, timeout=USER_LIST_TIMEOUT):
+        """
+        Initializes a UserListView showing the first page.
+
+        Args:
+            next_after_id (int): The after_id of the second page, None if there is only one.
+            timeout (float): Seconds the buttons keep working after the last click.
+        """
+        super().__init__(timeout=timeout)
+        self.page_starts = [0]
+        self.page_index = 0
+        self.next_after_id = next_after_id
+        self._update_buttons()
+
+    def _update_buttons(self):
+        self.previous_page.disabled = self.page_index == 0
+        self.next_page.disabled = self.next_after_id is None
+
+    async def _show_page(self, interaction):
+        embed, self.next_after_id = await run_in_db_executor(load_user_list_page, self.page_starts[self.page_index], self.page_index + 1)
+        if embed is None:
+            await interaction.response.send_message("Failed to load the user list", ephemeral=True)
+            return
+
+        self._update_buttons()
+        await interaction.response.edit_message(embed=embed, view=self)
+
+    @discord.ui.button(label="Previous", style=discord.ButtonStyle.secondary)
+    async def previous_page(self, interaction, button):
+        self.page_index = max(0, self.page_index - 1)
+        await self._show_page(interaction)
+
+    @discord.ui.button(label="Next", style=discord.ButtonStyle.secondary)
+    async def next_page(self, interaction, button):
+        if self.next_after_id is None:
+            await interaction.response.defer()
+            return
+        # The users may have changed since the page was first visited, so the next start is taken from the page shown
+        del self.page_starts[self.page_index + 1:]
+        self.page_starts.append(self.next_after_id)
+        self.page_index += 1
+        await self._show_page(interaction)
\ No newline at end of file
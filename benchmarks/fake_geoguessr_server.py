@@ -0,0 +1,311 @@
+"""
+A local stand-in for the Geoguessr API, for load, soak and failure testing without geoguessr.com.
+
+Serves the endpoints used by GeoguessrQueries with payloads built from example-json. A
+configurable number of simulated friends submit the daily challenge over a simulated day,
+and latency, 429 and 5xx rates and cookie expiry can be tuned.
+
+Usage:
+    python benchmarks/fake_geoguessr_server.py --port 8080 --friends 2000 --day-seconds 3600
+    GEOGUESSR_V3_URL=http://127.0.0.1:8080/api/v3/ NCFA_TOKEN=fake-ncfa python app/GeoguessrDiscordBot.py
+"""
+# Standard library imports
+import argparse
+import asyncio
+import base64
+import copy
+import json
+import os
+import random
+import secrets
+import time
+
+# Third-party imports
+from aiohttp import web
+
+EXAMPLE_JSON = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'example-json')
+RESULTS_PAGE_SIZE = 26  # Largest page the results endpoint returns
+FRIENDS_PAGE_SIZE = 100  # Friends per page of the friends summary
+
+
+def load_example(name) -> dict:
+    """
+    Loads one of the example Geoguessr responses.
+
+    Args:
+        name (str): The file name in example-json.
+
+    Returns:
+        dict: The decoded response.
+    """
+    with open(os.path.join(EXAMPLE_JSON, name), encoding='utf-8') as file:
+        return json.load(file)
+
+
+def geo_id(index) -> str:
+    """
+    Returns the Geoguessr id of a simulated friend, shaped like a real 24 character id.
+    """
+    return f'{index:024x}'
+
+
+def friends_payload(users) -> dict:
+    """
+    Builds a social/friends/summary response listing simulated friends.
+
+    Args:
+        users (int): The number of friends.
+
+    Returns:
+        dict: The response, with each friend copied from example-friends.json.
+    """
+    example = load_example('example-friends.json')
+    template = example['friends'][0]
+    friends = []
+    for index in range(users):
+        friend = copy.deepcopy(template)
+        friend['userId'] = geo_id(index)
+        friend['url'] = f'/user/{geo_id(index)}'
+        friend['nick'] = f'Friend {index}'
+        friends.append(friend)
+    return {**example, 'friends': friends, 'friendsCount': users}
+
+
+def challenge_payload(scores, challenge_token) -> dict:
+    """
+    Builds a daily challenge response with the given friend results.
+
+    Args:
+        scores (dict): Total scores keyed by the index of the friend who submitted.
+        challenge_token (str): The token of the challenge.
+
+    Returns:
+        dict: The response, with each friend result copied from example-challenge.json.
+    """
+    example = load_example('example-challenge.json')
+    template = example['friends'][0]
+    friends = [
+        {**template, 'id': geo_id(index), 'nick': f'Friend {index}', 'totalScore': score}
+        for index, score in scores.items()
+    ]
+    return {**example, 'token': challenge_token, 'participants': len(friends), 'friends': friends}
+
+
+class FakeGeoguessr:
+    """
+    The simulated Geoguessr world and the aiohttp application serving it.
+
+    Friends submit at random times of the simulated day, most of them early. A simulated day
+    lasts day_seconds of real time, after which a new daily challenge starts.
+    """
+
+    def __init__(self, friends=1000, participation=0.8, day_seconds=86400, latency=0.0, jitter=0.5,
+                 rate_limit_rate=0.0, error_rate=0.0, retry_after=1, cookie_ttl=0, ncfa_token='fake-ncfa', seed=0):
+        """
+        Initializes a FakeGeoguessr.
+
+        Args:
+            friends (int): The number of simulated friends.
+            participation (float): The share of friends who play each day.
+            day_seconds (float): Real seconds a simulated day lasts.
+            latency (float): Mean seconds added to every response.
+            jitter (float): Relative spread of the latency, 0.5 for +/- 50%.
+            rate_limit_rate (float): Share of requests answered with a 429.
+            error_rate (float): Share of requests answered with a 500, 502 or 503.
+            retry_after (int): Seconds advertised in the Retry-After header of a 429.
+            cookie_ttl (float): Seconds an _ncfa cookie stays valid, 0 for never expiring.
+            ncfa_token (str): A cookie accepted from start-up, as if NCFA_TOKEN was copied from a browser.
+            seed (int): Seed of the simulated scores and submission times.
+        """
+        self.friends = friends
+        self.participation = participation
+        self.day_seconds = day_seconds
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_limit_rate = rate_limit_rate
+        self.error_rate = error_rate
+        self.retry_after = retry_after
+        self.cookie_ttl = cookie_ttl
+        self.seed = seed
+
+        self.started_at = time.time()
+        self.random = random.Random(seed)
+        self.sessions = {ncfa_token: self._expiry()}
+        self.requests = 0
+
+        summary = friends_payload(friends)
+        self._friends_bodies = [
+            json.dumps({**summary, 'friends': summary['friends'][start:start + FRIENDS_PAGE_SIZE]}).encode()
+            for start in range(0, max(friends, 1), FRIENDS_PAGE_SIZE)
+        ]
+        self._result_template = load_example('example-results.json')['items'][0]
+        self._day = None
+        self._submissions = []
+
+    def _expiry(self):
+        return self.started_at + self.cookie_ttl if self.cookie_ttl else None
+
+    def _current_day(self):
+        """
+        Returns the simulated day and how far into it we are, between 0 and 1.
+        """
+        elapsed = (time.time() - self.started_at) / self.day_seconds
+        return int(elapsed), elapsed - int(elapsed)
+
+    def submissions(self):
+        """
+        Returns today's challenge token and the friends who have submitted so far.
+
+        Returns:
+            tuple: The challenge token and a dict of total scores keyed by friend index.
+        """
+        day, progress = self._current_day()
+        if day != self._day:
+            # Draw who plays, when and how well for the new day, sorted by submission time
+            rng = random.Random(f'{self.seed}-{day}')
+            self._day = day
+            self._submissions = sorted(
+                (rng.betavariate(1, 3), index, rng.randint(0, 25000))
+                for index in range(self.friends) if rng.random() < self.participation
+            )
+
+        scores = {}
+        for submitted_at, index, score in self._submissions:
+            if submitted_at > progress:
+                break
+            scores[index] = score
+        return f'fakechallenge{day:05d}', scores
+
+    def _authenticated(self, request) -> bool:
+        token = request.cookies.get('_ncfa')
+        if token not in self.sessions:
+            return False
+        expires = self.sessions[token]
+        return expires is None or time.time() < expires
+
+    @web.middleware
+    async def _inject_failures(self, request, handler):
+        self.requests += 1
+        if self.latency:
+            await asyncio.sleep(self.random.uniform(self.latency * (1 - self.jitter), self.latency * (1 + self.jitter)))
+
+        draw = self.random.random()
+        if draw < self.rate_limit_rate:
+            return web.json_response({'message': 'Too many requests'}, status=429, headers={'Retry-After': str(self.retry_after)})
+        if draw < self.rate_limit_rate + self.error_rate:
+            return web.json_response({'message': 'Server error'}, status=self.random.choice((500, 502, 503)))
+
+        return await handler(request)
+
+    async def daily_challenge(self, request):
+        challenge_token, scores = self.submissions()
+        if not self._authenticated(request):
+            # Without a session Geoguessr still returns the challenge, just not the friends' results
+            scores = {}
+
+        etag = f'"{challenge_token}-{len(scores)}"'
+        if request.headers.get('If-None-Match') == etag:
+            return web.Response(status=304, headers={'ETag': etag})
+
+        return web.json_response(challenge_payload(scores, challenge_token), headers={'ETag': etag})
+
+    async def friends_summary(self, request):
+        if not self._authenticated(request):
+            return web.json_response({'message': 'Unauthorized'}, status=401)
+        page = int(request.query.get('page', 0))
+        if page >= len(self._friends_bodies):
+            return web.json_response({'friends': [], 'friendsCount': self.friends})
+        return web.Response(body=self._friends_bodies[page], content_type='application/json')
+
+    async def profile(self, request):
+        if not self._authenticated(request):
+            return web.json_response({'message': 'Unauthorized'}, status=401)
+        return web.json_response({'user': {'id': 'f' * 24, 'nick': 'Fake Bot Account'}})
+
+    async def sign_in(self, request):
+        try:
+            credentials = await request.json()
+        except json.JSONDecodeError:
+            credentials = {}
+        if not credentials.get('email') or not credentials.get('password'):
+            return web.json_response({'message': 'Invalid credentials'}, status=401)
+
+        token = secrets.token_urlsafe(24)
+        self.sessions[token] = time.time() + self.cookie_ttl if self.cookie_ttl else None
+
+        response = web.json_response({'user': {'id': 'f' * 24, 'nick': 'Fake Bot Account'}})
+        response.set_cookie('_ncfa', token, max_age=int(self.cookie_ttl) if self.cookie_ttl else None, httponly=True)
+        return response
+
+    async def highscores(self, request):
+        if not self._authenticated(request):
+            return web.json_response({'message': 'Unauthorized'}, status=401)
+
+        challenge_token, scores = self.submissions()
+        if request.match_info['challenge_token'] != challenge_token:
+            return web.json_response({'items': [], 'paginationToken': None})
+
+        limit = min(int(request.query.get('limit', RESULTS_PAGE_SIZE)), RESULTS_PAGE_SIZE)
+        offset = 0
+        if request.query.get('paginationToken'):
+            offset = int(base64.urlsafe_b64decode(request.query['paginationToken']).decode())
+
+        ranked = sorted(scores.items(), key=lambda entry: entry[1], reverse=True)
+        items = []
+        for index, score in ranked[offset:offset + limit]:
+            item = copy.deepcopy(self._result_template)
+            item['userId'] = geo_id(index)
+            item['playerName'] = f'Friend {index}'
+            item['totalScore'] = score
+            items.append(item)
+
+        next_offset = offset + limit
+        pagination_token = base64.urlsafe_b64encode(str(next_offset).encode()).decode() if next_offset < len(ranked) else None
+        return web.json_response({'items': items, 'paginationToken': pagination_token})
+
+    def create_app(self) -> web.Application:
+        """
+        Creates the aiohttp application serving the fake API under /api/v3/.
+
+        Returns:
+            aiohttp.web.Application: The application.
+        """
+        app = web.Application(middlewares=[self._inject_failures])
+        app.router.add_get('/api/v3/challenges/daily-challenges/today', self.daily_challenge)
+        app.router.add_get('/api/v3/challenges/daily-challenges/today/', self.daily_challenge)
+        app.router.add_get('/api/v3/social/friends/summary', self.friends_summary)
+        app.router.add_get('/api/v3/profiles', self.profile)
+        app.router.add_post('/api/v3/accounts/signin', self.sign_in)
+        app.router.add_get('/api/v3/results/highscores/{challenge_token}', self.highscores)
+        return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a fake Geoguessr API for load and failure testing.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--friends', type=int, default=1000, help="Simulated friends")
+    parser.add_argument('--participation', type=float, default=0.8, help="Share of friends playing each day")
+    parser.add_argument('--day-seconds', type=float, default=86400, help="Real seconds a simulated day lasts")
+    parser.add_argument('--latency', type=float, default=0.0, help="Mean seconds added to every response")
+    parser.add_argument('--jitter', type=float, default=0.5, help="Relative spread of the latency")
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0, help="Share of requests answered with a 429")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Share of requests answered with a 5xx")
+    parser.add_argument('--retry-after', type=int, default=1, help="Retry-After seconds of a 429")
+    parser.add_argument('--cookie-ttl', type=float, default=0, help="Seconds an _ncfa cookie stays valid, 0 for never")
+    parser.add_argument('--ncfa-token', default='fake-ncfa', help="Cookie accepted from start-up, to use as NCFA_TOKEN")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    fake = FakeGeoguessr(
+        friends=args.friends, participation=args.participation, day_seconds=args.day_seconds,
+        latency=args.latency, jitter=args.jitter, rate_limit_rate=args.rate_limit_rate,
+        error_rate=args.error_rate, retry_after=args.retry_after, cookie_ttl=args.cookie_ttl,
+        ncfa_token=args.ncfa_token, seed=args.seed
+    )
+    print(f"Set GEOGUESSR_V3_URL=http://{args.host}:{args.port}/api/v3/ and NCFA_TOKEN={args.ncfa_token}")
+    web.run_app(fake.create_app(), host=args.host, port=args.port, print=None)
+
+
+if __name__ == '__main__':
+    main()
\ No newline at end of file
@@ -0,0 +1,347 @@
+"""
+Benchmarks the polling and rendering hot paths against a temporary SQLite database.
+
+The database is seeded with synthetic users and days of history, and Geoguessr responses are
+replayed from payloads built out of example-json, so no network access is needed. Results are
+printed as JSON, or written to --output, so that runs can be compared over time.
+
+With --geoguessr-url the Geoguessr requests go over HTTP to a server such as
+benchmarks/fake_geoguessr_server.py instead, with --users matching its --friends.
+
+Usage:
+    python benchmarks/run_benchmarks.py --users 1000 --days 365 --repeat 5 --output results.json
+    python benchmarks/run_benchmarks.py --users 1000 --geoguessr-url http://127.0.0.1:8080/api/v3/
+"""
+# Standard library imports
+import argparse
+import datetime
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+# Local application imports
+from fake_geoguessr_server import geo_id, friends_payload, challenge_payload
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+
+class ReplayResponse:
+    """
+    Stands in for a requests.Response, exposing the encoded body as .content like the real one.
+    """
+
+    def __init__(self, body):
+        self.body = body
+        self.content = body
+        self.status_code = 200
+
+    def json(self):
+        return json.loads(self.body)
+
+    def raise_for_status(self):
+        pass
+
+
+class ReplaySession:
+    """
+    Stands in for the requests.Session of GeoguessrQueries, answering from encoded payloads.
+
+    Attributes:
+        payloads (dict): Encoded response bodies keyed by the endpoint the URL ends with.
+    """
+
+    def __init__(self):
+        self.payloads = {}
+
+    def set(self, endpoint, payload):
+        self.payloads[endpoint] = json.dumps(payload).encode()
+
+    def get(self, url, **kwargs):
+        path = url.split('?')[0].rstrip('/')
+        for endpoint, body in self.payloads.items():
+            if path.endswith(endpoint):
+                return ReplayResponse(body)
+        raise KeyError(f"No payload for {url}")
+
+
+def seed_database(users, days, rng):
+    """
+    Fills the database with users, one challenge per day and a result per user and day.
+
+    Args:
+        users (int): The number of users.
+        days (int): The number of days of history, ending yesterday.
+        rng (random.Random): Source of the scores.
+
+    Returns:
+        datetime.date: Today's date, which has no challenge yet.
+    """
+    from database import User, Challenge, UserDailyResult, engine, session_scope, upgrade_database, rebuild_user_stats, rebuild_leaderboards
+
+    upgrade_database(engine)
+    today = datetime.datetime.now(tz=datetime.timezone.utc).date()
+
+    with engine.begin() as connection:
+        connection.execute(User.__table__.insert(), [
+            {'id': index + 1, 'geo_id': geo_id(index), 'geo_name': f'Friend {index}', 'discord_id': 10 ** 17 + index if index % 2 else None}
+            for index in range(users)
+        ])
+        for day in range(days, 0, -1):
+            challenge_token = f'history_{day}'
+            played_on = today - datetime.timedelta(days=day)
+            connection.execute(Challenge.__table__.insert(), [{'challenge_token': challenge_token, 'time': datetime.datetime.combine(played_on, datetime.time())}])
+            connection.execute(UserDailyResult.__table__.insert(), [
+                {'user_id': index + 1, 'challenge_token': challenge_token, 'score': rng.randint(0, 25000)}
+                for index in range(users)
+            ])
+
+    with session_scope(None) as session:
+        rebuild_user_stats(session)
+        rebuild_leaderboards(session)
+
+    return today
+
+
+def measure(name, func, repeat, setup=None) -> dict:
+    """
+    Runs a function repeatedly, measuring wall time, SQL statements and allocations.
+
+    Wall time is measured without tracing. The statement count and allocations come from one
+    extra traced run, since tracemalloc slows the code it traces.
+
+    Args:
+        name (str): The name of the benchmark.
+        func (callable): The code to measure.
+        repeat (int): How many timed runs to make.
+        setup (callable): Run before each run, outside of the measurement.
+
+    Returns:
+        dict: The measurements.
+    """
+    from database import engine
+    from sqlalchemy import event
+
+    timings = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+
+    statements = []
+    count_statement = lambda *args: statements.append(1)
+    if setup:
+        setup()
+    event.listen(engine, 'before_cursor_execute', count_statement)
+    tracemalloc.start()
+    try:
+        func()
+        allocated, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+        event.remove(engine, 'before_cursor_execute', count_statement)
+
+    return {
+        'name': name,
+        'wall_time_ms': {
+            'min': min(timings) * 1000,
+            'median': statistics.median(timings) * 1000,
+            'max': max(timings) * 1000,
+        },
+        'queries': len(statements),
+        'allocated_kib': allocated / 1024,
+        'peak_allocated_kib': peak / 1024,
+    }
+
+
+def parse_benchmarks(users, repeat) -> list:
+    """
+    Compares parsing Geoguessr payloads into dicts with parsing them into the typed models.
+
+    Each benchmark decodes a response of `users` friends and reads the fields the bot uses. The
+    dict variants mirror how payloads were read before the models, with orjson measured too
+    when it is installed.
+
+    Args:
+        users (int): The number of friends in the payloads.
+        repeat (int): Timed runs per benchmark.
+
+    Returns:
+        list: The measurements of each benchmark.
+    """
+    from GeoguessrModels import DailyChallenge, FriendsSummary, parse_payload
+
+    challenge_body = json.dumps(challenge_payload({index: index for index in range(users)}, 'parse')).encode()
+    friends_body = json.dumps(friends_payload(users)).encode()
+
+    decoders = {'json': json.loads}
+    try:
+        import orjson
+        decoders['orjson'] = orjson.loads
+    except ImportError:
+        pass
+
+    results = []
+    for name, loads in decoders.items():
+        results.append(measure(f'parse_daily_challenge_{name}', lambda loads=loads: {
+            friend['id']: friend['totalScore'] for friend in loads(challenge_body).get('friends', [])
+        }, repeat))
+        results.append(measure(f'parse_friends_summary_{name}', lambda loads=loads: [
+            (friend['userId'], friend['nick']) for friend in loads(friends_body)['friends']
+        ], repeat))
+
+    results.append(measure('parse_daily_challenge_model', lambda: {
+        friend.id: friend.total_score for friend in parse_payload(DailyChallenge, challenge_body).friend_results
+    }, repeat))
+    results.append(measure('parse_friends_summary_model', lambda: [
+        (friend.user_id, friend.nick) for friend in parse_payload(FriendsSummary, friends_body).friends
+    ], repeat))
+    return results
+
+
+def run_benchmarks(users, days, repeat, seed=0, replay=True) -> list:
+    """
+    Seeds the database and measures every benchmark.
+
+    Args:
+        users (int): The number of seeded users and friends.
+        days (int): The number of days of seeded history.
+        repeat (int): Timed runs per benchmark.
+        seed (int): Seed of the synthetic scores.
+        replay (bool): Answer Geoguessr requests from generated payloads instead of over HTTP.
+
+    Returns:
+        list: The measurements of each benchmark.
+    """
+    from database import Challenge, UserDailyResult, session_scope
+    from GeoguessrQueries import GeoguessrQueries
+    from RequestPolicy import RequestPolicy, TokenBucket
+    from NameIndex import NameIndex, load_user_names
+    import GeoguessrEmbeds
+
+    rng = random.Random(seed)
+    today = seed_database(users, days, rng)
+    now = datetime.datetime.combine(today, datetime.time(), tzinfo=datetime.timezone.utc)
+
+    queries = GeoguessrQueries()
+    # Lift the rate limit so the timings measure the code rather than the limiter
+    queries.policy = RequestPolicy(bucket=TokenBucket(rate=10 ** 9, capacity=10 ** 9))
+
+    if replay:
+        queries.requests_session = ReplaySession()
+        queries.requests_session.set('social/friends/summary', friends_payload(users))
+        queries.requests_session.set('profiles', {'user': {'id': geo_id(0), 'nick': 'Friend 0'}})
+
+        challenges = iter(range(10 ** 6))
+
+        def new_challenge():
+            # Every run polls a fresh challenge, so all friends are new results
+            challenge_token = f'today_{next(challenges)}'
+            with session_scope(None) as session:
+                session.add(Challenge(challenge_token=challenge_token, time=now))
+            GeoguessrQueries._cache_challenge(challenge_token, now)
+            scores = {index: rng.randint(0, 25000) for index in range(users)}
+            queries.requests_session.set('challenges/daily-challenges/today', challenge_payload(scores, challenge_token))
+    else:
+        queries.update_geoguessr_session()
+        server_challenge_token = queries.get_daily_challenge_token()
+
+        def new_challenge():
+            # The server has one challenge a day, so forget the results stored by the previous run
+            with session_scope(None) as session:
+                session.query(UserDailyResult).filter(UserDailyResult.challenge_token == server_challenge_token).delete(synchronize_session=False)
+            queries.friends_fingerprint = None
+
+    results = [
+        measure('check_for_new_results', queries.check_for_new_results, repeat, setup=new_challenge),
+        measure('check_for_new_results_unchanged', queries.check_for_new_results, repeat),
+        measure('update_friends', queries.update_friends, repeat),
+    ]
+
+    challenge_token = GeoguessrQueries.get_current_challenge_token()
+    results.append(measure(
+        'get_todays_results_embed',
+        lambda: GeoguessrEmbeds.get_todays_results_embed(challenge_token),
+        repeat,
+        setup=GeoguessrEmbeds.invalidate_todays_results_embed
+    ))
+    results.append(measure('get_todays_results_embed_cached', lambda: GeoguessrEmbeds.get_todays_results_embed(challenge_token), repeat))
+    results.append(measure('get_user_list_embed', GeoguessrEmbeds.get_user_list_embed, repeat, setup=GeoguessrEmbeds.invalidate_user_list))
+
+    name_index = NameIndex()
+    results.append(measure('name_index_build', lambda: NameIndex().update(load_user_names()), repeat))
+    name_index.update(load_user_names())
+    results.append(measure('name_index_search', lambda: name_index.search('friend 1'), repeat))
+
+    results.extend(parse_benchmarks(users, repeat))
+
+    return results
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=PROJECT_ROOT, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the polling and rendering hot paths offline.")
+    parser.add_argument('--users', type=int, default=100, help="Seeded users, all of them friends")
+    parser.add_argument('--days', type=int, default=30, help="Days of seeded history")
+    parser.add_argument('--repeat', type=int, default=5, help="Timed runs per benchmark")
+    parser.add_argument('--seed', type=int, default=0, help="Seed of the synthetic scores")
+    parser.add_argument('--output', help="Write the JSON results to this file instead of stdout")
+    parser.add_argument('--geoguessr-url', help="Send Geoguessr requests to this V3 base URL, e.g. a fake server, instead of replaying payloads")
+    parser.add_argument('--ncfa-token', default='fake-ncfa', help="_ncfa cookie used with --geoguessr-url")
+    args = parser.parse_args()
+
+    if args.geoguessr_url:
+        # GeoguessrQueries reads these on import
+        os.environ['GEOGUESSR_V3_URL'] = args.geoguessr_url
+        os.environ['NCFA_TOKEN'] = args.ncfa_token
+
+    with tempfile.TemporaryDirectory() as directory:
+        # The engine reads DATABASE_PATH on import, so point it at the temporary database first
+        os.environ['DATABASE_PATH'] = os.path.join(directory, 'benchmark.db')
+        sys.path[:0] = [PROJECT_ROOT, os.path.join(PROJECT_ROOT, 'app')]
+
+        from database import engine
+        if engine.url.database != os.environ['DATABASE_PATH']:
+            raise RuntimeError(f"Refusing to benchmark against {engine.url.database}")
+
+        results = run_benchmarks(args.users, args.days, args.repeat, args.seed, replay=not args.geoguessr_url)
+        engine.dispose()
+
+    report = {
+        'metadata': {
+            'timestamp': datetime.datetime.now(tz=datetime.timezone.utc).isoformat(),
+            'commit': _git_commit(),
+            'python': platform.python_version(),
+            'users': args.users,
+            'days': args.days,
+            'repeat': args.repeat,
+            'seed': args.seed,
+            'geoguessr_url': args.geoguessr_url,
+        },
+        'results': results,
+    }
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            file.write(output + '\n')
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
\ No newline at end of file
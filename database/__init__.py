@@ -1,2 +1,8 @@
-from .models import User, Challenge, UserDailyResult, Base
-from .engine import engine, Session, get_or_create, session_scope
+from .models import User, Challenge, UserDailyResult, GuildConfig, UserStats, UserRoundResult, LeaderboardEntry, Base
+from .engine import engine, Session, get_or_create, session_scope, run_in_db_executor
+
+from .migrations import upgrade_database, SCHEMA_VERSION
+
+from .stats import update_user_stats, rebuild_user_stats
+
+from .leaderboards import LEADERBOARD_PERIODS, update_leaderboards, roll_over_leaderboards, rebuild_leaderboards
\ No newline at end of file
@@ -1,11 +1,65 @@
-from sqlalchemy import create_engine
+import asyncio
+import functools
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from dotenv import load_dotenv
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool
 from contextlib import contextmanager
 
+load_dotenv()
+
+# SQLite settings, overridable through the environment
+DATABASE_PATH = os.getenv('DATABASE_PATH', 'database/geoguessrdiscordbot.db')
+SQLITE_JOURNAL_MODE = os.getenv('SQLITE_JOURNAL_MODE', 'WAL')  # WAL lets readers run alongside the writer
+SQLITE_SYNCHRONOUS = os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL')  # NORMAL is durable enough in WAL mode
+SQLITE_BUSY_TIMEOUT = int(os.getenv('SQLITE_BUSY_TIMEOUT', 5000))  # Milliseconds to wait on a locked database
+SQLITE_POOL_SIZE = int(os.getenv('SQLITE_POOL_SIZE', 5))
+DB_EXECUTOR_WORKERS = int(os.getenv('DB_EXECUTOR_WORKERS', 4))
+
 # Create the engine and connect to the database
-engine = create_engine('sqlite:///database/geoguessrdiscordbot.db', echo=False)
+engine = create_engine(
+    f'sqlite:///{DATABASE_PATH}',
+    echo=False,
+    poolclass=QueuePool,
+    pool_size=SQLITE_POOL_SIZE,
+    connect_args={'check_same_thread': False, 'timeout': SQLITE_BUSY_TIMEOUT / 1000}
+)
 Session = sessionmaker(bind=engine)
 
+# Database work is run here so that it never blocks the event loop
+db_executor = ThreadPoolExecutor(max_workers=DB_EXECUTOR_WORKERS, thread_name_prefix='db')
+
+
+@event.listens_for(engine, 'connect')
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    """
+    Applies the configured pragmas to every new SQLite connection.
+    """
+    cursor = dbapi_connection.cursor()
+    cursor.execute(f"PRAGMA journal_mode = {SQLITE_JOURNAL_MODE}")
+    cursor.execute(f"PRAGMA synchronous = {SQLITE_SYNCHRONOUS}")
+    cursor.execute(f"PRAGMA busy_timeout = {SQLITE_BUSY_TIMEOUT}")
+    cursor.close()
+
+
+async def run_in_db_executor(func, *args, **kwargs):
+    """
+    Runs a blocking database function on the database executor.
+
+    Args:
+        func (callable): The function to run.
+        *args: Positional arguments for the function.
+        **kwargs: Keyword arguments for the function.
+
+    Returns:
+        The return value of the function.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(db_executor, functools.partial(func, *args, **kwargs))
+
 def get_or_create(session, model, **kwargs):
     instance = session.query(model).filter_by(**kwargs).first()
     if instance:
@@ -0,0 +1,111 @@
+import datetime
+
+from sqlalchemy import func
+from sqlalchemy.dialects.sqlite import insert
+
+from .models import Challenge, UserDailyResult, LeaderboardEntry
+
+WEEK = 'week'
+MONTH = 'month'
+ALL_TIME = 'all'
+LEADERBOARD_PERIODS = (WEEK, MONTH, ALL_TIME)
+
+
+def period_start(period, today):
+    """
+    Returns the first day counted by a leaderboard period.
+
+    Args:
+        period (str): One of LEADERBOARD_PERIODS.
+        today (datetime.date): The current UTC date.
+
+    Returns:
+        datetime.date: The first day of the period, or None for the all-time period.
+    """
+    if period == WEEK:
+        return today - datetime.timedelta(days=6)
+    if period == MONTH:
+        return today.replace(day=1)
+    return None
+
+
+def update_leaderboards(session, new_results):
+    """
+    Adds new results of today's challenge to every leaderboard period with one upsert.
+
+    Args:
+        session (sqlalchemy.orm.Session): The session inserting the results.
+        new_results (list): Dicts with the user_id and score of each new result.
+    """
+    if not new_results:
+        return
+
+    leaderboard_insert = insert(LeaderboardEntry.__table__)
+    session.execute(
+        leaderboard_insert.on_conflict_do_update(
+            index_elements=['period', 'user_id'],
+            set_={
+                'games_played': LeaderboardEntry.__table__.c.games_played + leaderboard_insert.excluded.games_played,
+                'total_score': LeaderboardEntry.__table__.c.total_score + leaderboard_insert.excluded.total_score,
+            }
+        ),
+        [
+            {'period': period, 'user_id': result['user_id'], 'games_played': 1, 'total_score': result['score'] or 0}
+            for result in new_results for period in LEADERBOARD_PERIODS
+        ]
+    )
+
+
+def _fill_period(session, period, start):
+    """
+    Recomputes one leaderboard period from the results of the challenges since start.
+
+    Args:
+        session (sqlalchemy.orm.Session): The session to write in.
+        period (str): One of LEADERBOARD_PERIODS.
+        start (datetime.date): The first day of the period, or None for the whole history.
+    """
+    session.query(LeaderboardEntry).filter(LeaderboardEntry.period == period).delete(synchronize_session=False)
+
+    query = (
+        session.query(UserDailyResult.user_id, func.count(), func.coalesce(func.sum(UserDailyResult.score), 0))
+        .join(Challenge, UserDailyResult.challenge_token == Challenge.challenge_token)
+        .group_by(UserDailyResult.user_id)
+    )
+    if start is not None:
+        query = query.filter(Challenge.time >= datetime.datetime.combine(start, datetime.time()))
+
+    session.bulk_insert_mappings(LeaderboardEntry, [
+        {'period': period, 'user_id': user_id, 'games_played': games_played, 'total_score': total_score}
+        for user_id, games_played, total_score in query
+    ])
+
+
+def roll_over_leaderboards(session, today=None):
+    """
+    Moves the week and month leaderboards to a new UTC day. Call after midnight and at startup.
+
+    Only the challenges inside each window are read, found through the index on challenge.time,
+    so this stays cheap however long the history gets. Recomputing the window rather than
+    subtracting the day that dropped out keeps it correct after the bot missed a midnight.
+
+    Args:
+        session (sqlalchemy.orm.Session): The session to write in.
+        today (datetime.date): The new UTC date. Defaults to the current date.
+    """
+    today = today or datetime.datetime.now(tz=datetime.timezone.utc).date()
+    for period in (WEEK, MONTH):
+        _fill_period(session, period, period_start(period, today))
+
+
+def rebuild_leaderboards(session, today=None):
+    """
+    Recomputes every leaderboard period from the full history, e.g. after a backfill.
+
+    Args:
+        session (sqlalchemy.orm.Session): The session to write in.
+        today (datetime.date): The current UTC date. Defaults to the current date.
+    """
+    today = today or datetime.datetime.now(tz=datetime.timezone.utc).date()
+    for period in LEADERBOARD_PERIODS:
+        _fill_period(session, period, period_start(period, today))
@@ -0,0 +1,344 @@
+import datetime
+
+from .models import Base
+from .stats import compute_user_stats
+from .leaderboards import LEADERBOARD_PERIODS, period_start
+
+# Version stored in PRAGMA user_version once every migration below has been applied.
+# Databases created before versioning report 0 and are treated as version 1.
+SCHEMA_VERSION = 6
+
+# Storage format used by the SQLAlchemy SQLite DateTime type
+SQLITE_DATETIME_FORMAT = '%Y-%m-%d %H:%M:%S.%f'
+
+
+def _normalize_time(value):
+    """
+    Converts a legacy text timestamp into the format used by the DateTime column.
+
+    Args:
+        value (str): A timestamp such as '2024-04-05 00:00:01.123456+00:00', with or without
+            microseconds and UTC offset.
+
+    Returns:
+        str: The timestamp as naive UTC, or None if it cannot be parsed.
+    """
+    if value is None:
+        return None
+
+    try:
+        time = datetime.datetime.fromisoformat(str(value))
+    except ValueError:
+        return None
+
+    if time.tzinfo is not None:
+        time = time.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+
+    return time.strftime(SQLITE_DATETIME_FORMAT)
+
+
+def _migrate_to_v2(cursor):
+    """
+    Rebuilds the tables with indexes, unique constraints and native column types.
+
+    Duplicate users sharing a geo_id are merged into the oldest row, and duplicate results
+    for the same user and challenge keep the first one stored.
+
+    Args:
+        cursor (sqlite3.Cursor): A cursor inside the migration transaction.
+    """
+    cursor.execute("""
+        CREATE TABLE user_v2 (
+            id INTEGER NOT NULL,
+            geo_id VARCHAR,
+            geo_name VARCHAR,
+            discord_id BIGINT,
+            PRIMARY KEY (id)
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE challenge_v2 (
+            challenge_token VARCHAR NOT NULL,
+            time DATETIME,
+            PRIMARY KEY (challenge_token)
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE user_daily_result_v2 (
+            user_daily_id INTEGER NOT NULL,
+            user_id INTEGER,
+            score INTEGER,
+            challenge_token VARCHAR,
+            PRIMARY KEY (user_daily_id),
+            FOREIGN KEY(user_id) REFERENCES user (id),
+            FOREIGN KEY(challenge_token) REFERENCES challenge (challenge_token)
+        )
+    """)
+
+    # Merge users sharing a geo_id and convert discord ids to integers
+    users = {}
+    user_ids = {}
+    discord_ids = set()
+    for user_id, geo_id, geo_name, discord_id in cursor.execute("SELECT id, geo_id, geo_name, discord_id FROM user ORDER BY id").fetchall():
+        discord_id = int(discord_id) if discord_id not in (None, '') else None
+        if discord_id in discord_ids:
+            discord_id = None
+
+        kept_id = user_ids.get(geo_id) if geo_id is not None else None
+        if kept_id is None:
+            kept_id = user_id
+            users[kept_id] = [kept_id, geo_id, geo_name, discord_id]
+            if geo_id is not None:
+                user_ids[geo_id] = kept_id
+        else:
+            # Later rows carry the most recent nick
+            users[kept_id][2] = geo_name
+            if users[kept_id][3] is None:
+                users[kept_id][3] = discord_id
+            else:
+                discord_id = None
+
+        user_ids[user_id] = kept_id
+        if discord_id is not None:
+            discord_ids.add(discord_id)
+
+    cursor.executemany("INSERT INTO user_v2 (id, geo_id, geo_name, discord_id) VALUES (?, ?, ?, ?)", users.values())
+
+    challenges = cursor.execute("SELECT challenge_token, time FROM challenge").fetchall()
+    cursor.executemany(
+        "INSERT INTO challenge_v2 (challenge_token, time) VALUES (?, ?)",
+        [(challenge_token, _normalize_time(time)) for challenge_token, time in challenges]
+    )
+
+    results = []
+    stored = set()
+    for user_daily_id, user_id, score, challenge_token in cursor.execute(
+        "SELECT user_daily_id, user_id, score, challenge_token FROM user_daily_result ORDER BY user_daily_id"
+    ).fetchall():
+        user_id = user_ids.get(user_id, user_id)
+        if (user_id, challenge_token) in stored:
+            continue
+        stored.add((user_id, challenge_token))
+        results.append((user_daily_id, user_id, score, challenge_token))
+
+    cursor.executemany(
+        "INSERT INTO user_daily_result_v2 (user_daily_id, user_id, score, challenge_token) VALUES (?, ?, ?, ?)",
+        results
+    )
+
+    for table in ('user_daily_result', 'challenge', 'user'):
+        cursor.execute(f"DROP TABLE {table}")
+        cursor.execute(f"ALTER TABLE {table}_v2 RENAME TO {table}")
+
+    cursor.execute("CREATE UNIQUE INDEX ix_user_geo_id ON user (geo_id)")
+    cursor.execute("CREATE INDEX ix_user_geo_name ON user (geo_name)")
+    cursor.execute("CREATE UNIQUE INDEX ix_user_discord_id ON user (discord_id)")
+    cursor.execute("CREATE INDEX ix_challenge_time ON challenge (time)")
+    cursor.execute("CREATE INDEX ix_user_daily_result_challenge_token ON user_daily_result (challenge_token)")
+    cursor.execute(
+        "CREATE UNIQUE INDEX ix_user_daily_result_user_id_challenge_token ON user_daily_result (user_id, challenge_token)"
+    )
+
+
+def _migrate_to_v3(cursor):
+    """
+    Adds the per-guild channel configuration table.
+
+    Args:
+        cursor (sqlite3.Cursor): A cursor inside the migration transaction.
+    """
+    cursor.execute("""
+        CREATE TABLE guild_config (
+            guild_id BIGINT NOT NULL,
+            channel_id BIGINT,
+            enabled BOOLEAN NOT NULL,
+            PRIMARY KEY (guild_id)
+        )
+    """)
+
+
+def _migrate_to_v4(cursor):
+    """
+    Adds the per-user statistics table and fills it from the stored results.
+
+    Args:
+        cursor (sqlite3.Cursor): A cursor inside the migration transaction.
+    """
+    cursor.execute("""
+        CREATE TABLE user_stats (
+            user_id INTEGER NOT NULL,
+            games_played INTEGER NOT NULL,
+            total_score INTEGER NOT NULL,
+            best_score INTEGER NOT NULL,
+            wins INTEGER NOT NULL,
+            current_streak INTEGER NOT NULL,
+            longest_streak INTEGER NOT NULL,
+            last_played DATE,
+            PRIMARY KEY (user_id),
+            FOREIGN KEY(user_id) REFERENCES user (id)
+        )
+    """)
+
+    rows = cursor.execute("""
+        SELECT user_daily_result.user_id, user_daily_result.challenge_token, challenge.time, user_daily_result.score
+        FROM user_daily_result JOIN challenge ON user_daily_result.challenge_token = challenge.challenge_token
+        ORDER BY challenge.time, user_daily_result.challenge_token
+    """)
+    stats = compute_user_stats(
+        (user_id, challenge_token, datetime.date.fromisoformat(time[:10]) if time else None, score)
+        for user_id, challenge_token, time, score in rows
+    )
+
+    cursor.executemany(
+        """
+        INSERT INTO user_stats (user_id, games_played, total_score, best_score, wins, current_streak, longest_streak, last_played)
+        VALUES (:user_id, :games_played, :total_score, :best_score, :wins, :current_streak, :longest_streak, :last_played)
+        """,
+        [{**user_stats, 'last_played': user_stats['last_played'].isoformat() if user_stats['last_played'] else None} for user_stats in stats.values()]
+    )
+
+
+def _migrate_to_v5(cursor):
+    """
+    Adds the per-round results table.
+
+    Args:
+        cursor (sqlite3.Cursor): A cursor inside the migration transaction.
+    """
+    cursor.execute("""
+        CREATE TABLE user_round_result (
+            user_round_id INTEGER NOT NULL,
+            user_daily_id INTEGER NOT NULL,
+            round_number SMALLINT NOT NULL,
+            score INTEGER,
+            distance INTEGER,
+            time INTEGER,
+            timed_out BOOLEAN,
+            PRIMARY KEY (user_round_id),
+            FOREIGN KEY(user_daily_id) REFERENCES user_daily_result (user_daily_id)
+        )
+    """)
+    cursor.execute(
+        "CREATE UNIQUE INDEX ix_user_round_result_user_daily_id_round_number ON user_round_result (user_daily_id, round_number)"
+    )
+
+
+def _migrate_to_v6(cursor):
+    """
+    Adds the leaderboard table and fills it from the stored results.
+
+    Args:
+        cursor (sqlite3.Cursor): A cursor inside the migration transaction.
+    """
+    cursor.execute("""
+        CREATE TABLE leaderboard (
+            period VARCHAR NOT NULL,
+            user_id INTEGER NOT NULL,
+            games_played INTEGER NOT NULL,
+            total_score INTEGER NOT NULL,
+            PRIMARY KEY (period, user_id),
+            FOREIGN KEY(user_id) REFERENCES user (id)
+        )
+    """)
+    cursor.execute("CREATE INDEX ix_leaderboard_period_total_score ON leaderboard (period, total_score)")
+
+    today = datetime.datetime.now(tz=datetime.timezone.utc).date()
+    for period in LEADERBOARD_PERIODS:
+        start = period_start(period, today)
+        cursor.execute(
+            """
+            INSERT INTO leaderboard (period, user_id, games_played, total_score)
+            SELECT ?, user_daily_result.user_id, COUNT(*), COALESCE(SUM(user_daily_result.score), 0)
+            FROM user_daily_result JOIN challenge ON user_daily_result.challenge_token = challenge.challenge_token
+            WHERE ? IS NULL OR challenge.time >= ?
+            GROUP BY user_daily_result.user_id
+            """,
+            (period, start and start.isoformat(), start and start.isoformat())
+        )
+
+
+# Ordered list of (version, migration). Each migration upgrades the schema from the previous version.
+MIGRATIONS = [
+    (2, _migrate_to_v2),
+    (3, _migrate_to_v3),
+    (4, _migrate_to_v4),
+    (5, _migrate_to_v5),
+    (6, _migrate_to_v6),
+]
+
+
+def get_schema_version(dbapi_connection) -> int:
+    """
+    Reads the schema version of a database.
+
+    Args:
+        dbapi_connection (sqlite3.Connection): The raw database connection.
+
+    Returns:
+        int: The schema version, 0 for an empty database and 1 for a database created before versioning.
+    """
+    version = dbapi_connection.execute("PRAGMA user_version").fetchone()[0]
+    if version == 0:
+        has_tables = dbapi_connection.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'user'"
+        ).fetchone()
+        if has_tables:
+            version = 1
+
+    return version
+
+
+def upgrade_database(engine) -> int:
+    """
+    Creates the database or upgrades it in place to the latest schema version.
+
+    Each migration runs in its own transaction together with the version bump, so a failed
+    migration leaves the database at the previous version.
+
+    Args:
+        engine (sqlalchemy.engine.Engine): The engine of the database to upgrade.
+
+    Returns:
+        int: The schema version of the database after upgrading.
+    """
+    connection = engine.raw_connection()
+    try:
+        version = get_schema_version(connection.connection)
+    finally:
+        connection.close()
+
+    if version == 0:
+        Base.metadata.create_all(engine)
+        with engine.begin() as connection:
+            connection.exec_driver_sql(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        return SCHEMA_VERSION
+
+    connection = engine.raw_connection()
+    dbapi_connection = connection.connection
+    isolation_level = dbapi_connection.isolation_level
+    try:
+        # Manage the transactions explicitly so that DDL is part of them
+        dbapi_connection.isolation_level = None
+        dbapi_connection.execute("PRAGMA foreign_keys = OFF")
+        for migration_version, migration in MIGRATIONS:
+            if migration_version <= version:
+                continue
+
+            cursor = dbapi_connection.cursor()
+            cursor.execute("BEGIN")
+            try:
+                migration(cursor)
+                cursor.execute(f"PRAGMA user_version = {migration_version}")
+                cursor.execute("COMMIT")
+            except:
+                cursor.execute("ROLLBACK")
+                raise
+            finally:
+                cursor.close()
+
+            version = migration_version
+
+        return version
+    finally:
+        dbapi_connection.isolation_level = isolation_level
+        connection.close()
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey
+from sqlalchemy import Column, Integer, SmallInteger, BigInteger, Boolean, String, Date, DateTime, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.ext.declarative import declarative_base
 
@@ -7,24 +7,75 @@ Base = declarative_base()
 class User(Base):
     __tablename__ = 'user'
     id = Column(Integer, primary_key=True, autoincrement=True)
-    geo_id = Column(String)
-    geo_name = Column(String)
-    discord_id = Column(String)
+    geo_id = Column(String, unique=True, index=True)
+    geo_name = Column(String, index=True)
+    discord_id = Column(BigInteger, unique=True, index=True)
     user_daily_result = relationship('UserDailyResult', back_populates='user')
     
 
 class Challenge(Base):
     __tablename__ = 'challenge'
     challenge_token = Column(String, primary_key=True)
-    time = Column(String)
+    time = Column(DateTime, index=True)  # UTC
     user_daily_result = relationship('UserDailyResult', back_populates='challenge')
     
 
 class UserDailyResult(Base):
     __tablename__ = 'user_daily_result'
+    __table_args__ = (
+        Index('ix_user_daily_result_user_id_challenge_token', 'user_id', 'challenge_token', unique=True),
+    )
     user_daily_id = Column(Integer, primary_key=True, autoincrement=True)
     user_id = Column(Integer, ForeignKey('user.id'))
     user = relationship('User', back_populates='user_daily_result')
     score = Column(Integer)
-    challenge_token = Column(String, ForeignKey('challenge.challenge_token'))
+    challenge_token = Column(String, ForeignKey('challenge.challenge_token'), index=True)
     challenge = relationship('Challenge', back_populates='user_daily_result')
+    rounds = relationship('UserRoundResult', back_populates='user_daily_result', order_by='UserRoundResult.round_number')
+
+
+class GuildConfig(Base):
+    __tablename__ = 'guild_config'
+    guild_id = Column(BigInteger, primary_key=True, autoincrement=False)
+    channel_id = Column(BigInteger)
+    enabled = Column(Boolean, default=True, nullable=False)
+
+
+class UserStats(Base):
+    __tablename__ = 'user_stats'
+    user_id = Column(Integer, ForeignKey('user.id'), primary_key=True, autoincrement=False)
+    user = relationship('User')
+    games_played = Column(Integer, default=0, nullable=False)
+    total_score = Column(Integer, default=0, nullable=False)
+    best_score = Column(Integer, default=0, nullable=False)
+    wins = Column(Integer, default=0, nullable=False)  # Days with the best score among friends, ties included
+    current_streak = Column(Integer, default=0, nullable=False)  # Consecutive days played up to last_played
+    longest_streak = Column(Integer, default=0, nullable=False)
+    last_played = Column(Date)
+
+
+class UserRoundResult(Base):
+    __tablename__ = 'user_round_result'
+    __table_args__ = (
+        Index('ix_user_round_result_user_daily_id_round_number', 'user_daily_id', 'round_number', unique=True),
+    )
+    user_round_id = Column(Integer, primary_key=True, autoincrement=True)
+    user_daily_id = Column(Integer, ForeignKey('user_daily_result.user_daily_id'), nullable=False)
+    user_daily_result = relationship('UserDailyResult', back_populates='rounds')
+    round_number = Column(SmallInteger, nullable=False)  # 1-based
+    score = Column(Integer)
+    distance = Column(Integer)  # Meters
+    time = Column(Integer)  # Seconds
+    timed_out = Column(Boolean)
+
+
+class LeaderboardEntry(Base):
+    __tablename__ = 'leaderboard'
+    __table_args__ = (
+        Index('ix_leaderboard_period_total_score', 'period', 'total_score'),
+    )
+    period = Column(String, primary_key=True)  # 'week' (last 7 days), 'month' (calendar month) or 'all'
+    user_id = Column(Integer, ForeignKey('user.id'), primary_key=True, autoincrement=False)
+    user = relationship('User')
+    games_played = Column(Integer, default=0, nullable=False)
+    total_score = Column(Integer, default=0, nullable=False)
\ No newline at end of file
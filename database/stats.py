@@ -0,0 +1,166 @@
+import datetime
+
+from sqlalchemy import func
+from sqlalchemy.dialects.sqlite import insert
+
+from .models import Challenge, UserDailyResult, UserStats
+
+
+def _empty_stats(user_id) -> dict:
+    return {
+        'user_id': user_id,
+        'games_played': 0,
+        'total_score': 0,
+        'best_score': 0,
+        'wins': 0,
+        'current_streak': 0,
+        'longest_streak': 0,
+        'last_played': None,
+    }
+
+
+def _record_game(stats, score, played_on):
+    """
+    Adds one daily result to a user's statistics.
+
+    Args:
+        stats (dict): The statistics to update, as returned by _empty_stats.
+        score (int): The score of the result.
+        played_on (datetime.date): The date of the challenge, or None if unknown.
+    """
+    stats['games_played'] += 1
+    stats['total_score'] += score
+    stats['best_score'] = max(stats['best_score'], score)
+
+    if played_on is None:
+        return
+
+    last_played = stats['last_played']
+    if last_played is None or played_on > last_played + datetime.timedelta(days=1):
+        stats['current_streak'] = 1
+    elif played_on == last_played + datetime.timedelta(days=1):
+        stats['current_streak'] += 1
+    else:
+        # A day already counted or older than the last one played, e.g. from a backfill
+        return
+
+    stats['last_played'] = played_on
+    stats['longest_streak'] = max(stats['longest_streak'], stats['current_streak'])
+
+
+def compute_user_stats(rows) -> dict:
+    """
+    Computes every user's statistics from their full history.
+
+    Args:
+        rows (iterable): (user_id, challenge_token, played_on, score) tuples ordered by played_on
+            and grouped by challenge_token.
+
+    Returns:
+        dict: The statistics of each user, keyed by user id.
+    """
+    stats = {}
+    challenge_results = []
+    current_token = None
+
+    def record_wins():
+        if challenge_results:
+            best_score = max(score for _, score in challenge_results)
+            for user_id, score in challenge_results:
+                if score == best_score:
+                    stats[user_id]['wins'] += 1
+
+    for user_id, challenge_token, played_on, score in rows:
+        if challenge_token != current_token:
+            record_wins()
+            challenge_results = []
+            current_token = challenge_token
+
+        user_stats = stats.setdefault(user_id, _empty_stats(user_id))
+        _record_game(user_stats, score or 0, played_on)
+        challenge_results.append((user_id, score or 0))
+
+    record_wins()
+    return stats
+
+
+def update_user_stats(session, challenge_token, played_on, new_results):
+    """
+    Updates the statistics of the users with new results. Call before inserting the results.
+
+    Only the rows of the users involved and today's best score are read, and the new rows are
+    written with one executemany upsert, so the number of statements depends neither on how much
+    history is stored nor on how many friends submitted.
+
+    Args:
+        session (sqlalchemy.orm.Session): The session inserting the results.
+        challenge_token (str): The challenge the results belong to.
+        played_on (datetime.date): The date of the challenge.
+        new_results (list): Dicts with the user_id and score of each new result.
+    """
+    if not new_results:
+        return
+
+    keys = list(_empty_stats(None))
+    user_ids = [result['user_id'] for result in new_results]
+    stats = {
+        row[0]: dict(zip(keys, row))
+        for row in session.query(*(getattr(UserStats, key) for key in keys)).filter(UserStats.user_id.in_(user_ids))
+    }
+
+    for result in new_results:
+        user_stats = stats.setdefault(result['user_id'], _empty_stats(result['user_id']))
+        _record_game(user_stats, result['score'], played_on)
+
+    # Wins go to the best score of the day, moving away from earlier leaders when it is beaten
+    previous_best = (
+        session.query(func.max(UserDailyResult.score))
+        .filter(UserDailyResult.challenge_token == challenge_token)
+        .scalar()
+    )
+    new_best = max(result['score'] for result in new_results)
+
+    if previous_best is None or new_best >= previous_best:
+        if previous_best is not None and new_best > previous_best:
+            previous_winner_ids = (
+                session.query(UserDailyResult.user_id)
+                .filter(UserDailyResult.challenge_token == challenge_token, UserDailyResult.score == previous_best)
+            )
+            session.query(UserStats).filter(UserStats.user_id.in_(previous_winner_ids)).update(
+                {UserStats.wins: UserStats.wins - 1}, synchronize_session=False
+            )
+
+        for result in new_results:
+            if result['score'] == new_best:
+                stats[result['user_id']]['wins'] += 1
+
+    stats_insert = insert(UserStats.__table__)
+    session.execute(
+        stats_insert.on_conflict_do_update(
+            index_elements=['user_id'],
+            set_={key: stats_insert.excluded[key] for key in keys if key != 'user_id'}
+        ),
+        list(stats.values())
+    )
+
+
+def rebuild_user_stats(session):
+    """
+    Recomputes the statistics table from the full history, e.g. after a backfill.
+
+    Args:
+        session (sqlalchemy.orm.Session): The session to rebuild the statistics in.
+    """
+    rows = (
+        session.query(UserDailyResult.user_id, UserDailyResult.challenge_token, Challenge.time, UserDailyResult.score)
+        .join(Challenge, UserDailyResult.challenge_token == Challenge.challenge_token)
+        .order_by(Challenge.time, UserDailyResult.challenge_token)
+        .yield_per(5000)
+    )
+    stats = compute_user_stats(
+        (user_id, challenge_token, time.date() if time else None, score)
+        for user_id, challenge_token, time, score in rows
+    )
+
+    session.query(UserStats).delete(synchronize_session=False)
+    session.bulk_insert_mappings(UserStats, list(stats.values()))
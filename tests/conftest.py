@@ -6,3 +6,6 @@ project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
 
 # Add the project root directory to the Python path
 sys.path.append(project_root)
+
+# Add the app directory so that app modules can import each other as they do when run as scripts
+sys.path.append(os.path.join(project_root, 'app'))
\ No newline at end of file
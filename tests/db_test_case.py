@@ -0,0 +1,54 @@
+import asyncio
+import functools
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from database import Base
+
+
+class DatabaseTestCase(unittest.TestCase):
+    """
+    Base test case backed by a fresh in-memory database that counts executed statements.
+
+    Patch a module's session_scope with self._session_scope to run it against this database, and
+    its run_in_db_executor with self._run_in_db_executor when it saves from several tasks at once.
+    """
+
+    def setUp(self):
+        self.engine = create_engine('sqlite://', connect_args={'check_same_thread': False}, poolclass=StaticPool)
+        Base.metadata.create_all(self.engine)
+        self.Session = sessionmaker(bind=self.engine)
+
+        self.statements = 0
+        event.listen(self.engine, 'before_cursor_execute', self._count_statement)
+
+    def tearDown(self):
+        self.engine.dispose()
+        if getattr(self, '_db_executor', None) is not None:
+            self._db_executor.shutdown()
+
+    def _count_statement(self, *args):
+        self.statements += 1
+
+    async def _run_in_db_executor(self, func, *args, **kwargs):
+        # All threads share the one in-memory connection, so database work runs one call at a time
+        if getattr(self, '_db_executor', None) is None:
+            self._db_executor = ThreadPoolExecutor(max_workers=1)
+        return await asyncio.get_running_loop().run_in_executor(self._db_executor, functools.partial(func, *args, **kwargs))
+
+    @contextmanager
+    def _session_scope(self, _=None):
+        session = self.Session()
+        try:
+            yield session
+            session.commit()
+        except:
+            session.rollback()
+            raise
+        finally:
+            session.close()
\ No newline at end of file
@@ -0,0 +1,33 @@
+import unittest
+from datetime import datetime, timezone
+
+from app.AdaptivePolling import AdaptivePollInterval
+
+BUSY = datetime(2024, 4, 5, 1, tzinfo=timezone.utc)
+QUIET = datetime(2024, 4, 5, 15, tzinfo=timezone.utc)
+
+
+class TestAdaptivePollInterval(unittest.TestCase):
+
+    def setUp(self):
+        self.poll_interval = AdaptivePollInterval(min_interval=30, max_interval=900, busy_max_interval=60, busy_hours=3)
+
+    def test_backs_off_to_max_when_quiet(self):
+        intervals = [self.poll_interval.next_interval(False, QUIET) for _ in range(8)]
+
+        self.assertEqual(intervals[:3], [60, 120, 240])
+        self.assertEqual(intervals[-1], 900)
+
+    def test_capped_during_busy_window(self):
+        intervals = [self.poll_interval.next_interval(False, BUSY) for _ in range(5)]
+
+        self.assertEqual(max(intervals), 60)
+
+    def test_resets_on_change(self):
+        for _ in range(5):
+            self.poll_interval.next_interval(False, QUIET)
+
+        self.assertEqual(self.poll_interval.next_interval(True, QUIET), 30)
+
+if __name__ == '__main__':
+    unittest.main()
\ No newline at end of file
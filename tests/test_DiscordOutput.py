@@ -0,0 +1,126 @@
+import asyncio
+import datetime
+import unittest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import discord
+
+from app import GeoguessrDiscordBot
+from app.DiscordOutput import DiscordOutputStage, MESSAGE_LIMIT
+from database import User, Challenge, UserDailyResult
+from db_test_case import DatabaseTestCase
+
+
+def rate_limited(retry_after='0'):
+    response = MagicMock(status=429, headers={'Retry-After': retry_after})
+    return discord.HTTPException(response, 'rate limited')
+
+
+class TestDiscordOutputStage(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.output = DiscordOutputStage(retry_delay=0)
+        self.output.message_channel = MagicMock(send=AsyncMock(return_value=MagicMock(edit=AsyncMock())))
+        self.output.thread = MagicMock(send=AsyncMock())
+
+    async def test_coalesces_cycle_output(self):
+        for i in range(10):
+            self.output.queue_results_embed(discord.Embed(title=str(i)))
+            self.output.queue_announcement(f"New result: friend {i} scored - {i} points!")
+        await self.output.flush()
+
+        self.output.message_channel.send.assert_awaited_once()
+        self.assertEqual(self.output.message_channel.send.await_args.kwargs['embed'].title, '9')
+        self.output.thread.send.assert_awaited_once()
+        self.assertEqual(self.output.thread.send.await_args.args[0].count('\n'), 9)
+
+        # The next cycle edits the message sent by the first one
+        self.output.queue_results_embed(discord.Embed(title='next'))
+        await self.output.flush()
+        self.output.results_message.edit.assert_awaited_once()
+        self.output.thread.send.assert_awaited_once()
+
+    async def test_splits_long_announcements(self):
+        for i in range(100):
+            self.output.queue_announcement('x' * 100)
+        await self.output.flush()
+
+        messages = [call.args[0] for call in self.output.thread.send.await_args_list]
+        self.assertEqual(len(messages), 6)
+        self.assertTrue(all(len(message) <= MESSAGE_LIMIT for message in messages))
+
+    async def test_retries_rate_limited_requests(self):
+        self.output.thread.send.side_effect = [rate_limited(), None]
+        self.output.queue_announcement('New result')
+        await self.output.flush()
+
+        self.assertEqual(self.output.thread.send.await_count, 2)
+
+    async def test_drops_stale_edit(self):
+        results_message = MagicMock()
+        self.output.results_message = results_message
+        edited = []
+
+        async def edit(embed):
+            if not edited:
+                edited.append(None)
+                # A newer embed arrives while the first edit is being rate limited
+                self.output.queue_results_embed(discord.Embed(title='new'))
+                raise rate_limited()
+            edited.append(embed.title)
+
+        results_message.edit = edit
+        self.output.queue_results_embed(discord.Embed(title='old'))
+        await self.output.flush()
+        await self.output.flush()
+
+        self.assertEqual(edited, [None, 'new'])
+
+    async def test_attaches_card(self):
+        self.output.queue_results_embed(discord.Embed(title='card'), b'png')
+        await self.output.flush()
+        self.assertEqual(self.output.message_channel.send.await_args.kwargs['file'].filename, 'results.png')
+
+        # A text-only update removes the previous card
+        self.output.queue_results_embed(discord.Embed(title='text'))
+        await self.output.flush()
+        self.assertEqual(self.output.results_message.edit.await_args.kwargs['attachments'], [])
+
+class TestCheckDailyResults(DatabaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        with self._session_scope() as session:
+            session.add(Challenge(challenge_token='today', time=datetime.datetime(2024, 4, 1)))
+            for i in range(50):
+                user = User(geo_id=f'geo_{i}', geo_name=f'friend {i}', discord_id=100000000000000000 + i if i % 2 else None)
+                session.add(UserDailyResult(user=user, challenge_token='today', score=i))
+
+        self.output = DiscordOutputStage(retry_delay=0)
+        self.output.message_channel = MagicMock(send=AsyncMock())
+        self.output.thread = MagicMock(send=AsyncMock())
+        geo_query = MagicMock(check_for_new_results=AsyncMock(return_value=list(range(1, 51))), fetch_results=AsyncMock())
+        geo_query.policy.breaker.seconds_until_retry.return_value = 0
+
+        bot = GeoguessrDiscordBot.bot
+        for patcher in (
+            patch('app.GeoguessrDiscordBot.session_scope', self._session_scope),
+            patch('app.GeoguessrDiscordBot.geo_query', geo_query),
+            # The results embed is covered by its own tests, only the announcements are sent here
+            patch('app.GeoguessrDiscordBot.update_todays_results', AsyncMock(side_effect=bot.flush_outputs)),
+            patch.object(bot, 'outputs', {1: self.output}),
+            patch.object(bot, 'fetch_user', AsyncMock()),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_announcements_make_no_fetch_user_calls(self):
+        asyncio.run(GeoguessrDiscordBot.check_daily_results())
+
+        GeoguessrDiscordBot.bot.fetch_user.assert_not_called()
+        announcement = "\n".join(call.args[0] for call in self.output.thread.send.await_args_list)
+        self.assertIn("New result: <@100000000000000001> scored - 1 points!", announcement)
+        self.assertIn("New result: friend 2 scored - 2 points!", announcement)
+
+if __name__ == '__main__':
+    unittest.main()
\ No newline at end of file
@@ -0,0 +1,106 @@
+import datetime
+import json
+import os
+import unittest
+from unittest.mock import MagicMock
+
+from GeoguessrBackfill import ResultsPageParser, ResultsBackfill, iter_results_endpoint, iter_results_file, _started_at
+from database import User, Challenge, UserDailyResult
+from db_test_case import DatabaseTestCase
+
+EXAMPLE_RESULTS = os.path.join(os.path.dirname(__file__), '..', 'example-json', 'example-results.json')
+
+
+class TestResultsPageParser(unittest.TestCase):
+
+    def test_matches_full_parse_for_any_chunk_size(self):
+        with open(EXAMPLE_RESULTS, encoding='utf-8') as file:
+            expected = json.load(file)['items']
+
+        for chunk_size in (1, 7, 4096, 1 << 20):
+            self.assertEqual(list(iter_results_file(EXAMPLE_RESULTS, chunk_size=chunk_size)), expected)
+
+    def test_reads_pagination_token(self):
+        page = '{"items": [{"userId": "a"}, {"userId": "b"}], "paginationToken": "next-page"}'
+        parser = ResultsPageParser()
+        items = [item for i in range(0, len(page), 5) for item in parser.feed(page[i:i + 5])]
+        parser.close()
+
+        self.assertEqual(items, [{"userId": "a"}, {"userId": "b"}])
+        self.assertEqual(parser.pagination_token, "next-page")
+
+    def test_truncated_page(self):
+        parser = ResultsPageParser()
+        parser.feed('{"items": [{"userId": "a"}, {"user')
+
+        with self.assertRaises(ValueError):
+            parser.close()
+
+    def test_endpoint_fetches_friends_only(self):
+        response = MagicMock()
+        response.__enter__.return_value.iter_content.return_value = [b'{"items": [{"userId": "a"}]}']
+        requests_session = MagicMock(get=MagicMock(return_value=response))
+
+        self.assertEqual(list(iter_results_endpoint(requests_session, 'challenge')), [{"userId": "a"}])
+        self.assertIn('friends=true', requests_session.get.call_args.args[0])
+
+
+class TestResultsBackfill(DatabaseTestCase):
+
+    def _items(self, challenge_count, friend_count):
+        for challenge in range(challenge_count):
+            for friend in range(friend_count):
+                yield f'challenge_{challenge}', {
+                    'userId': f'geo_{friend}',
+                    'playerName': f'friend {friend}',
+                    'totalScore': challenge * friend,
+                    'game': {'rounds': [{'startTime': f'2024-04-{challenge + 1:02d}T00:32:38.8470000+00:00'}]},
+                }
+
+    def test_batched_upsert(self):
+        with self._session_scope() as session:
+            session.add(User(geo_id='geo_0', geo_name='current nick'))
+
+        backfill = ResultsBackfill(self.engine, batch_size=100)
+        for challenge_token, item in self._items(5, 60):
+            backfill.add(challenge_token, item)
+        backfill.flush()
+
+        # Running it again only updates the existing rows
+        for challenge_token, item in self._items(5, 60):
+            backfill.add(challenge_token, item)
+        backfill.flush()
+
+        with self._session_scope() as session:
+            self.assertEqual(session.query(User).count(), 60)
+            self.assertEqual(session.query(User.geo_name).filter(User.geo_id == 'geo_0').scalar(), 'current nick')
+            self.assertEqual(session.query(Challenge).count(), 5)
+            self.assertEqual(session.query(UserDailyResult).count(), 300)
+            self.assertEqual(session.query(Challenge.time).filter(Challenge.challenge_token == 'challenge_1').scalar().day, 2)
+
+        self.assertEqual(backfill.rows_written, 600)
+
+    def test_started_at_formats(self):
+        def item(start_time):
+            return {'game': {'rounds': [{'startTime': start_time}]}}
+
+        expected = datetime.datetime(2024, 4, 5, 0, 32, 38, 847000)
+        self.assertEqual(_started_at(item('2024-04-05T00:32:38.8470000+00:00')), expected)
+        self.assertEqual(_started_at(item('2024-04-05T02:32:38.847+02:00')), expected)
+        self.assertEqual(_started_at(item('2024-04-05T00:32:38.8470000Z')), expected)
+        self.assertEqual(_started_at(item('2024-04-05T00:32:38.8+00:00')), datetime.datetime(2024, 4, 5, 0, 32, 38, 800000))
+        self.assertEqual(_started_at(item('2024-04-05T00:32:38+00:00')), datetime.datetime(2024, 4, 5, 0, 32, 38))
+        self.assertIsNone(_started_at(item('not a time')))
+        self.assertIsNone(_started_at({'game': {'rounds': []}}))
+
+    def test_example_results_file(self):
+        backfill = ResultsBackfill(self.engine)
+        backfill.add_all('Nk8EOAdIf3UZ4YWM', iter_results_file(EXAMPLE_RESULTS))
+        backfill.flush()
+
+        with self._session_scope() as session:
+            self.assertEqual(session.query(UserDailyResult).count(), backfill.rows_written)
+            self.assertGreater(backfill.rows_written, 0)
+
+if __name__ == '__main__':
+    unittest.main()
\ No newline at end of file
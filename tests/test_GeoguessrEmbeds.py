@@ -0,0 +1,102 @@
+import unittest
+from datetime import datetime, timezone
+from unittest.mock import patch
+
+from app import GeoguessrEmbeds
+from database import User, Challenge, UserDailyResult, LeaderboardEntry
+from db_test_case import DatabaseTestCase
+
+
+class TestTodaysResultsEmbed(DatabaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        patcher = patch('app.GeoguessrEmbeds.session_scope', self._session_scope)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        GeoguessrEmbeds.invalidate_todays_results_embed()
+
+        with self._session_scope() as session:
+            alice = User(geo_id='geo_a', geo_name='Alice')
+            bob = User(geo_id='geo_b', geo_name='Bob')
+            session.add_all([alice, bob])
+            session.add(Challenge(challenge_token='yesterday', time=datetime(2024, 4, 4, tzinfo=timezone.utc)))
+            session.add(Challenge(challenge_token='today', time=datetime(2024, 4, 5, tzinfo=timezone.utc)))
+            session.add_all([
+                UserDailyResult(user=alice, score=1000, challenge_token='yesterday'),
+                UserDailyResult(user=alice, score=12000, challenge_token='today'),
+                UserDailyResult(user=bob, score=20000, challenge_token='today'),
+            ])
+
+    def test_scoped_sorted_and_single_query(self):
+        self.statements = 0
+        embed = GeoguessrEmbeds.get_todays_results_embed('today')
+
+        self.assertEqual(embed.fields[0].value, "Bob: 20000\nAlice: 12000")
+        self.assertEqual(self.statements, 1)
+
+    def test_cached_until_invalidated(self):
+        embed = GeoguessrEmbeds.get_todays_results_embed('today')
+
+        self.statements = 0
+        self.assertIs(GeoguessrEmbeds.get_todays_results_embed('today'), embed)
+        self.assertEqual(self.statements, 0)
+
+        GeoguessrEmbeds.invalidate_todays_results_embed()
+        self.assertIsNot(GeoguessrEmbeds.get_todays_results_embed('today'), embed)
+        self.assertEqual(self.statements, 1)
+
+    def test_leaderboard_single_query(self):
+        with self._session_scope() as session:
+            session.add_all([
+                LeaderboardEntry(period='week', user_id=1, games_played=2, total_score=13000),
+                LeaderboardEntry(period='week', user_id=2, games_played=1, total_score=20000),
+                LeaderboardEntry(period='all', user_id=1, games_played=9, total_score=90000),
+            ])
+
+        self.statements = 0
+        embed = GeoguessrEmbeds.get_leaderboard_embed('week')
+
+        self.assertEqual(embed.fields[0].value, "1. Bob: 20000 (1 games)\n2. Alice: 13000 (2 games)")
+        self.assertEqual(self.statements, 1)
+
+class TestUserListPages(DatabaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        patcher = patch('app.GeoguessrEmbeds.session_scope', self._session_scope)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        GeoguessrEmbeds.invalidate_user_list()
+        self.addCleanup(GeoguessrEmbeds.invalidate_user_list)
+
+        with self._session_scope() as session:
+            session.add_all(User(geo_id=f'geo_{i}', geo_name=f'Friend {i}', discord_id=i if i % 2 else None) for i in range(45))
+
+    def test_keyset_pages(self):
+        users, next_after_id = GeoguessrEmbeds.get_user_list_page()
+        self.assertEqual(len(users), GeoguessrEmbeds.USER_LIST_PAGE_SIZE)
+        self.assertEqual(users[:2], [('Friend 0', False), ('Friend 1', True)])
+
+        users, next_after_id = GeoguessrEmbeds.get_user_list_page(next_after_id)
+        self.assertEqual(users[0][0], 'Friend 20')
+
+        users, next_after_id = GeoguessrEmbeds.get_user_list_page(next_after_id)
+        self.assertEqual(len(users), 5)
+        self.assertIsNone(next_after_id)
+
+    def test_pages_cached_until_invalidated(self):
+        embed = GeoguessrEmbeds.get_user_list_embed(0, 1)
+        self.assertEqual(embed.footer.text, "Page 1")
+        self.assertLessEqual(len(embed.fields[0].value), 1024)
+
+        self.statements = 0
+        GeoguessrEmbeds.get_user_list_embed(0, 1)
+        self.assertEqual(self.statements, 0)
+
+        GeoguessrEmbeds.invalidate_user_list()
+        GeoguessrEmbeds.get_user_list_embed(0, 1)
+        self.assertEqual(self.statements, 1)
+
+if __name__ == '__main__':
+    unittest.main()
\ No newline at end of file
@@ -0,0 +1,59 @@
+import json
+import unittest
+
+from app.GeoguessrModels import DailyChallenge, FriendsSummary, ResultsPage, SchemaDriftError, parse_payload
+
+
+def read_example(name) -> bytes:
+    with open(f'example-json/{name}', 'rb') as file:
+        return file.read()
+
+
+class TestGeoguessrModels(unittest.TestCase):
+
+    def test_parses_example_challenge(self):
+        challenge = parse_payload(DailyChallenge, read_example('example-challenge.json'))
+        example = json.loads(read_example('example-challenge.json'))
+
+        self.assertEqual(challenge.token, example['token'])
+        self.assertEqual(
+            [(friend.id, friend.total_score) for friend in challenge.friends],
+            [(friend['id'], friend['totalScore']) for friend in example['friends']]
+        )
+
+    def test_parses_example_friends(self):
+        summary = parse_payload(FriendsSummary, read_example('example-friends.json'))
+        example = json.loads(read_example('example-friends.json'))
+
+        self.assertEqual(summary.friends[0].user_id, example['friends'][0]['userId'])
+        self.assertEqual(summary.friends[0].nick, example['friends'][0]['nick'])
+
+    def test_parses_example_results(self):
+        page = parse_payload(ResultsPage, read_example('example-results.json'))
+        example = json.loads(read_example('example-results.json'))
+
+        guess = page.items[0].game.player.guesses[0]
+        example_guess = example['items'][0]['game']['player']['guesses'][0]
+        self.assertEqual(len(page.items), len(example['items']))
+        self.assertIsNone(page.pagination_token)
+        self.assertEqual((guess.round_score_in_points, guess.distance_in_meters, guess.time, guess.timed_out),
+                         (example_guess['roundScoreInPoints'], example_guess['distanceInMeters'], example_guess['time'], example_guess['timedOut']))
+
+    def test_missing_friends_section_is_empty(self):
+        for body in (b'{"token": "abc"}', b'{"token": "abc", "friends": null}'):
+            self.assertEqual(parse_payload(DailyChallenge, body).friend_results, [])
+
+    def test_schema_drift_names_the_field(self):
+        body = json.dumps({'token': 'abc', 'friends': [{'id': 'x', 'score': 1}]})
+
+        with self.assertRaises(SchemaDriftError) as context:
+            parse_payload(DailyChallenge, body)
+        self.assertIn('DailyChallenge', str(context.exception))
+        self.assertIn('friends.0.totalScore', str(context.exception))
+
+    def test_invalid_json_is_schema_drift(self):
+        with self.assertRaises(SchemaDriftError):
+            parse_payload(FriendsSummary, b'<html>Maintenance</html>')
+
+if __name__ == '__main__':
+    unittest.main()
\ No newline at end of file
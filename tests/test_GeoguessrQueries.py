@@ -1,7 +1,13 @@
+import asyncio
+import json
 import unittest
-from unittest.mock import patch, MagicMock
-from app.GeoguessrQueries import GeoguessrQueries
+from unittest.mock import patch, MagicMock, AsyncMock
+from app.GeoguessrQueries import GeoguessrQueries, AsyncGeoguessrQueries, endpoint_label
+from GeoguessrModels import DailyChallenge, DailyChallengeToken, FriendsSummary, Profile, ProfileUser, ResultsPage
+from database import User, Challenge, UserDailyResult, UserRoundResult
 from datetime import datetime, timezone
+from db_test_case import DatabaseTestCase
+from yarl import URL
 
 class TestGeoguessrQueries(unittest.TestCase):
 
@@ -22,7 +28,7 @@ class TestGeoguessrQueries(unittest.TestCase):
     @patch('app.GeoguessrQueries.session_scope')
     def test_get_daily_challenge_token(self, mock_session_scope, mock_get):
         mock_response = MagicMock()
-        mock_response.json.return_value = {'token': 'fake_token'}
+        mock_response.content = b'{"token": "fake_token"}'
         mock_get.return_value = mock_response
 
         mock_session = MagicMock()
@@ -54,5 +60,379 @@ class TestGeoguessrQueries(unittest.TestCase):
             )
             self.assertEqual(token, 'fake_ncfa_token')
 
+class TestAsyncGeoguessrQueries(unittest.IsolatedAsyncioTestCase):
+
+    @patch('app.GeoguessrQueries.os.getenv')
+    async def test_update_geoguessr_session(self, mock_getenv):
+        mock_getenv.return_value = 'fake_token'
+
+        gq = AsyncGeoguessrQueries()
+        await gq.update_geoguessr_session()
+
+        cookies = gq.aiohttp_session.cookie_jar.filter_cookies(URL('https://www.geoguessr.com/api/v3/profiles'))
+        self.assertEqual(cookies['_ncfa'].value, 'fake_token')
+        await gq.close()
+        self.assertTrue(gq.aiohttp_session.closed)
+
+    @patch('app.GeoguessrQueries.session_scope')
+    async def test_get_daily_challenge_token(self, mock_session_scope):
+        mock_session = MagicMock()
+        mock_session_scope.return_value.__enter__.return_value = mock_session
+
+        gq = AsyncGeoguessrQueries()
+        gq._get_json = AsyncMock(return_value=DailyChallengeToken(token='fake_token'))
+        token = await gq.get_daily_challenge_token()
+
+        gq._get_json.assert_awaited_with('https://www.geoguessr.com/api/v3/challenges/daily-challenges/today', DailyChallengeToken)
+        mock_session.add.assert_called()
+        self.assertEqual(token, 'fake_token')
+        self.assertEqual(GeoguessrQueries.get_current_challenge_token(), 'fake_token')
+        GeoguessrQueries.current_challenge = None
+
+    async def test_check_for_new_results_not_modified(self):
+        GeoguessrQueries._cache_challenge('fake_token', datetime.now(tz=timezone.utc))
+        self.addCleanup(setattr, GeoguessrQueries, 'current_challenge', None)
+        gq = AsyncGeoguessrQueries()
+        gq._get_json_if_modified = AsyncMock(return_value=None)
+        gq._save_new_results = MagicMock()
+
+        self.assertIsNone(await gq.check_for_new_results())
+        gq._save_new_results.assert_not_called()
+
+    async def test_check_for_new_results_marks_successful_poll(self):
+        GeoguessrQueries._cache_challenge('fake_token', datetime.now(tz=timezone.utc))
+        self.addCleanup(setattr, GeoguessrQueries, 'current_challenge', None)
+        gq = AsyncGeoguessrQueries()
+        gq._get_json_if_modified = AsyncMock(return_value=None)
+
+        await gq.check_for_new_results()
+        self.assertIsNotNone(gq.last_successful_poll)
+
+    def test_endpoint_label(self):
+        self.assertEqual(endpoint_label('https://www.geoguessr.com/api/v3/results/highscores/abc?friends=true'), 'results/highscores')
+        self.assertEqual(endpoint_label('https://www.geoguessr.com/api/v3/profiles'), 'profiles')
+
+    async def test_check_for_new_results_request_error(self):
+        GeoguessrQueries._cache_challenge('fake_token', datetime.now(tz=timezone.utc))
+        self.addCleanup(setattr, GeoguessrQueries, 'current_challenge', None)
+        gq = AsyncGeoguessrQueries()
+        gq._get_json_if_modified = AsyncMock(side_effect=Exception('timeout'))
+
+        self.assertIsNone(await gq.check_for_new_results())
+
+class TestCheckForNewResultsQueryCount(DatabaseTestCase):
+    """
+    Runs _save_new_results against an in-memory database and checks that the
+    number of statements does not grow with the size of the friends list.
+    """
+
+    def tearDown(self):
+        super().tearDown()
+        GeoguessrQueries.current_challenge = None
+
+    def _seed(self, friend_count, day=0):
+        token = f'challenge_{friend_count}_{day}'
+        now = datetime.now(tz=timezone.utc)
+        with self._session_scope(None) as session:
+            session.add(Challenge(challenge_token=token, time=now))
+            if day == 0:
+                session.add_all(User(geo_id=f'friend_{friend_count}_{i}', geo_name=f'friend {i}') for i in range(friend_count))
+        GeoguessrQueries._cache_challenge(token, now)
+        # Scores vary per day, so every friend's statistics change in a different way
+        friends = [{'id': f'friend_{friend_count}_{i}', 'totalScore': (i * (day + 3)) % 7 * 1000} for i in range(friend_count)]
+        return DailyChallenge.model_validate({'token': token, 'friends': friends})
+
+    def _run(self, gq, daily_challenge_data):
+        self.statements = 0
+        with patch('app.GeoguessrQueries.session_scope', self._session_scope):
+            new_result_ids = gq._save_new_results(daily_challenge_data)
+        return new_result_ids, self.statements
+
+    def test_statement_count_is_constant(self):
+        statement_counts = set()
+        gq = GeoguessrQueries()
+        for friend_count in (10, 100, 1000):
+            daily_challenge_data = self._seed(friend_count)
+
+            new_result_ids, statements = self._run(gq, daily_challenge_data)
+            self.assertEqual(len(new_result_ids), friend_count)
+            statement_counts.add(statements)
+
+            # A second poll with the same payload is skipped before touching the database
+            new_result_ids, statements = self._run(gq, daily_challenge_data)
+            self.assertIsNone(new_result_ids)
+            self.assertEqual(statements, 0)
+
+            # The next challenge updates the statistics rows stored by the first one
+            new_result_ids, statements = self._run(gq, self._seed(friend_count, day=1))
+            self.assertEqual(len(new_result_ids), friend_count)
+            statement_counts.add(statements)
+
+        self.assertEqual(len(statement_counts), 1)
+
+    def test_missing_friends_section_stores_nothing(self):
+        self._seed(10)
+        gq = GeoguessrQueries()
+        daily_challenge = DailyChallenge.model_validate_json(b'{"token": "challenge_10_0", "friends": null}')
+
+        new_result_ids, statements = self._run(gq, daily_challenge)
+
+        self.assertIsNone(new_result_ids)
+        self.assertEqual(statements, 0)
+
+    def test_current_challenge_cache(self):
+        with self._session_scope(None) as session:
+            session.add(Challenge(challenge_token='yesterday', time=datetime(2024, 4, 4, tzinfo=timezone.utc)))
+            session.add(Challenge(challenge_token='today', time=datetime.now(tz=timezone.utc)))
+
+        with patch('app.GeoguessrQueries.session_scope', self._session_scope):
+            self.assertEqual(GeoguessrQueries().load_current_challenge(), 'today')
+
+        # A challenge from a previous UTC day is invalidated
+        GeoguessrQueries._cache_challenge('yesterday', datetime(2024, 4, 4, tzinfo=timezone.utc))
+        self.assertIsNone(GeoguessrQueries.get_current_challenge_token())
+        self.assertIsNone(GeoguessrQueries.current_challenge)
+
+class TestResultBeforeFriendSync(DatabaseTestCase):
+    """
+    A friend submits before update_friends has added them as a user.
+    """
+
+    def setUp(self):
+        super().setUp()
+        patcher = patch('app.GeoguessrQueries.session_scope', self._session_scope)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(setattr, GeoguessrQueries, 'current_challenge', None)
+
+        now = datetime.now(tz=timezone.utc)
+        with self._session_scope() as session:
+            session.add(Challenge(challenge_token='today', time=now))
+            session.add(User(geo_id='geo_a', geo_name='Alice'))
+            session.add(User(geo_id='self', geo_name='Bot'))
+        GeoguessrQueries._cache_challenge('today', now)
+        self.daily_challenge = DailyChallenge.model_validate({'token': 'today', 'friends': [
+            {'id': 'geo_a', 'totalScore': 20000},
+            {'id': 'geo_b', 'totalScore': 15000},
+        ]})
+
+    def _stored_scores(self):
+        with self._session_scope() as session:
+            return dict(session.query(User.geo_id, UserDailyResult.score).join(UserDailyResult, UserDailyResult.user_id == User.id))
+
+    def test_result_stored_on_next_poll_after_sync(self):
+        gq = GeoguessrQueries()
+        self.assertEqual(len(gq._save_new_results(self.daily_challenge)), 1)
+        self.assertEqual(gq.unknown_friend_ids, {'geo_b'})
+
+        gq._save_friends({'geo_a': 'Alice', 'geo_b': 'Bob'}, ProfileUser(id='self', nick='Bot'))
+
+        # The payload is unchanged, yet Bob's result is now stored
+        self.assertEqual(len(gq._save_new_results(self.daily_challenge)), 1)
+        self.assertEqual(self._stored_scores(), {'geo_a': 20000, 'geo_b': 15000})
+        self.assertEqual(gq.unknown_friend_ids, frozenset())
+
+    def _poll(self, gq, friends):
+        """
+        Runs one poll of the daily challenge, answering friend syncs with the given friends list.
+        """
+        async def get_json(url, model):
+            if model is Profile:
+                return Profile(user=ProfileUser(id='self', nick='Bot'))
+            return FriendsSummary(friends=[{'userId': geo_id, 'nick': nick} for geo_id, nick in friends.items()], friends_count=len(friends))
+
+        gq._get_json = AsyncMock(side_effect=get_json)
+        self.statements = 0
+        with patch('app.GeoguessrQueries.BASE_V3_URL', 'https://www.geoguessr.com/api/v3/'), \
+                patch('app.GeoguessrQueries.run_in_db_executor', self._run_in_db_executor):
+            asyncio.run(gq.check_for_new_results())
+        return gq._get_json.await_count
+
+    def test_unknown_friend_triggers_one_sync(self):
+        gq = AsyncGeoguessrQueries()
+        url = 'https://www.geoguessr.com/api/v3/challenges/daily-challenges/today/'
+        gq.http_validators = {url: {'If-None-Match': '"v1"'}}
+        gq._get_json_if_modified = AsyncMock(return_value=self.daily_challenge)
+
+        # Bob's result arrives before he is a user, so the friends list is synced right away
+        self.assertEqual(self._poll(gq, {'geo_a': 'Alice', 'geo_b': 'Bob'}), 2)
+        # A 304 would hide Bob's result, so the next poll asks for the full payload
+        self.assertNotIn(url, gq.http_validators)
+
+        gq.http_validators[url] = {'If-None-Match': '"v2"'}
+        self.assertEqual(self._poll(gq, {'geo_a': 'Alice', 'geo_b': 'Bob'}), 0)
+        self.assertEqual(self._stored_scores(), {'geo_a': 20000, 'geo_b': 15000})
+        self.assertIn(url, gq.http_validators)
+
+    def test_player_who_is_not_a_friend_is_synced_once(self):
+        gq = AsyncGeoguessrQueries()
+        url = 'https://www.geoguessr.com/api/v3/challenges/daily-challenges/today/'
+        gq.http_validators = {url: {'If-None-Match': '"v1"'}}
+        gq._get_json_if_modified = AsyncMock(return_value=self.daily_challenge)
+
+        self.assertEqual(self._poll(gq, {'geo_a': 'Alice'}), 2)
+
+        # geo_b is still unknown after the sync, yet an unchanged payload is skipped and keeps its validator
+        self.assertEqual(self._poll(gq, {'geo_a': 'Alice'}), 0)
+        self.assertEqual(self.statements, 0)
+        self.assertIn(url, gq.http_validators)
+        self.assertEqual(self._stored_scores(), {'geo_a': 20000})
+
+class TestFetchResults(DatabaseTestCase):
+    """
+    Fetches paginated results of several challenges against an in-memory database.
+    """
+
+    def setUp(self):
+        super().setUp()
+        with open('example-json/example-results.json') as file:
+            self.items = json.load(file)['items']
+        self.parsed_items = ResultsPage.model_validate({'items': self.items}).items
+
+        # Only the first three players have a stored daily result for each challenge
+        with self._session_scope() as session:
+            for index, item in enumerate(self.items[:3], start=1):
+                session.add(User(id=index, geo_id=item['userId'], geo_name=item['playerName']))
+            for challenge_token in ('challenge_a', 'challenge_b'):
+                session.add(Challenge(challenge_token=challenge_token))
+                session.add_all(UserDailyResult(user_id=index, challenge_token=challenge_token, score=1) for index in (1, 2, 3))
+
+    def _fake_get_json(self, in_flight):
+        async def get_json(url, model):
+            in_flight['current'] += 1
+            in_flight['max'] = max(in_flight['max'], in_flight['current'])
+            await asyncio.sleep(0.05)
+            in_flight['current'] -= 1
+            if 'paginationToken' in url:
+                return ResultsPage(items=self.parsed_items[2:], pagination_token=None)
+            return ResultsPage(items=self.parsed_items[:2], pagination_token='page 2')
+        return get_json
+
+    def test_fetch_results_concurrently(self):
+        in_flight = {'current': 0, 'max': 0}
+        gq = AsyncGeoguessrQueries()
+        gq._get_json = self._fake_get_json(in_flight)
+
+        with patch('app.GeoguessrQueries.session_scope', self._session_scope), \
+                patch('app.GeoguessrQueries.run_in_db_executor', self._run_in_db_executor):
+            saved = asyncio.run(gq.fetch_results(['challenge_a', 'challenge_b']))
+
+        # Two chained pages per challenge, with both challenges fetched side by side
+        self.assertEqual(in_flight['max'], 2)
+        self.assertEqual(saved, 2 * 3 * 5)
+
+        with self._session_scope() as session:
+            self.assertEqual(session.query(UserRoundResult).count(), 30)
+            daily_result = session.query(UserDailyResult).filter_by(user_id=1, challenge_token='challenge_a').one()
+            first_round = daily_result.rounds[0]
+            guess = self.items[0]['game']['player']['guesses'][0]
+            self.assertEqual((first_round.round_number, first_round.score, first_round.distance, first_round.time),
+                             (1, guess['roundScoreInPoints'], round(guess['distanceInMeters']), guess['time']))
+
+        # Rounds already stored are not duplicated
+        with patch('app.GeoguessrQueries.session_scope', self._session_scope):
+            self.assertEqual(asyncio.run(gq.fetch_results(['challenge_a'])), 0)
+
+    @patch('app.GeoguessrQueries.RESULTS_CONCURRENCY', 1)
+    def test_concurrency_limit(self):
+        in_flight = {'current': 0, 'max': 0}
+        gq = AsyncGeoguessrQueries()
+        gq._get_json = self._fake_get_json(in_flight)
+
+        with patch('app.GeoguessrQueries.session_scope', self._session_scope):
+            asyncio.run(gq.fetch_results(['challenge_a', 'challenge_b']))
+
+        self.assertEqual(in_flight['max'], 1)
+
+class TestUpdateFriends(DatabaseTestCase):
+    """
+    Syncs the friends list against an in-memory database.
+    """
+
+    def setUp(self):
+        super().setUp()
+        patcher = patch('app.GeoguessrQueries.session_scope', self._session_scope)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.profile = ProfileUser(id='self', nick='Bot')
+
+    def _save(self, friends):
+        self.statements = 0
+        summary = GeoguessrQueries()._save_friends(friends, self.profile)
+        return summary, self.statements
+
+    def _users(self):
+        with self._session_scope() as session:
+            return dict(session.query(User.geo_id, User.geo_name).all())
+
+    def test_statement_count_is_constant(self):
+        statement_counts = set()
+        for friend_count in (10, 100, 1000):
+            friends = {f'geo_{i}': f'Friend {i}' for i in range(friend_count)}
+            summary, statements = self._save(friends)
+            statement_counts.add(statements)
+            self.assertEqual(len(self._users()), friend_count + 1)
+
+            # Nothing changed, so only the diff query runs
+            summary, statements = self._save(friends)
+            self.assertEqual(summary, {'added': 0, 'renamed': 0, 'removed': 0})
+            self.assertEqual(statements, 1)
+
+        self.assertEqual(len(statement_counts), 1)
+
+    def test_rename_updates_the_existing_user(self):
+        self._save({'geo_a': 'Alice', 'geo_b': 'Bob'})
+        with self._session_scope() as session:
+            alice_id = session.query(User.id).filter_by(geo_id='geo_a').scalar()
+
+        summary, _ = self._save({'geo_a': 'Alicia', 'geo_b': 'Bob', 'geo_c': 'Carol'})
+
+        self.assertEqual(summary, {'added': 1, 'renamed': 1, 'removed': 0})
+        self.assertEqual(self._users(), {'geo_a': 'Alicia', 'geo_b': 'Bob', 'geo_c': 'Carol', 'self': 'Bot'})
+        with self._session_scope() as session:
+            self.assertEqual(session.query(User.id).filter_by(geo_id='geo_a').scalar(), alice_id)
+
+    def test_only_removes_users_without_history(self):
+        with self._session_scope() as session:
+            session.add(Challenge(challenge_token='today'))
+            session.add_all([
+                User(geo_id='played', geo_name='Played'),
+                User(geo_id='registered', geo_name='Registered', discord_id=1),
+                User(geo_id='gone', geo_name='Gone'),
+                User(geo_id='friend', geo_name='Friend'),
+            ])
+            session.flush()
+            played_id = session.query(User.id).filter_by(geo_id='played').scalar()
+            session.add(UserDailyResult(user_id=played_id, challenge_token='today', score=1))
+
+        summary, _ = self._save({'friend': 'Friend'})
+
+        self.assertEqual(summary, {'added': 1, 'renamed': 0, 'removed': 1})
+        self.assertEqual(set(self._users()), {'played', 'registered', 'friend', 'self'})
+
+        # An empty friends list is treated as a bad response rather than everyone leaving
+        summary, _ = self._save({})
+        self.assertEqual(summary['removed'], 0)
+        self.assertIn('friend', self._users())
+
+    def test_async_follows_pagination(self):
+        requested = []
+
+        async def get_json(url, model):
+            requested.append(url)
+            if model is Profile:
+                return Profile(user=self.profile)
+            page = int(URL(url).query['page'])
+            friends = [{'userId': f'geo_{i}', 'nick': f'Friend {i}'} for i in range(page * 2, min(page * 2 + 2, 5))]
+            return FriendsSummary.model_validate({'friends': friends, 'friendsCount': 5})
+
+        gq = AsyncGeoguessrQueries()
+        gq._get_json = get_json
+        summary = asyncio.run(gq.update_friends())
+
+        self.assertEqual(summary, {'added': 6, 'renamed': 0, 'removed': 0})
+        self.assertEqual(sorted(int(URL(url).query['page']) for url in requested if 'friends' in url), [0, 1, 2])
+        self.assertEqual(len(self._users()), 6)
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,69 @@
+import unittest
+
+from aiohttp.test_utils import TestClient, TestServer
+
+from app.HealthCheck import create_health_check_app
+from Metrics import Counter, Histogram, REGISTRY, render_metrics
+
+
+class TestMetrics(unittest.TestCase):
+
+    def setUp(self):
+        # Cleanups run last in first out: empty the registry, then restore the real metrics
+        self.addCleanup(REGISTRY.extend, list(REGISTRY))
+        self.addCleanup(REGISTRY.clear)
+        REGISTRY.clear()
+
+    def test_render(self):
+        requests = Counter('test_requests', "Requests.", ('endpoint',))
+        latency = Histogram('test_latency_seconds', "Latency.", buckets=(0.1, 1.0))
+        requests.inc(endpoint='profiles')
+        requests.inc(2, endpoint='profiles')
+        latency.observe(0.5)
+
+        text = render_metrics()
+
+        self.assertIn('# TYPE test_requests counter\ntest_requests_total{endpoint="profiles"} 3.0', text)
+        self.assertIn('test_latency_seconds_bucket{le="0.1"} 0.0', text)
+        self.assertIn('test_latency_seconds_bucket{le="1"} 1.0', text)
+        self.assertIn('test_latency_seconds_bucket{le="+Inf"} 1.0', text)
+        self.assertIn('test_latency_seconds_count 1.0', text)
+
+    def test_labels_required(self):
+        requests = Counter('test_requests', "Requests.", ('endpoint',))
+        with self.assertRaises(ValueError):
+            requests.inc()
+
+
+class TestHealthCheckServer(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.checks = {'discord_gateway': lambda: True, 'recent_poll': lambda: True}
+        self.client = TestClient(TestServer(create_health_check_app(self.checks)))
+        await self.client.start_server()
+
+    async def asyncTearDown(self):
+        await self.client.close()
+
+    async def test_healthz(self):
+        response = await self.client.get('/healthz')
+        self.assertEqual(response.status, 200)
+
+    async def test_readyz(self):
+        response = await self.client.get('/readyz')
+        self.assertEqual(response.status, 200)
+
+        self.checks['recent_poll'] = lambda: False
+        response = await self.client.get('/readyz')
+        self.assertEqual(response.status, 503)
+        self.assertIn('recent_poll: failing', await response.text())
+
+    async def test_metrics(self):
+        response = await self.client.get('/metrics')
+        self.assertEqual(response.status, 200)
+        self.assertTrue(response.headers['Content-Type'].startswith('text/plain; version=0.0.4'))
+        self.assertIn('geoguessr_requests', await response.text())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,171 @@
+import csv
+import datetime
+import json
+import os
+import tempfile
+import unittest
+from contextlib import contextmanager
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app import GeoguessrDiscordBot, HistoryExport
+from database import Base, User, Challenge, UserDailyResult, UserRoundResult
+from db_test_case import DatabaseTestCase
+
+
+class TestHistoryExport(DatabaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        patcher = patch('app.HistoryExport.session_scope', self._session_scope)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.output_dir = directory.name
+
+        with self._session_scope() as session:
+            session.add_all([
+                User(id=1, geo_id='geo_a', geo_name='Alice', discord_id=10 ** 17),
+                User(id=2, geo_id='geo_b', geo_name='Bob'),
+            ])
+            for day in range(1, 6):
+                challenge_token = f'day_{day}'
+                session.add(Challenge(challenge_token=challenge_token, time=datetime.datetime(2024, 4, day)))
+                for user_id in (1, 2):
+                    session.add(UserDailyResult(user_id=user_id, challenge_token=challenge_token, score=1000 * day + user_id))
+            session.flush()
+            session.add(UserRoundResult(user_daily_id=1, round_number=1, score=5000, distance=12, time=30, timed_out=False))
+
+    def _read_jsonl(self, dataset):
+        with open(os.path.join(self.output_dir, f'{dataset}.jsonl'), encoding='utf-8') as file:
+            return [json.loads(line) for line in file]
+
+    def test_jsonl_streams_in_chunks(self):
+        with patch.object(HistoryExport.JsonLinesWriter, 'write', autospec=True, side_effect=HistoryExport.JsonLinesWriter.write) as write:
+            export = HistoryExport.export_history(self.output_dir, 'jsonl', chunk_size=3)
+
+        self.assertEqual(export['rows'], {'users': 2, 'challenges': 5, 'daily_results': 10, 'rounds': 1})
+        # Ten daily results are written as chunks of at most three rows
+        self.assertEqual(max(len(call.args[1]) for call in write.call_args_list), 3)
+        self.assertEqual(len(write.call_args_list), 1 + 2 + 4 + 1)
+
+        self.assertEqual(self._read_jsonl('users')[0], {'id': 1, 'geo_id': 'geo_a', 'geo_name': 'Alice', 'discord_id': 10 ** 17})
+        self.assertEqual(self._read_jsonl('challenges')[0], {'challenge_token': 'day_1', 'time': '2024-04-01T00:00:00'})
+        self.assertEqual(self._read_jsonl('rounds'), [{'user_round_id': 1, 'user_daily_id': 1, 'round_number': 1, 'score': 5000, 'distance': 12, 'time': 30, 'timed_out': False}])
+
+    def test_csv_with_date_range(self):
+        export = HistoryExport.export_history(self.output_dir, 'csv', since=datetime.date(2024, 4, 2), until=datetime.date(2024, 4, 3))
+
+        self.assertEqual(export['rows'], {'users': 2, 'challenges': 2, 'daily_results': 4, 'rounds': 0})
+        with open(os.path.join(self.output_dir, 'daily_results.csv'), encoding='utf-8', newline='') as file:
+            rows = list(csv.DictReader(file))
+        self.assertEqual({row['challenge_token'] for row in rows}, {'day_2', 'day_3'})
+
+        with open(os.path.join(self.output_dir, 'users.csv'), encoding='utf-8', newline='') as file:
+            self.assertEqual(list(csv.reader(file))[2], ['2', 'geo_b', 'Bob', ''])
+
+    def test_new_rows_from_watermark(self):
+        watermark_path = os.path.join(self.output_dir, 'watermark.json')
+        export = HistoryExport.export_history(self.output_dir, 'jsonl', watermark=HistoryExport.load_watermark(watermark_path))
+        HistoryExport.save_watermark(watermark_path, export['watermark'])
+        self.assertEqual(export['watermark'], {'daily_results': 10, 'rounds': 1})
+
+        with self._session_scope() as session:
+            session.add(Challenge(challenge_token='day_6', time=datetime.datetime(2024, 4, 6)))
+            session.add(UserDailyResult(user_id=1, challenge_token='day_6', score=6001))
+            # A backfilled score on an existing result is not picked up by the watermark
+            session.query(UserDailyResult).filter(UserDailyResult.user_daily_id == 1).update({UserDailyResult.score: 1500})
+
+        export = HistoryExport.export_history(self.output_dir, 'jsonl', watermark=HistoryExport.load_watermark(watermark_path))
+
+        self.assertEqual(export['rows'], {'users': 2, 'challenges': 6, 'daily_results': 1, 'rounds': 0})
+        self.assertEqual(export['watermark'], {'daily_results': 11, 'rounds': 1})
+        self.assertEqual(self._read_jsonl('daily_results'), [{'user_daily_id': 11, 'user_id': 1, 'challenge_token': 'day_6', 'score': 6001}])
+
+    def test_reads_one_snapshot(self):
+        engine = create_engine(f"sqlite:///{os.path.join(self.output_dir, 'snapshot.db')}")
+        self.addCleanup(engine.dispose)
+        with engine.connect() as connection:
+            connection.exec_driver_sql("PRAGMA journal_mode = WAL")
+        Base.metadata.create_all(engine)
+        Session = sessionmaker(bind=engine)
+        with engine.begin() as connection:
+            connection.execute(User.__table__.insert(), [{'id': 1, 'geo_id': 'geo_a', 'geo_name': 'Alice'}])
+
+        @contextmanager
+        def session_scope(_=None):
+            session = Session()
+            try:
+                yield session
+                session.commit()
+            finally:
+                session.close()
+
+        def write_while_exporting(writer, rows):
+            # The bot stores a new result while the users are being written
+            if not writer_calls:
+                with engine.begin() as connection:
+                    connection.execute(Challenge.__table__.insert(), [{'challenge_token': 'day_1', 'time': datetime.datetime(2024, 4, 1)}])
+                    connection.execute(UserDailyResult.__table__.insert(), [{'user_id': 1, 'challenge_token': 'day_1', 'score': 1000}])
+            writer_calls.append(rows)
+            original_write(writer, rows)
+
+        writer_calls = []
+        original_write = HistoryExport.JsonLinesWriter.write
+        with patch('app.HistoryExport.session_scope', session_scope), \
+                patch.object(HistoryExport.JsonLinesWriter, 'write', autospec=True, side_effect=write_while_exporting):
+            export = HistoryExport.export_history(self.output_dir, 'jsonl')
+
+        self.assertEqual(export['rows'], {'users': 1, 'challenges': 0, 'daily_results': 0, 'rounds': 0})
+
+    @unittest.skipIf(HistoryExport.pyarrow is None, "pyarrow is not installed")
+    def test_parquet(self):
+        import pyarrow.parquet
+
+        HistoryExport.export_history(self.output_dir, 'parquet', chunk_size=4)
+
+        table = pyarrow.parquet.read_table(os.path.join(self.output_dir, 'daily_results.parquet'))
+        self.assertEqual(table.num_rows, 10)
+        self.assertEqual(pyarrow.parquet.ParquetFile(os.path.join(self.output_dir, 'daily_results.parquet')).num_row_groups, 3)
+        self.assertEqual(table.column('score').to_pylist()[:2], [1001, 1002])
+
+        challenges = pyarrow.parquet.read_table(os.path.join(self.output_dir, 'challenges.parquet'))
+        self.assertEqual(challenges.column('time').to_pylist()[0], datetime.datetime(2024, 4, 1))
+
+    def test_parquet_without_pyarrow(self):
+        with patch('app.HistoryExport.pyarrow', None):
+            with self.assertRaises(ValueError):
+                HistoryExport.export_history(self.output_dir, 'parquet')
+
+    def test_unknown_format(self):
+        with self.assertRaises(ValueError):
+            HistoryExport.export_history(self.output_dir, 'xlsx')
+
+class TestRunExport(unittest.IsolatedAsyncioTestCase):
+
+    async def test_export_is_sent_by_direct_message(self):
+        with tempfile.TemporaryDirectory() as output_dir:
+            path = os.path.join(output_dir, 'users.jsonl')
+            with open(path, 'w', encoding='utf-8') as file:
+                file.write('{"id": 1}\n')
+            ctx = MagicMock(send=AsyncMock(), author=MagicMock(send=AsyncMock()))
+            export = {'rows': {'users': 1}, 'paths': [path], 'watermark': {}}
+
+            with patch('app.GeoguessrDiscordBot.run_in_db_executor', AsyncMock(return_value=export)):
+                await GeoguessrDiscordBot.run_export(ctx, 'jsonl', None, None, from_watermark=False)
+
+        # Other guilds' members are in the files, so they never go to the channel
+        self.assertEqual(ctx.author.send.await_args.kwargs['files'][0].filename, 'users.jsonl')
+        self.assertNotIn('files', ctx.send.await_args.kwargs)
+
+    def test_export_commands_are_owner_only(self):
+        for name in ('export_history', 'export_new_history'):
+            checks = GeoguessrDiscordBot.bot.get_command(name).checks
+            self.assertEqual([check.__qualname__.split('.')[0] for check in checks], ['is_owner'])
+
+if __name__ == '__main__':
+    unittest.main()
\ No newline at end of file
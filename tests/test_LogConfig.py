@@ -0,0 +1,73 @@
+import json
+import logging
+import os
+import tempfile
+import time
+import unittest
+
+from app.LogConfig import SamplingFilter, setup_logging, stop_logging
+
+
+class TestSamplingFilter(unittest.TestCase):
+
+    def _record(self, msg, sample):
+        record = logging.LogRecord('test', logging.DEBUG, __file__, 1, msg, (), None)
+        if sample:
+            record.sample = True
+        return record
+
+    def test_keeps_one_in_n(self):
+        sampling_filter = SamplingFilter(every=10)
+
+        kept = [sampling_filter.filter(self._record("Message received", True)) for _ in range(25)]
+        self.assertEqual(sum(kept), 3)
+        self.assertTrue(kept[0] and kept[10] and kept[20])
+
+        # Other templates and unsampled records are counted separately or not at all
+        self.assertTrue(sampling_filter.filter(self._record("Checking daily results", True)))
+        self.assertTrue(all(sampling_filter.filter(self._record("Message received", False)) for _ in range(5)))
+
+
+class TestSetupLogging(unittest.TestCase):
+
+    def setUp(self):
+        root = logging.getLogger()
+        self.addCleanup(root.setLevel, root.level)
+        for handler in list(root.handlers):
+            self.addCleanup(root.addHandler, handler)
+        self.addCleanup(lambda: [root.removeHandler(handler) for handler in list(root.handlers)])
+        self.addCleanup(logging.getLogger('quiet').setLevel, logging.NOTSET)
+
+        handle, self.log_file = tempfile.mkstemp(suffix='.log')
+        os.close(handle)
+        self.addCleanup(os.remove, self.log_file)
+
+    def test_json_file_and_module_levels(self):
+        setup_logging(level='DEBUG', levels='quiet=WARNING', log_file=self.log_file, log_format='json')
+        logging.getLogger('loud').info("Stored %s rounds", 5, extra={'challenge_token': 'abc'})
+        logging.getLogger('quiet').info("Not written")
+        stop_logging()
+
+        with open(self.log_file, encoding='utf-8') as file:
+            entries = [json.loads(line) for line in file]
+
+        self.assertEqual(len(entries), 1)
+        self.assertEqual(entries[0]['message'], "Stored 5 rounds")
+        self.assertEqual(entries[0]['challenge_token'], 'abc')
+        self.assertEqual(entries[0]['logger'], 'loud')
+
+    def test_logging_call_does_not_wait_on_io(self):
+        setup_logging(level='INFO', levels='', log_file=self.log_file, log_format='json')
+        logger = logging.getLogger('loud')
+
+        start = time.perf_counter()
+        for i in range(2000):
+            logger.info("Event %s", i)
+        per_call = (time.perf_counter() - start) / 2000
+        stop_logging()
+
+        self.assertLess(per_call, 0.001)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,47 @@
+import unittest
+from unittest.mock import patch
+
+from app.NameIndex import NameIndex, normalize_name, load_user_names
+from database import User
+from db_test_case import DatabaseTestCase
+
+
+class TestNameIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.index = NameIndex()
+        self.index.update([('a', 'Alice'), ('b', 'alfred'), ('c', 'Bob'), ('d', '🦧🐒🦍'), ('e', 'Ｓtraße')])
+
+    def test_normalized_keys(self):
+        self.assertEqual(normalize_name('Ｓtraße'), 'strasse')
+        self.assertEqual(self.index.search('AL'), ['alfred', 'Alice'])
+        self.assertEqual(self.index.search('strass'), ['Ｓtraße'])
+        self.assertEqual(self.index.search('🦧'), ['🦧🐒🦍'])
+        self.assertEqual(self.index.search('z'), [])
+
+    def test_limit(self):
+        index = NameIndex()
+        index.update((str(i), f'Friend {i:03}') for i in range(100))
+
+        self.assertEqual(len(index.search('')), 25)
+        self.assertEqual(index.search('friend 01', limit=3), ['Friend 010', 'Friend 011', 'Friend 012'])
+
+    def test_incremental_update(self):
+        self.index.update([('a', 'Alicia'), ('b', 'alfred'), ('c', 'Bob'), ('d', '🦧🐒🦍'), ('f', 'Alan')])
+
+        self.assertEqual(self.index.search('al'), ['Alan', 'alfred', 'Alicia'])
+        self.assertEqual(self.index.search('st'), [])
+        self.assertEqual(len(self.index), 5)
+
+
+class TestLoadUserNames(DatabaseTestCase):
+
+    def test_loads_every_user(self):
+        with self._session_scope() as session:
+            session.add_all([User(geo_id='a', geo_name='Alice'), User(geo_id='b', geo_name='Bob')])
+
+        with patch('app.NameIndex.session_scope', self._session_scope):
+            self.assertEqual(sorted(load_user_names()), [('a', 'Alice'), ('b', 'Bob')])
+
+if __name__ == '__main__':
+    unittest.main()
\ No newline at end of file
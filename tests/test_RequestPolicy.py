@@ -0,0 +1,128 @@
+import asyncio
+import time
+import unittest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import aiohttp
+import requests
+
+from app.GeoguessrModels import SchemaDriftError
+from app.RequestPolicy import RequestPolicy, TokenBucket, CircuitBreaker, CircuitOpenError, classify_error
+
+
+def http_error(status, headers=None):
+    return aiohttp.ClientResponseError(MagicMock(), (), status=status, headers=headers or {})
+
+
+class TestRequestPolicy(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.policy = RequestPolicy(
+            max_retries=3, backoff_base=0, backoff_max=60,
+            bucket=TokenBucket(rate=1000, capacity=1000),
+            breaker=CircuitBreaker(failure_threshold=3, reset_timeout=60)
+        )
+
+    async def test_stops_retrying_after_success(self):
+        request = AsyncMock(side_effect=[http_error(503), {'token': 'abc'}, {'token': 'unused'}])
+
+        self.assertEqual(await self.policy.call(request), {'token': 'abc'})
+        self.assertEqual(request.await_count, 2)
+
+    async def test_does_not_retry_client_errors(self):
+        request = AsyncMock(side_effect=http_error(401))
+
+        with self.assertRaises(aiohttp.ClientResponseError):
+            await self.policy.call(request)
+        self.assertEqual(request.await_count, 1)
+
+    async def test_gives_up_after_max_retries(self):
+        self.policy.breaker.failure_threshold = 10
+        request = AsyncMock(side_effect=aiohttp.ClientConnectionError())
+
+        with self.assertRaises(aiohttp.ClientConnectionError):
+            await self.policy.call(request)
+        self.assertEqual(request.await_count, 4)
+
+    async def test_circuit_opens_and_refuses_requests(self):
+        request = AsyncMock(side_effect=http_error(500))
+
+        with self.assertRaises(aiohttp.ClientResponseError):
+            await self.policy.call(request)
+        self.assertEqual(request.await_count, 3)
+        self.assertTrue(self.policy.breaker.is_open)
+
+        with self.assertRaises(CircuitOpenError):
+            await self.policy.call(request)
+        self.assertEqual(request.await_count, 3)
+
+    def test_half_open_trial_closes_circuit(self):
+        breaker = self.policy.breaker
+        breaker.opened_at = 1000.0
+
+        with patch('app.RequestPolicy.time.monotonic', return_value=1030.0):
+            self.assertTrue(breaker.is_open)
+            self.assertFalse(breaker.allow())
+
+        with patch('app.RequestPolicy.time.monotonic', return_value=1061.0):
+            # Only one trial request is let through
+            self.assertTrue(breaker.allow())
+            self.assertFalse(breaker.allow())
+            breaker.record_success()
+
+        self.assertFalse(breaker.is_open)
+        self.assertTrue(breaker.allow())
+
+    def test_trial_without_outcome_frees_the_circuit(self):
+        breaker = self.policy.breaker
+        # Opened longer ago than reset_timeout, so the next request is the trial
+        breaker.opened_at = time.monotonic() - 61
+
+        # The trial fails with an error that is neither a success nor a failure of Geoguessr
+        with self.assertRaises(SchemaDriftError):
+            self.policy.call_blocking(MagicMock(side_effect=SchemaDriftError("drift")))
+
+        self.assertEqual(self.policy.call_blocking(MagicMock(return_value='ok')), 'ok')
+
+        self.assertFalse(breaker.is_open)
+
+    async def test_cancelled_trial_frees_the_circuit(self):
+        breaker = self.policy.breaker
+        breaker.opened_at = time.monotonic() - 61
+
+        with self.assertRaises(asyncio.CancelledError):
+            await self.policy.call(AsyncMock(side_effect=asyncio.CancelledError()))
+
+        self.assertTrue(breaker.allow())
+
+    def test_call_blocking_retries_requests_errors(self):
+        response = MagicMock(status_code=429, headers={'Retry-After': '0'})
+        request = MagicMock(side_effect=[requests.HTTPError(response=response), 'ok'])
+
+        self.assertEqual(self.policy.call_blocking(request), 'ok')
+        self.assertEqual(request.call_count, 2)
+
+
+class TestBackoff(unittest.TestCase):
+
+    def test_honours_retry_after(self):
+        self.assertEqual(classify_error(http_error(429, {'Retry-After': '7'})), (True, 7.0))
+        policy = RequestPolicy(backoff_max=5)
+        self.assertEqual(policy.backoff_delay(0, retry_after=7.0), 5)
+
+    def test_jitter_stays_within_exponential_bound(self):
+        policy = RequestPolicy(backoff_base=1, backoff_max=60)
+        for attempt in range(8):
+            delay = policy.backoff_delay(attempt)
+            self.assertGreaterEqual(delay, 0)
+            self.assertLessEqual(delay, min(60, 2 ** attempt))
+
+    def test_token_bucket_waits_when_empty(self):
+        bucket = TokenBucket(rate=2, capacity=2)
+        with patch('app.RequestPolicy.time.monotonic', return_value=bucket.updated):
+            waits = [bucket._reserve() for _ in range(4)]
+
+        self.assertEqual(waits, [0.0, 0.0, 0.5, 1.0])
+
+if __name__ == '__main__':
+    unittest.main()
\ No newline at end of file
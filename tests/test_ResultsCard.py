@@ -0,0 +1,87 @@
+import asyncio
+import io
+import os
+import signal
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+from PIL import Image
+
+from app import ResultsCard
+from app.ResultsCard import ResultsCardRenderer, render_results_card, results_digest, icon_file, load_assets, CARD_MAX_ROWS
+
+RESULTS = [('Friend 0', 24000), ('Friend 1', 18250), ('Friend 2', 900)]
+
+
+class TestResultsCard(unittest.TestCase):
+
+    def test_renders_png(self):
+        card = Image.open(io.BytesIO(render_results_card("Todays Results", RESULTS)))
+
+        self.assertEqual(card.format, 'PNG')
+        self.assertEqual(card.width, ResultsCard.CARD_WIDTH)
+
+    def test_caps_rows(self):
+        results = [(f'Friend {i}', 25000 - i) for i in range(100)]
+        short = Image.open(io.BytesIO(render_results_card("Todays Results", results[:CARD_MAX_ROWS])))
+        capped = Image.open(io.BytesIO(render_results_card("Todays Results", results)))
+
+        self.assertEqual(short.height, capped.height)
+
+    def test_digest_follows_content(self):
+        self.assertEqual(results_digest("Todays Results", RESULTS), results_digest("Todays Results", list(RESULTS)))
+        self.assertNotEqual(results_digest("Todays Results", RESULTS), results_digest("Todays Results", RESULTS[:2]))
+
+    def test_icon_is_read_once(self):
+        load_assets()
+        with patch('builtins.open') as mock_open:
+            first, second = icon_file(), icon_file()
+
+        mock_open.assert_not_called()
+        self.assertEqual(first.fp.read(), second.fp.read())
+
+    def test_renders_each_content_once(self):
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            renderer = ResultsCardRenderer(executor=executor)
+            with patch('app.ResultsCard.render_results_card', return_value=b'card') as mock_render:
+                first = asyncio.run(renderer.render("Todays Results", RESULTS))
+                cached = asyncio.run(renderer.render("Todays Results", list(RESULTS)))
+                changed = asyncio.run(renderer.render("Todays Results", RESULTS + [('Friend 3', 10)]))
+
+        self.assertEqual((first, cached, changed), (b'card', b'card', b'card'))
+        self.assertEqual(mock_render.call_count, 2)
+
+    def test_renders_in_worker_process(self):
+        renderer = ResultsCardRenderer(workers=1)
+        self.addCleanup(renderer.close)
+
+        card = asyncio.run(renderer.render("Todays Results", RESULTS))
+
+        self.assertEqual(Image.open(io.BytesIO(card)).format, 'PNG')
+
+    def test_restarts_broken_pool(self):
+        renderer = ResultsCardRenderer(workers=1)
+        self.addCleanup(renderer.close)
+        renderer.start()
+        for process in renderer.executor._processes.values():
+            os.kill(process.pid, signal.SIGKILL)
+            process.join()
+
+        with self.assertLogs(ResultsCard.logger, 'ERROR'):
+            self.assertIsNone(asyncio.run(renderer.render("Todays Results", RESULTS)))
+
+        card = asyncio.run(renderer.render("Todays Results", RESULTS))
+        self.assertEqual(Image.open(io.BytesIO(card)).format, 'PNG')
+
+    def test_start_forks_workers_before_any_thread(self):
+        renderer = ResultsCardRenderer(workers=2)
+        self.addCleanup(renderer.close)
+
+        renderer.start()
+
+        # All workers exist once start returns, so none is forked later from a threaded process
+        self.assertEqual(len(renderer.executor._processes), 2)
+
+if __name__ == '__main__':
+    unittest.main()
\ No newline at end of file
@@ -0,0 +1,53 @@
+import unittest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import discord
+
+from app import GeoguessrDiscordBot
+from app.UserListView import UserListView
+
+
+def fake_load_user_list_page(after_id, page_number):
+    # Three pages of 20 users starting after ids 0, 20 and 40
+    return discord.Embed(title=f'page {page_number}'), after_id + 20 if after_id < 40 else None
+
+
+class TestUserListView(unittest.IsolatedAsyncioTestCase):
+
+    def _interaction(self):
+        return MagicMock(response=MagicMock(edit_message=AsyncMock(), defer=AsyncMock()))
+
+    @patch('app.UserListView.load_user_list_page', fake_load_user_list_page)
+    async def test_navigates_pages(self):
+        view = UserListView(next_after_id=20)
+        self.assertTrue(view.previous_page.disabled)
+
+        for expected in ('page 2', 'page 3'):
+            interaction = self._interaction()
+            await view.next_page.callback(interaction)
+            self.assertEqual(interaction.response.edit_message.await_args.kwargs['embed'].title, expected)
+        self.assertTrue(view.next_page.disabled)
+        self.assertEqual(view.page_starts, [0, 20, 40])
+
+        interaction = self._interaction()
+        await view.previous_page.callback(interaction)
+        self.assertEqual(interaction.response.edit_message.await_args.kwargs['embed'].title, 'page 2')
+        self.assertFalse(view.next_page.disabled)
+
+    async def test_single_page(self):
+        view = UserListView(next_after_id=None)
+
+        self.assertTrue(view.previous_page.disabled)
+        self.assertTrue(view.next_page.disabled)
+
+    async def test_register_reports_failed_first_page(self):
+        ctx = MagicMock(response=MagicMock(send_message=AsyncMock()), channel=MagicMock(send=AsyncMock()))
+
+        # The registration succeeds, then the first page of the user list fails to load
+        with patch('app.GeoguessrDiscordBot.run_in_db_executor', AsyncMock(side_effect=[True, (None, None)])):
+            await GeoguessrDiscordBot.register.callback(ctx, 'Alice')
+
+        ctx.response.send_message.assert_awaited_once_with("Failed to load the user list", ephemeral=True)
+
+if __name__ == '__main__':
+    unittest.main()
\ No newline at end of file
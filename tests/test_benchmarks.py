@@ -0,0 +1,38 @@
+import importlib.util
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+
+class TestBenchmarks(unittest.TestCase):
+
+    def test_small_run_produces_json(self):
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, 'results.json')
+            subprocess.run(
+                [sys.executable, os.path.join(PROJECT_ROOT, 'benchmarks', 'run_benchmarks.py'), '--users', '5', '--days', '3', '--repeat', '1', '--output', output],
+                cwd=directory, check=True, capture_output=True, timeout=120
+            )
+            with open(output) as file:
+                report = json.load(file)
+
+        results = {result['name']: result for result in report['results']}
+        decoders = ['json', 'model'] + (['orjson'] if importlib.util.find_spec('orjson') else [])
+        self.assertEqual(set(results), {
+            'check_for_new_results', 'check_for_new_results_unchanged', 'update_friends',
+            'get_todays_results_embed', 'get_todays_results_embed_cached', 'get_user_list_embed',
+            'name_index_build', 'name_index_search',
+        } | {f'parse_{payload}_{decoder}' for payload in ('daily_challenge', 'friends_summary') for decoder in decoders})
+        self.assertEqual(results['check_for_new_results_unchanged']['queries'], 0)
+        self.assertEqual(results['get_todays_results_embed']['queries'], 1)
+        self.assertEqual(results['name_index_search']['queries'], 0)
+        self.assertEqual(report['metadata']['users'], 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,39 @@
+import os
+import sqlite3
+import tempfile
+import threading
+import unittest
+
+from database import run_in_db_executor
+from database.engine import _set_sqlite_pragmas, SQLITE_BUSY_TIMEOUT
+
+
+class TestSqlitePragmas(unittest.TestCase):
+
+    def test_pragmas_applied_on_connect(self):
+        handle, db_path = tempfile.mkstemp(suffix='.db')
+        os.close(handle)
+        conn = sqlite3.connect(db_path)
+        try:
+            _set_sqlite_pragmas(conn, None)
+
+            self.assertEqual(conn.execute("PRAGMA journal_mode").fetchone()[0], 'wal')
+            self.assertEqual(conn.execute("PRAGMA synchronous").fetchone()[0], 1)  # NORMAL
+            self.assertEqual(conn.execute("PRAGMA busy_timeout").fetchone()[0], SQLITE_BUSY_TIMEOUT)
+        finally:
+            conn.close()
+            for suffix in ('', '-wal', '-shm'):
+                if os.path.exists(db_path + suffix):
+                    os.remove(db_path + suffix)
+
+
+class TestRunInDbExecutor(unittest.IsolatedAsyncioTestCase):
+
+    async def test_runs_off_the_event_loop_thread(self):
+        thread = await run_in_db_executor(threading.current_thread)
+
+        self.assertNotEqual(thread, threading.current_thread())
+        self.assertTrue(thread.name.startswith('db'))
+
+if __name__ == '__main__':
+    unittest.main()
\ No newline at end of file
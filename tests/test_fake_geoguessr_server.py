@@ -0,0 +1,87 @@
+import os
+import sys
+import unittest
+
+from aiohttp.test_utils import TestClient, TestServer
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'benchmarks'))
+from fake_geoguessr_server import FakeGeoguessr
+
+
+class TestFakeGeoguessr(unittest.IsolatedAsyncioTestCase):
+
+    async def _client(self, **kwargs):
+        self.fake = FakeGeoguessr(**kwargs)
+        client = TestClient(TestServer(self.fake.create_app()))
+        await client.start_server()
+        self.addAsyncCleanup(client.close)
+        return client
+
+    async def test_results_pagination_covers_every_submission(self):
+        # Late in the simulated day, when nearly every friend has submitted
+        client = await self._client(friends=100, participation=1.0, day_seconds=1000)
+        self.fake.started_at -= 990
+        cookies = {'_ncfa': 'fake-ncfa'}
+
+        challenge = await (await client.get('/api/v3/challenges/daily-challenges/today', cookies=cookies)).json()
+        submitted = {friend['id'] for friend in challenge['friends']}
+
+        seen = []
+        pagination_token = None
+        while True:
+            params = {'friends': 'true', 'limit': 26}
+            if pagination_token:
+                params['paginationToken'] = pagination_token
+            page = await (await client.get(f"/api/v3/results/highscores/{challenge['token']}", params=params, cookies=cookies)).json()
+            seen.extend(item['userId'] for item in page['items'])
+            pagination_token = page['paginationToken']
+            if not pagination_token:
+                break
+
+        self.assertGreater(len(submitted), 26)
+        self.assertEqual(set(seen), submitted)
+        self.assertEqual(len(seen), len(submitted))
+
+    async def test_friends_pagination(self):
+        client = await self._client(friends=250)
+        cookies = {'_ncfa': 'fake-ncfa'}
+
+        seen = []
+        for page in range(4):
+            summary = await (await client.get('/api/v3/social/friends/summary', params={'page': page}, cookies=cookies)).json()
+            self.assertEqual(summary['friendsCount'], 250)
+            seen.extend(friend['userId'] for friend in summary['friends'])
+
+        self.assertEqual(len(seen), 250)
+        self.assertEqual(len(set(seen)), 250)
+
+    async def test_not_modified(self):
+        client = await self._client(friends=10)
+        response = await client.get('/api/v3/challenges/daily-challenges/today')
+        response = await client.get('/api/v3/challenges/daily-challenges/today', headers={'If-None-Match': response.headers['ETag']})
+        self.assertEqual(response.status, 304)
+
+    async def test_cookie_expiry(self):
+        client = await self._client(friends=10, cookie_ttl=60)
+        response = await client.get('/api/v3/profiles', cookies={'_ncfa': 'fake-ncfa'})
+        self.assertEqual(response.status, 200)
+
+        self.fake.started_at -= 120
+        self.fake.sessions['fake-ncfa'] = self.fake._expiry()
+        response = await client.get('/api/v3/profiles', cookies={'_ncfa': 'fake-ncfa'})
+        self.assertEqual(response.status, 401)
+
+        response = await client.post('/api/v3/accounts/signin', json={'email': 'bot@example.com', 'password': 'secret'})
+        self.assertEqual(response.status, 200)
+        response = await client.get('/api/v3/profiles', cookies={'_ncfa': response.cookies['_ncfa'].value})
+        self.assertEqual(response.status, 200)
+
+    async def test_rate_limit_injection(self):
+        client = await self._client(friends=10, rate_limit_rate=1.0, retry_after=7)
+        response = await client.get('/api/v3/profiles')
+        self.assertEqual(response.status, 429)
+        self.assertEqual(response.headers['Retry-After'], '7')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+import datetime
+import unittest
+
+from db_test_case import DatabaseTestCase
+from database import User, Challenge, UserDailyResult, LeaderboardEntry, update_leaderboards, roll_over_leaderboards, rebuild_leaderboards
+
+
+class TestLeaderboards(DatabaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        with self._session_scope() as session:
+            session.add_all([User(id=user_id, geo_id=f'geo_{user_id}', geo_name=f'User {user_id}') for user_id in (1, 2)])
+
+    def _add_results(self, played_on, scores):
+        challenge_token = f'token_{played_on.isoformat()}'
+        with self._session_scope() as session:
+            session.add(Challenge(challenge_token=challenge_token, time=datetime.datetime.combine(played_on, datetime.time(0, 0, 1))))
+            new_results = [{'user_id': user_id, 'challenge_token': challenge_token, 'score': score} for user_id, score in scores.items()]
+            update_leaderboards(session, new_results)
+            session.bulk_insert_mappings(UserDailyResult, new_results)
+
+    def _leaderboards(self):
+        with self._session_scope() as session:
+            return {
+                (entry.period, entry.user_id): (entry.games_played, entry.total_score)
+                for entry in session.query(LeaderboardEntry)
+            }
+
+    def test_incremental_updates_and_rollover(self):
+        # Results land day by day, each day rolling the periods over first like the midnight loop
+        days = [datetime.date(2024, 3, 28) + datetime.timedelta(days=offset) for offset in range(10)]
+        for day in days:
+            with self._session_scope() as session:
+                roll_over_leaderboards(session, day)
+            self._add_results(day, {1: 1000, 2: 2000 if day.day % 2 else 0})
+
+        leaderboards = self._leaderboards()
+        last_day = days[-1]  # 2024-04-06
+        self.assertEqual(leaderboards[('all', 1)], (10, 10000))
+        self.assertEqual(leaderboards[('week', 1)], (7, 7000))
+        self.assertEqual(leaderboards[('month', 1)], (6, 6000))
+        self.assertEqual(leaderboards[('month', 2)], (6, 6000))
+
+        # Incremental results match a rebuild from the full history
+        with self._session_scope() as session:
+            rebuild_leaderboards(session, last_day)
+        self.assertEqual(self._leaderboards(), leaderboards)
+
+    def test_rollover_after_missed_days(self):
+        self._add_results(datetime.date(2024, 4, 1), {1: 1000})
+        with self._session_scope() as session:
+            roll_over_leaderboards(session, datetime.date(2024, 5, 2))
+
+        leaderboards = self._leaderboards()
+        self.assertNotIn(('week', 1), leaderboards)
+        self.assertNotIn(('month', 1), leaderboards)
+        self.assertEqual(leaderboards[('all', 1)], (1, 1000))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,97 @@
+import datetime
+import os
+import sqlite3
+import tempfile
+import unittest
+
+from sqlalchemy import create_engine, inspect
+from sqlalchemy.orm import sessionmaker
+
+from database import User, Challenge, UserDailyResult, UserStats, LeaderboardEntry, upgrade_database, SCHEMA_VERSION
+
+# Schema as created by Base.metadata.create_all before versioning was introduced
+V1_SCHEMA = """
+CREATE TABLE user (id INTEGER NOT NULL, geo_id VARCHAR, geo_name VARCHAR, discord_id VARCHAR, PRIMARY KEY (id));
+CREATE TABLE challenge (challenge_token VARCHAR NOT NULL, time VARCHAR, PRIMARY KEY (challenge_token));
+CREATE TABLE user_daily_result (
+    user_daily_id INTEGER NOT NULL, user_id INTEGER, score INTEGER, challenge_token VARCHAR,
+    PRIMARY KEY (user_daily_id),
+    FOREIGN KEY(user_id) REFERENCES user (id),
+    FOREIGN KEY(challenge_token) REFERENCES challenge (challenge_token)
+);
+"""
+
+
+class TestMigrations(unittest.TestCase):
+
+    def setUp(self):
+        handle, self.db_path = tempfile.mkstemp(suffix='.db')
+        os.close(handle)
+        self.engine = create_engine(f'sqlite:///{self.db_path}')
+
+    def tearDown(self):
+        self.engine.dispose()
+        os.remove(self.db_path)
+
+    def _create_v1_database(self):
+        conn = sqlite3.connect(self.db_path)
+        conn.executescript(V1_SCHEMA)
+        conn.executemany("INSERT INTO user VALUES (?, ?, ?, ?)", [
+            (1, 'geo_a', 'Alice', '123456789012345678'),
+            (2, 'geo_b', 'Bob', None),
+            (3, 'geo_a', 'Alice Renamed', None),
+        ])
+        conn.executemany("INSERT INTO challenge VALUES (?, ?)", [
+            ('token_1', '2024-04-04 00:00:01.123456+00:00'),
+            ('token_2', '2024-04-05 00:00:00+00:00'),
+        ])
+        conn.executemany("INSERT INTO user_daily_result VALUES (?, ?, ?, ?)", [
+            (1, 1, 20000, 'token_1'),
+            (2, 2, 15000, 'token_1'),
+            (3, 3, 21000, 'token_1'),
+            (4, 3, 22000, 'token_2'),
+        ])
+        conn.commit()
+        conn.close()
+
+    def test_create_new_database(self):
+        self.assertEqual(upgrade_database(self.engine), SCHEMA_VERSION)
+        self.assertEqual(upgrade_database(self.engine), SCHEMA_VERSION)
+
+        with self.engine.connect() as conn:
+            self.assertEqual(conn.exec_driver_sql("PRAGMA user_version").scalar(), SCHEMA_VERSION)
+
+    def test_upgrade_v1_database(self):
+        self._create_v1_database()
+
+        self.assertEqual(upgrade_database(self.engine), SCHEMA_VERSION)
+
+        self.assertIn('guild_config', inspect(self.engine).get_table_names())
+        self.assertIn('user_round_result', inspect(self.engine).get_table_names())
+        indexes = {index['name']: index for index in inspect(self.engine).get_indexes('user_daily_result')}
+        self.assertTrue(indexes['ix_user_daily_result_user_id_challenge_token']['unique'])
+
+        session = sessionmaker(bind=self.engine)()
+        try:
+            users = session.query(User).order_by(User.id).all()
+            self.assertEqual([(user.geo_id, user.geo_name) for user in users], [('geo_a', 'Alice Renamed'), ('geo_b', 'Bob')])
+            self.assertEqual(users[0].discord_id, 123456789012345678)
+
+            challenge = session.query(Challenge).order_by(Challenge.time.desc()).first()
+            self.assertEqual(challenge.challenge_token, 'token_2')
+            self.assertEqual(challenge.time, datetime.datetime(2024, 4, 5))
+
+            results = session.query(UserDailyResult.user_id, UserDailyResult.challenge_token).order_by(UserDailyResult.user_daily_id).all()
+            self.assertEqual(results, [(1, 'token_1'), (2, 'token_1'), (1, 'token_2')])
+
+            stats = {user_stats.user_id: user_stats for user_stats in session.query(UserStats)}
+            self.assertEqual((stats[1].games_played, stats[1].current_streak, stats[1].last_played), (2, 2, datetime.date(2024, 4, 5)))
+            self.assertEqual((stats[2].games_played, stats[2].best_score), (1, 15000))
+
+            all_time = session.query(LeaderboardEntry).filter_by(period='all').order_by(LeaderboardEntry.user_id).all()
+            self.assertEqual([(entry.user_id, entry.games_played) for entry in all_time], [(1, 2), (2, 1)])
+        finally:
+            session.close()
+
+if __name__ == '__main__':
+    unittest.main()
\ No newline at end of file
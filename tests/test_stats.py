@@ -0,0 +1,100 @@
+import datetime
+import unittest
+
+from db_test_case import DatabaseTestCase
+from database import User, Challenge, UserDailyResult, UserStats, update_user_stats, rebuild_user_stats
+
+
+class TestUserStats(DatabaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        with self._session_scope() as session:
+            session.add_all([User(id=user_id, geo_id=f'geo_{user_id}', geo_name=f'User {user_id}') for user_id in (1, 2, 3)])
+
+    def _add_results(self, challenge_token, played_on, scores):
+        with self._session_scope() as session:
+            if session.query(Challenge).get(challenge_token) is None:
+                session.add(Challenge(challenge_token=challenge_token, time=datetime.datetime.combine(played_on, datetime.time())))
+                session.flush()
+            new_results = [{'user_id': user_id, 'challenge_token': challenge_token, 'score': score} for user_id, score in scores.items()]
+            update_user_stats(session, challenge_token, played_on, new_results)
+            session.bulk_insert_mappings(UserDailyResult, new_results)
+
+    def _stats(self):
+        with self._session_scope() as session:
+            return {
+                user_stats.user_id: (user_stats.games_played, user_stats.total_score, user_stats.best_score, user_stats.wins,
+                                     user_stats.current_streak, user_stats.longest_streak, user_stats.last_played)
+                for user_stats in session.query(UserStats)
+            }
+
+    def test_incremental_matches_rebuild(self):
+        day = datetime.date(2024, 4, 1)
+        self._add_results('token_1', day, {1: 20000, 2: 15000})
+        self._add_results('token_1', day, {3: 22000})
+        self._add_results('token_2', day + datetime.timedelta(days=1), {1: 18000, 2: 18000})
+        self._add_results('token_3', day + datetime.timedelta(days=3), {1: 10000})
+
+        incremental = self._stats()
+        self.assertEqual(incremental[1], (3, 48000, 20000, 2, 1, 2, day + datetime.timedelta(days=3)))
+        self.assertEqual(incremental[2][3], 1)
+        self.assertEqual(incremental[3][3], 1)
+
+        with self._session_scope() as session:
+            rebuild_user_stats(session)
+        self.assertEqual(self._stats(), incremental)
+
+    def test_wins_move_when_beaten(self):
+        day = datetime.date(2024, 4, 1)
+        self._add_results('token_1', day, {1: 20000})
+        self.assertEqual(self._stats()[1][3], 1)
+
+        self._add_results('token_1', day, {2: 21000})
+        stats = self._stats()
+        self.assertEqual((stats[1][3], stats[2][3]), (0, 1))
+
+        self._add_results('token_1', day, {3: 21000})
+        stats = self._stats()
+        self.assertEqual((stats[1][3], stats[2][3], stats[3][3]), (0, 1, 1))
+
+    def test_update_reads_constant_rows(self):
+        day = datetime.date(2024, 4, 1)
+        self._add_results('token_1', day, {1: 20000})
+        self.statements = 0
+        self._add_results('token_2', day + datetime.timedelta(days=1), {2: 15000, 3: 16000})
+        small = self.statements
+
+        for offset in range(2, 30):
+            self._add_results(f'token_{offset + 1}', day + datetime.timedelta(days=offset), {1: 1000, 2: 2000, 3: 3000})
+        self.statements = 0
+        self._add_results('token_99', day + datetime.timedelta(days=40), {2: 15000, 3: 16000})
+        self.assertEqual(self.statements, small)
+
+    def test_update_statement_count_with_existing_stats(self):
+        day = datetime.date(2024, 4, 1)
+        statement_counts = set()
+        for friend_count in (10, 100, 300):
+            user_ids = range(1000 * friend_count, 1000 * friend_count + friend_count)
+            with self._session_scope() as session:
+                session.add_all(User(id=user_id, geo_id=f'geo_{user_id}', geo_name=f'User {user_id}') for user_id in user_ids)
+
+            # The first day inserts the statistics rows, the second updates every one of them
+            self._add_results(f'first_{friend_count}', day, {user_id: (user_id % 7) * 1000 for user_id in user_ids})
+            self.statements = 0
+            self._add_results(f'second_{friend_count}', day + datetime.timedelta(days=1), {user_id: (user_id % 5) * 1000 for user_id in user_ids})
+            statement_counts.add(self.statements)
+
+        self.assertEqual(len(statement_counts), 1)
+
+        incremental = self._stats()
+        # 300005 tied for the best score of the first day, 300004 for the second
+        self.assertEqual(incremental[300005], (2, 6000, 6000, 1, 2, 2, day + datetime.timedelta(days=1)))
+        self.assertEqual(incremental[300004], (2, 5000 + 4000, 5000, 1, 2, 2, day + datetime.timedelta(days=1)))
+        with self._session_scope() as session:
+            rebuild_user_stats(session)
+        self.assertEqual(self._stats(), incremental)
+
+
+if __name__ == '__main__':
+    unittest.main()